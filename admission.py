@@ -0,0 +1,196 @@
+import asyncio
+import heapq
+import itertools
+import math
+import time
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from config import settings
+
+
+class Priority(NamedTuple):
+    name: str
+    rank: int
+
+
+# Меньше rank — раньше из очереди
+CRITICAL = Priority("critical", 0)  # покупки, брони, проход на входе
+READ = Priority("read", 1)  # одиночные GET и обычные записи
+SCAN = Priority("scan", 2)  # страницы списков, массовые операции
+BACKGROUND = Priority("background", 3)  # выгрузки, перестроение индексов, очистка броней: не отбрасываются
+PRIORITIES = (CRITICAL, READ, SCAN, BACKGROUND)
+
+
+class Overloaded(Exception):
+    """БД перегружена: запрос не дождётся своей очереди. retry_after — секунды."""
+
+    def __init__(self, priority: Priority, retry_after: int):
+        super().__init__(f"database overloaded, {priority.name} request shed")
+        self.priority = priority
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """Допуск к БД: общий предел одновременных операций с очередью по приоритетам.
+
+    Предел подбирается по задержке (AIMD): операция дольше target_latency
+    уменьшает его в backoff раз (не чаще раза за target_latency), быстрая
+    операция при занятых слотах прибавляет 1/limit — около единицы за
+    «круг» слотов. Когда SQL Server тормозит, лишние запросы ждут здесь, а
+    не открывают новые соединения и не добавляют ему работы.
+
+    Освободившийся слот получает самый приоритетный ожидающий. Запрос с
+    дедлайном отбрасывается сразу (Overloaded, 503), если по очереди перед
+    ним и средней длительности операции его дедлайн уже не выполнить, и
+    при истечении дедлайна в очереди. BACKGROUND ждёт без дедлайна.
+    """
+
+    def __init__(
+        self, limit: int, min_limit: int, max_limit: int, target_latency: float,
+        deadlines: Dict[str, float], max_queue: int, backoff: float = 0.9,
+    ):
+        self.limit = float(limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.target_latency = target_latency
+        self.deadlines = deadlines
+        self.max_queue = max_queue
+        self.backoff = backoff
+        self.in_flight = 0
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._waiting = [0] * len(PRIORITIES)
+        self._order = itertools.count()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        # Средняя длительность операции (EWMA), по ней — ожидаемое ожидание
+        self.latency = 0.0
+        self._decreased_at = 0.0
+        self.admitted = 0
+        self.queued = 0
+        self.rejected = dict.fromkeys((priority.name for priority in PRIORITIES), 0)
+        self.timed_out = dict.fromkeys((priority.name for priority in PRIORITIES), 0)
+        self.increases = 0
+        self.decreases = 0
+        self.max_waiting = 0
+
+    def _bind(self) -> asyncio.AbstractEventLoop:
+        loop = asyncio.get_running_loop()
+        # Futures привязаны к циклу событий; тесты запускают новый цикл на каждый вызов
+        if self._loop is not loop:
+            self._waiters = []
+            self._waiting = [0] * len(PRIORITIES)
+            self.in_flight = 0
+            self._loop = loop
+        return loop
+
+    @property
+    def waiting(self) -> int:
+        return sum(self._waiting)
+
+    def _expected_wait(self, rank: int) -> float:
+        ahead = sum(self._waiting[:rank + 1]) + 1
+        return ahead * self.latency / max(1, int(self.limit))
+
+    def _shed(self, counters: Dict[str, int], priority: Priority, wait: float) -> Overloaded:
+        counters[priority.name] += 1
+        return Overloaded(priority, max(1, math.ceil(wait)))
+
+    async def acquire(self, priority: Priority) -> None:
+        loop = self._bind()
+        if self.in_flight < int(self.limit) and not self.waiting:
+            self.in_flight += 1
+            self.admitted += 1
+            return
+        deadline = self.deadlines.get(priority.name) if priority is not BACKGROUND else None
+        if deadline is not None:
+            expected = self._expected_wait(priority.rank)
+            if expected > deadline or self.waiting >= self.max_queue:
+                raise self._shed(self.rejected, priority, expected)
+        future = loop.create_future()
+        heapq.heappush(self._waiters, (priority.rank, next(self._order), future))
+        self._waiting[priority.rank] += 1
+        self.queued += 1
+        self.max_waiting = max(self.max_waiting, self.waiting)
+        try:
+            await asyncio.wait_for(future, deadline)
+        except asyncio.TimeoutError:
+            raise self._shed(self.timed_out, priority, self._expected_wait(priority.rank)) from None
+        except BaseException:
+            # Слот уже передан, а вызывающего отменили: возвращаем
+            if future.done() and not future.cancelled():
+                self.release()
+            raise
+        finally:
+            self._waiting[priority.rank] -= 1
+        self.admitted += 1
+
+    def release(self, seconds: Optional[float] = None) -> None:
+        """seconds — длительность операции; None — не учитывать в пределе
+        (выгрузки держат слот минутами)."""
+        self.in_flight -= 1
+        if seconds is not None:
+            self._adjust(seconds)
+        while self._waiters and self.in_flight < int(self.limit):
+            _, _, future = heapq.heappop(self._waiters)
+            # Отменённые и истёкшие лежат в куче до своей очереди
+            if not future.done():
+                self.in_flight += 1
+                future.set_result(None)
+
+    def _adjust(self, seconds: float) -> None:
+        self.latency = seconds if not self.latency else 0.9 * self.latency + 0.1 * seconds
+        if seconds > self.target_latency:
+            now = time.monotonic()
+            if now - self._decreased_at >= self.target_latency and self.limit > self.min_limit:
+                self.limit = max(self.min_limit, self.limit * self.backoff)
+                self._decreased_at = now
+                self.decreases += 1
+        elif self.in_flight + 1 >= int(self.limit) and self.limit < self.max_limit:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            self.increases += 1
+
+    def slot(self, priority: Priority, measure: bool = True) -> "_Slot":
+        return _Slot(self, priority, measure)
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "enabled": settings.admission_enabled,
+            "limit": int(self.limit),
+            "min_limit": self.min_limit,
+            "max_limit": self.max_limit,
+            "in_flight": self.in_flight,
+            "waiting": {priority.name: self._waiting[priority.rank] for priority in PRIORITIES},
+            "max_waiting": self.max_waiting,
+            "latency_ms": round(self.latency * 1000, 3),
+            "target_latency_ms": self.target_latency * 1000,
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "rejected": dict(self.rejected),
+            "timed_out": dict(self.timed_out),
+            "shed": sum(self.rejected.values()) + sum(self.timed_out.values()),
+            "increases": self.increases,
+            "decreases": self.decreases,
+        }
+
+
+class _Slot:
+    __slots__ = ("controller", "priority", "measure", "started")
+
+    def __init__(self, controller: AdmissionController, priority: Priority, measure: bool):
+        self.controller = controller
+        self.priority = priority
+        self.measure = measure
+        self.started = 0.0
+
+    async def __aenter__(self):
+        await self.controller.acquire(self.priority)
+        self.started = time.perf_counter()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.controller.release(time.perf_counter() - self.started if self.measure else None)
+        return False
+
+
+admission = AdmissionController(
+    settings.admission_limit, settings.admission_min_limit, settings.admission_max_limit,
+    settings.admission_target_latency, settings.admission_deadlines, settings.admission_max_queue)
@@ -1,21 +1,135 @@
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
-from typing import List, Optional
-import pyodbc
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from functools import partial
+
+from fastapi import FastAPI, Header, HTTPException, Query, Request, Response
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, Field, field_validator, model_validator
+from typing import Annotated, Any, Callable, Dict, Generic, List, Literal, Optional, Sequence, Tuple, Type, TypeVar, Union
+
+import repository
+from admission import BACKGROUND, CRITICAL, SCAN, Overloaded, admission
+from batching import insert, write_stats
+from cache import entity_cache, read_many, read_through
+from checkin import ADMITTED, DUPLICATE, checkin_desk
+from compression import CompressionMiddleware
+from config import settings
+from bulk import BulkDelete, BulkResult, bulk_create, bulk_delete, bulk_update
+from db import (
+    close_pool, executor_stats, get_pool, init_replicas, replica_stats, replicas_enabled, run_db, shutdown_executor)
+from etag import PreconditionFailed, compute_etag, is_not_modified, not_modified
+from export import export_response
+from feed import ticket_feed
+from metrics import InstrumentedRoute, MetricsMiddleware, metrics, timed_build
+from pagination import DEFAULT_LIMIT, MAX_LIMIT, InvalidPageRequest, decode_cursor, encode_cursor, parse_order_by
+from pool import PoolTimeout
+from purchase import (
+    MAX_PURCHASE_SIZE, HoldMismatch, SoldOut, confirm_hold, create_hold, purchase, purchase_queue, release_hold,
+    sweep_expired_holds)
+from refdata import reference_data, refresh_periodically
+from relations import INCLUDE_COLUMNS, event_detail, events_page, parse_include
+from replicas import ReadRoutingMiddleware
+from sales import (
+    event_stats, events_of_tickets, organizer_stats, reconcile_periodically, sales_stats, tickets_of_attendees)
+from search import event_index, rebuild_from_db as rebuild_search_index
+from timeline import event_timeline, naive_utc, rebuild_from_db as rebuild_timeline
+from serialization import batch_response, fast_page_response, sparse_response
+
+
+logger = logging.getLogger(__name__)
+
+
+async def build_index(name: str, rebuild: Callable, index: Any):
+    try:
+        await run_db("events", rebuild, index, priority=BACKGROUND)
+    except Exception:
+        logger.error("%s build failed", name, exc_info=True)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if settings.db_replicas:
+        init_replicas()
+    # Прогреваем пул, чтобы первые запросы не платили за handshake
+    try:
+        get_pool().prewarm()
+    except Exception:
+        logger.warning("connection pool prewarm failed", exc_info=True)
+    sweeper = asyncio.create_task(sweep_expired_holds(settings.hold_sweep_interval))
+    reconciler = None
+    if settings.sales_reconcile_interval > 0:
+        reconciler = asyncio.create_task(reconcile_periodically(settings.sales_reconcile_interval))
+    refresher = None
+    if settings.refdata_path:
+        refresher = asyncio.create_task(refresh_periodically(settings.refdata_max_age))
+    # Индексы строятся в фоне: сервис принимает запросы сразу, их эндпоинты отвечают 503
+    builders = []
+    if settings.search_enabled:
+        builders.append(asyncio.create_task(build_index("search index", rebuild_search_index, event_index)))
+    if settings.timeline_enabled:
+        builders.append(asyncio.create_task(build_index("event timeline", rebuild_timeline, event_timeline)))
+    yield
+    sweeper.cancel()
+    if reconciler is not None:
+        reconciler.cancel()
+    if refresher is not None:
+        refresher.cancel()
+    for builder in builders:
+        builder.cancel()
+    ticket_feed.close()
+    reference_data.close()
+    await checkin_desk.writer.drain()
+    await sales_stats.flush()
+    shutdown_executor()
+    close_pool()
+
+
+app = FastAPI(lifespan=lifespan)
+if settings.compression_min_size > 0:
+    app.add_middleware(
+        CompressionMiddleware, minimum_size=settings.compression_min_size,
+        gzip_level=settings.gzip_level, brotli_quality=settings.brotli_quality)
+app.add_middleware(ReadRoutingMiddleware, sticky_seconds=settings.replica_sticky_seconds, enabled=replicas_enabled)
+# Добавленное позже оборачивает добавленное раньше: метрики учитывают и сжатие
+if settings.metrics_enabled:
+    # route_class действует на маршруты, объявленные после присваивания
+    app.router.route_class = InstrumentedRoute
+    app.add_middleware(MetricsMiddleware)
+
+
+@app.exception_handler(PoolTimeout)
+def pool_timeout_handler(request: Request, exc: PoolTimeout):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Database is busy, try again later"},
+        headers={"Retry-After": "1"},
+    )
+
+
+@app.exception_handler(Overloaded)
+def overloaded_handler(request: Request, exc: Overloaded):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Server is overloaded, try again later"},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
 
+@app.exception_handler(PreconditionFailed)
+def precondition_failed_handler(request: Request, exc: PreconditionFailed):
+    return JSONResponse(status_code=412, content={"detail": "Resource was modified (If-Match failed)"})
 
-app = FastAPI()
 
-conn_str = (
-    r"DRIVER={ODBC Driver 17 for SQL Server};"
-    r"SERVER=(localdb)\MSSQLLocalDB;"
-    r"DATABASE=EventsPlatform;"
-    r"Trusted_Connection=yes;"
-)
+@app.exception_handler(SoldOut)
+def sold_out_handler(request: Request, exc: SoldOut):
+    return JSONResponse(status_code=409, content={"detail": "Not enough tickets left"})
 
 
-def get_connection():
-    return pyodbc.connect(conn_str)
+@app.exception_handler(HoldMismatch)
+def hold_mismatch_handler(request: Request, exc: HoldMismatch):
+    return JSONResponse(status_code=422, content={"detail": str(exc)})
 
 
 # Pydantic модели
@@ -51,18 +165,60 @@ class EventBase(BaseModel):
     description: Optional[str] = None
     organizer_id: int
     venue_id: int
-    start_date: Optional[str] = None
-    end_date: Optional[str] = None
+    start_date: Optional[datetime] = None
+    end_date: Optional[datetime] = None
+
+    @field_validator("start_date", "end_date")
+    @classmethod
+    def _to_utc(cls, value: Optional[datetime]) -> Optional[datetime]:
+        return naive_utc(value)
 
 
 class EventCreate(EventBase):
-    pass
+
+    @model_validator(mode="after")
+    def _check_dates(self):
+        if self.start_date and self.end_date and self.end_date < self.start_date:
+            raise ValueError("end_date is before start_date")
+        return self
 
 
 class EventRead(EventBase):
     id: int
 
 
+class EventUpdate(EventCreate):
+    id: int
+
+
+class SearchHit(EventRead):
+    score: float
+
+
+class CheckinRequest(BaseModel):
+    # Код с билета — id участника; либо email
+    attendee_id: Optional[int] = None
+    email: Optional[str] = None
+
+    @model_validator(mode="after")
+    def _one_key(self):
+        if (self.attendee_id is None) == (self.email is None):
+            raise ValueError("pass exactly one of attendee_id, email")
+        return self
+
+
+class CheckinRead(BaseModel):
+    event_id: int
+    attendee_id: int
+    status: Literal["admitted"]
+
+
+class VenueBookings(BaseModel):
+    venue_id: int
+    available: bool
+    bookings: List[EventRead]
+
+
 class TicketBase(BaseModel):
     event_id: int
     price: float
@@ -92,370 +248,907 @@ class AttendeeRead(AttendeeBase):
     id: int
 
 
+class PurchaseAttendee(BaseModel):
+    name: str
+    email: str
+
+
+class PurchaseRequest(BaseModel):
+    # Один билет на участника
+    attendees: List[PurchaseAttendee] = Field(min_length=1, max_length=MAX_PURCHASE_SIZE)
+
+
+class HoldCreate(BaseModel):
+    quantity: int = Field(ge=1, le=MAX_PURCHASE_SIZE)
+
+
+class HoldRead(HoldCreate):
+    id: int
+    ticket_id: int
+    expires_at: datetime
+
+
+class EventExpanded(EventRead):
+    # Заполняются только при ?include=...
+    organizer: Optional[OrganizerRead] = None
+    venue: Optional[VenueRead] = None
+    tickets: Optional[List[TicketRead]] = None
+
+
+class EventStats(BaseModel):
+    event_id: int
+    organizer_id: int
+    ticket_types: int
+    tickets_remaining: int
+    # Один участник — один проданный билет: это и число участников
+    tickets_sold: int
+    revenue: float
+
+
+class OrganizerStats(BaseModel):
+    organizer_id: int
+    events: int
+    ticket_types: int
+    tickets_remaining: int
+    tickets_sold: int
+    revenue: float
+
+
+class EventDetail(EventRead):
+    organizer: Optional[OrganizerRead] = None
+    venue: Optional[VenueRead] = None
+    tickets: List[TicketRead] = []
+    tickets_remaining: int = 0
+
+
+T = TypeVar("T")
+
+
+class Page(BaseModel, Generic[T]):
+    items: List[T]
+    # Непрозрачный курсор для параметра after; None — страниц больше нет
+    next_cursor: Optional[str] = None
+
+
+class Batch(BaseModel, Generic[T]):
+    # В порядке запрошенных id
+    items: List[T]
+    # Запрошенные id, которых нет в БД
+    missing: List[int]
+
+
+Limit = Annotated[int, Query(ge=1, le=MAX_LIMIT)]
+IfNoneMatch = Annotated[Optional[str], Header()]
+IfMatch = Annotated[Optional[str], Header()]
+ExportFormat = Annotated[Literal["ndjson", "csv"], Query(alias="format")]
+
+
+def conditional(response: Response, if_none_match: Optional[str], payload: Any, build: Callable[[], Any]):
+    """304 без построения моделей и сериализации, если клиент уже видел эту версию."""
+    etag = compute_etag(payload)
+    if is_not_modified(if_none_match, etag):
+        return not_modified(etag)
+    response.headers["ETag"] = etag
+    return timed_build(build)
+
+
+def parse_fields(repo: repository.Repository, value: Optional[str]) -> Optional[Tuple[str, ...]]:
+    try:
+        return repo.fields(value)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+
+async def read_page(
+    group: str,
+    repo: repository.Repository,
+    model: Type[BaseModel],
+    response: Response,
+    if_none_match: Optional[str],
+    limit: int,
+    after: Optional[str],
+    order_by: str,
+    filters: Optional[Dict[str, Any]] = None,
+    page_fn: Optional[Callable] = None,
+    fields: Optional[Tuple[str, ...]] = None,
+    required: Sequence[str] = (),
+):
+    """Страница списка. fields сужает SELECT (?fields=); required — колонки,
+    нужные page_fn сверх fields, в ответ они не попадают."""
+    try:
+        column, descending = parse_order_by(order_by, repo.sortable)
+        key = decode_cursor(after, order_by) if after else None
+    except InvalidPageRequest as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    filters = {name: value for name, value in (filters or {}).items() if value is not None}
+    columns = None if fields is None else tuple(dict.fromkeys(fields + tuple(required)))
+    rows, last_key = await run_db(
+        group, page_fn or repo.page, limit, column, descending, key, filters, columns, priority=SCAN)
+    next_cursor = encode_cursor(order_by, last_key) if last_key else None
+    if fields is not None:
+        # Колонка сортировки и required выбирались только ради курсора и связей
+        dropped = (set(columns) | {column}) - set(fields)
+        for row in rows:
+            for name in dropped:
+                row.pop(name, None)
+    if settings.fast_json or fields is not None:
+        return fast_page_response(rows, next_cursor, model, if_none_match)
+    return conditional(
+        response, if_none_match, {"items": rows, "next_cursor": next_cursor},
+        lambda: Page(items=[model(**row) for row in rows], next_cursor=next_cursor))
+
+
+def parse_ids(value: str) -> List[int]:
+    try:
+        ids = [int(item) for item in value.split(",") if item.strip()]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="ids must be a comma-separated list of integers")
+    if not ids or len(ids) > MAX_LIMIT:
+        raise HTTPException(status_code=400, detail=f"ids must list 1 to {MAX_LIMIT} ids")
+    return list(dict.fromkeys(ids))
+
+
+async def read_batch(
+    group: str, repo: repository.Repository, model: Type[BaseModel], ids: str, fields: Optional[str],
+):
+    """?ids=1,2,3: строки одним WHERE id IN (...) в порядке запроса,
+    отсутствующие id — в missing. Пагинация и фильтры списка не действуют.
+    Строки из снимка площадок и организаторов, кэша и уже идущих загрузок
+    в запрос не попадают."""
+    ids, columns = parse_ids(ids), parse_fields(repo, fields)
+    rows: Dict[int, Any] = reference_data.get_many(group, ids)
+    rest = [item_id for item_id in ids if item_id not in rows]
+    if rest:
+        rows.update(await read_many(group, rest, partial(run_db, group, repo.get_many)))
+    found = [rows[item_id] for item_id in ids if rows[item_id] is not None]
+    missing = [item_id for item_id in ids if rows[item_id] is None]
+    if columns is not None:
+        return batch_response([{column: row[column] for column in columns} for row in found], missing, model)
+    return Batch(items=[model(**row) for row in found], missing=missing)
+
+
+def require_ready(index: Any, enabled: bool, name: str):
+    """Эндпоинты индексов в памяти: 503, пока индекс строится при старте."""
+    if not index.ready:
+        if not enabled:
+            raise HTTPException(status_code=404, detail=f"{name} is disabled")
+        raise HTTPException(status_code=503, detail=f"{name} is being built", headers={"Retry-After": "1"})
+
+
+def index_events(events: List[Tuple[int, Dict[str, Any]]]):
+    """Записанные события — в поисковый индекс и ленту по датам, в сводки
+    продаж: у события мог смениться организатор."""
+    event_index.upsert_many(events)
+    event_timeline.upsert_many(events)
+    sales_stats.events_written(events)
+
+
+def tickets_written(tickets: List[Tuple[int, Dict[str, Any]]]):
+    """Записанные билеты — в индексы прохода, поток изменений билетов и
+    сводки продаж."""
+    checkin_desk.tickets_written(tickets)
+    ticket_feed.tickets_written(tickets)
+    sales_stats.tickets_written(tickets)
+
+
+def attendees_created(attendees: List[Tuple[int, Dict[str, Any]]]):
+    """Новые участники — в индексы прохода, их билеты — в поток изменений
+    и сводки продаж: покупка меняет остаток и выручку."""
+    checkin_desk.attendees_written(attendees)
+    ticket_feed.attendees_written(attendees)
+    sales_stats.attendees_written(attendees)
+
+
+def attendees_updated(attendees: List[Tuple[int, Dict[str, Any]]]):
+    """Изменённые участники — в индексы прохода, их билеты — в сводки продаж:
+    участника могли перенести на другой билет."""
+    checkin_desk.attendees_written(attendees)
+    sales_stats.attendees_written(attendees)
+
+
+def unindex_events(event_ids: Sequence[int]):
+    event_index.remove_many(event_ids)
+    event_timeline.remove_many(event_ids)
+    sales_stats.events_changed(event_ids)
+
+
 # --- Organizers CRUD ---
 
 @app.post("/organizers/", response_model=OrganizerRead)
-def create_organizer(org: OrganizerCreate):
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute(
-        "INSERT INTO organizers (name, contact_info) OUTPUT INSERTED.id VALUES (?, ?)",
-        org.name, org.contact_info
-    )
-    new_id = cursor.fetchone()[0]
-    conn.commit()
-    cursor.close()
-    conn.close()
+async def create_organizer(org: OrganizerCreate):
+    new_id = await run_db("organizers", repository.organizers.insert, org.model_dump())
+    await reference_data.refresh()
     return OrganizerRead(id=new_id, **org.model_dump())
 
 
-@app.get("/organizers/", response_model=List[OrganizerRead])
-def read_organizers():
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT id, name, contact_info FROM organizers")
-    rows = cursor.fetchall()
-    cursor.close()
-    conn.close()
-    return [OrganizerRead(id=row[0], name=row[1], contact_info=row[2]) for row in rows]
+@app.get("/organizers/", response_model=Union[Page[OrganizerRead], Batch[OrganizerRead]])
+async def read_organizers(
+    response: Response,
+    limit: Limit = DEFAULT_LIMIT,
+    after: Optional[str] = None,
+    order_by: str = "id",
+    fields: Optional[str] = None,
+    ids: Optional[str] = None,
+    if_none_match: IfNoneMatch = None,
+):
+    if ids is not None:
+        return await read_batch("organizers", repository.organizers, OrganizerRead, ids, fields)
+    return await read_page(
+        "organizers", repository.organizers, OrganizerRead, response, if_none_match, limit, after, order_by,
+        fields=parse_fields(repository.organizers, fields))
+
+
+@app.get("/organizers/export")
+async def export_organizers(export_format: ExportFormat = "ndjson", fields: Optional[str] = None):
+    return export_response(repository.organizers, export_format, parse_fields(repository.organizers, fields))
+
+
+@app.post("/organizers/bulk", response_model=BulkResult)
+async def create_organizers_bulk(request: Request, atomic: bool = False):
+    result = await bulk_create(request, "organizers", repository.organizers, OrganizerCreate, atomic)
+    await reference_data.refresh()
+    return result
+
+
+@app.put("/organizers/bulk", response_model=BulkResult)
+async def update_organizers_bulk(request: Request, atomic: bool = False):
+    result = await bulk_update(request, "organizers", repository.organizers, OrganizerRead, atomic)
+    await reference_data.refresh()
+    return result
+
+
+@app.delete("/organizers/bulk", response_model=BulkResult)
+async def delete_organizers_bulk(body: BulkDelete, atomic: bool = False):
+    result = await bulk_delete(body.ids, "organizers", repository.organizers, atomic)
+    await reference_data.refresh()
+    return result
 
 
 @app.get("/organizers/{organizer_id}", response_model=OrganizerRead)
-def read_organizer(organizer_id: int):
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT id, name, contact_info FROM organizers WHERE id=?", organizer_id)
-    row = cursor.fetchone()
-    cursor.close()
-    conn.close()
+async def read_organizer(
+    organizer_id: int, response: Response, fields: Optional[str] = None, if_none_match: IfNoneMatch = None,
+):
+    columns = parse_fields(repository.organizers, fields)
+    # Строка целиком берётся из снимка хоста или кэша, поля выбираются из неё
+    row = reference_data.get("organizers", organizer_id) or await read_through(
+        "organizers", organizer_id, lambda: run_db("organizers", repository.organizers.get, organizer_id))
     if not row:
         raise HTTPException(status_code=404, detail="Organizer not found")
-    return OrganizerRead(id=row[0], name=row[1], contact_info=row[2])
+    if columns is not None:
+        return sparse_response({column: row[column] for column in columns}, OrganizerRead, if_none_match)
+    return conditional(response, if_none_match, row, lambda: OrganizerRead(**row))
+
+
+@app.get("/organizers/{organizer_id}/stats", response_model=OrganizerStats)
+async def read_organizer_stats(organizer_id: int):
+    """Продажи по всем событиям организатора: одна строка organizer_stats."""
+    await sales_stats.settle()
+    row = await run_db("organizers", organizer_stats, organizer_id)
+    if row is None:
+        raise HTTPException(status_code=404, detail="Organizer not found")
+    return OrganizerStats(**row)
 
 
 @app.put("/organizers/{organizer_id}", response_model=OrganizerRead)
-def update_organizer(organizer_id: int, org: OrganizerCreate):
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("UPDATE organizers SET name=?, contact_info=? WHERE id=?", org.name, org.contact_info, organizer_id)
-    if cursor.rowcount == 0:
-        cursor.close()
-        conn.close()
+async def update_organizer(organizer_id: int, org: OrganizerCreate, if_match: IfMatch = None):
+    if not await run_db("organizers", repository.organizers.update, organizer_id, org.model_dump(), if_match):
         raise HTTPException(status_code=404, detail="Organizer not found")
-    conn.commit()
-    cursor.close()
-    conn.close()
+    entity_cache.invalidate("organizers", organizer_id)
+    await reference_data.refresh()
     return OrganizerRead(id=organizer_id, **org.model_dump())
 
 
 @app.delete("/organizers/{organizer_id}")
-def delete_organizer(organizer_id: int):
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("DELETE FROM organizers WHERE id=?", organizer_id)
-    if cursor.rowcount == 0:
-        cursor.close()
-        conn.close()
+async def delete_organizer(organizer_id: int, if_match: IfMatch = None):
+    if not await run_db("organizers", repository.organizers.delete, organizer_id, if_match):
         raise HTTPException(status_code=404, detail="Organizer not found")
-    conn.commit()
-    cursor.close()
-    conn.close()
+    entity_cache.invalidate("organizers", organizer_id)
+    await reference_data.refresh()
     return {"detail": "Organizer deleted"}
 
 
 # --- Venues CRUD ---
 
 @app.post("/venues/", response_model=VenueRead)
-def create_venue(venue: VenueCreate):
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute(
-        "INSERT INTO venues (name, address) OUTPUT INSERTED.id VALUES (?, ?)",
-        venue.name, venue.address
-    )
-    new_id = cursor.fetchone()[0]
-    conn.commit()
-    cursor.close()
-    conn.close()
+async def create_venue(venue: VenueCreate):
+    new_id = await run_db("venues", repository.venues.insert, venue.model_dump())
+    await reference_data.refresh()
     return VenueRead(id=new_id, **venue.model_dump())
 
 
-@app.get("/venues/", response_model=List[VenueRead])
-def read_venues():
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT id, name, address FROM venues")
-    rows = cursor.fetchall()
-    cursor.close()
-    conn.close()
-    return [VenueRead(id=row[0], name=row[1], address=row[2]) for row in rows]
+@app.get("/venues/", response_model=Union[Page[VenueRead], Batch[VenueRead]])
+async def read_venues(
+    response: Response,
+    limit: Limit = DEFAULT_LIMIT,
+    after: Optional[str] = None,
+    order_by: str = "id",
+    fields: Optional[str] = None,
+    ids: Optional[str] = None,
+    if_none_match: IfNoneMatch = None,
+):
+    if ids is not None:
+        return await read_batch("venues", repository.venues, VenueRead, ids, fields)
+    return await read_page(
+        "venues", repository.venues, VenueRead, response, if_none_match, limit, after, order_by,
+        fields=parse_fields(repository.venues, fields))
+
+
+@app.get("/venues/export")
+async def export_venues(export_format: ExportFormat = "ndjson", fields: Optional[str] = None):
+    return export_response(repository.venues, export_format, parse_fields(repository.venues, fields))
+
+
+@app.post("/venues/bulk", response_model=BulkResult)
+async def create_venues_bulk(request: Request, atomic: bool = False):
+    result = await bulk_create(request, "venues", repository.venues, VenueCreate, atomic)
+    await reference_data.refresh()
+    return result
+
+
+@app.put("/venues/bulk", response_model=BulkResult)
+async def update_venues_bulk(request: Request, atomic: bool = False):
+    result = await bulk_update(request, "venues", repository.venues, VenueRead, atomic)
+    await reference_data.refresh()
+    return result
+
+
+@app.delete("/venues/bulk", response_model=BulkResult)
+async def delete_venues_bulk(body: BulkDelete, atomic: bool = False):
+    result = await bulk_delete(body.ids, "venues", repository.venues, atomic)
+    await reference_data.refresh()
+    return result
 
 
 @app.get("/venues/{venue_id}", response_model=VenueRead)
-def read_venue(venue_id: int):
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT id, name, address FROM venues WHERE id=?", venue_id)
-    row = cursor.fetchone()
-    cursor.close()
-    conn.close()
+async def read_venue(
+    venue_id: int, response: Response, fields: Optional[str] = None, if_none_match: IfNoneMatch = None,
+):
+    columns = parse_fields(repository.venues, fields)
+    row = reference_data.get("venues", venue_id) or await read_through(
+        "venues", venue_id, lambda: run_db("venues", repository.venues.get, venue_id))
     if not row:
         raise HTTPException(status_code=404, detail="Venue not found")
-    return VenueRead(id=row[0], name=row[1], address=row[2])
+    if columns is not None:
+        return sparse_response({column: row[column] for column in columns}, VenueRead, if_none_match)
+    return conditional(response, if_none_match, row, lambda: VenueRead(**row))
+
+
+@app.get("/venues/{venue_id}/bookings", response_model=VenueBookings)
+async def read_venue_bookings(
+    venue_id: int,
+    from_: Annotated[datetime, Query(alias="from")],
+    to: datetime,
+    limit: Limit = DEFAULT_LIMIT,
+):
+    """Занята ли площадка в [from, to): события, пересекающие интервал.
+    Из памяти (timeline.EventTimeline), без запроса к БД."""
+    start, end = naive_utc(from_), naive_utc(to)
+    if end <= start:
+        raise HTTPException(status_code=400, detail="to must be after from")
+    require_ready(event_timeline, settings.timeline_enabled, "Event timeline")
+    bookings = event_timeline.overlapping(venue_id, start, end, limit)
+    return VenueBookings(venue_id=venue_id, available=not bookings, bookings=bookings)
 
 
 @app.put("/venues/{venue_id}", response_model=VenueRead)
-def update_venue(venue_id: int, venue: VenueCreate):
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("UPDATE venues SET name=?, address=? WHERE id=?", venue.name, venue.address, venue_id)
-    if cursor.rowcount == 0:
-        cursor.close()
-        conn.close()
+async def update_venue(venue_id: int, venue: VenueCreate, if_match: IfMatch = None):
+    if not await run_db("venues", repository.venues.update, venue_id, venue.model_dump(), if_match):
         raise HTTPException(status_code=404, detail="Venue not found")
-    conn.commit()
-    cursor.close()
-    conn.close()
+    entity_cache.invalidate("venues", venue_id)
+    await reference_data.refresh()
     return VenueRead(id=venue_id, **venue.model_dump())
 
 
 @app.delete("/venues/{venue_id}")
-def delete_venue(venue_id: int):
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("DELETE FROM venues WHERE id=?", venue_id)
-    if cursor.rowcount == 0:
-        cursor.close()
-        conn.close()
+async def delete_venue(venue_id: int, if_match: IfMatch = None):
+    if not await run_db("venues", repository.venues.delete, venue_id, if_match):
         raise HTTPException(status_code=404, detail="Venue not found")
-    conn.commit()
-    cursor.close()
-    conn.close()
+    entity_cache.invalidate("venues", venue_id)
+    await reference_data.refresh()
     return {"detail": "Venue deleted"}
 
 
 # --- Events CRUD ---
 
 @app.post("/events/", response_model=EventRead)
-def create_event(event: EventCreate):
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute(
-        "INSERT INTO events (title, description, organizer_id, venue_id, start_date, end_date) OUTPUT INSERTED.id VALUES (?, ?, ?, ?, ?, ?)",
-        event.title, event.description, event.organizer_id, event.venue_id, event.start_date, event.end_date
-    )
-    new_id = cursor.fetchone()[0]
-    conn.commit()
-    cursor.close()
-    conn.close()
+async def create_event(event: EventCreate):
+    new_id = await run_db("events", repository.events.insert, event.model_dump())
+    index_events([(new_id, event.model_dump())])
     return EventRead(id=new_id, **event.model_dump())
 
 
-@app.get("/events/", response_model=List[EventRead])
-def read_events():
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT id, title, description, organizer_id, venue_id, start_date, end_date FROM events")
-    rows = cursor.fetchall()
-    cursor.close()
-    conn.close()
-    return [EventRead(
-        id=row[0], title=row[1], description=row[2], organizer_id=row[3],
-        venue_id=row[4], start_date=row[5], end_date=row[6]) for row in rows]
+# exclude_unset: без include связи не попадают в ответ вовсе
+@app.get(
+    "/events/", response_model=Union[Page[EventExpanded], Batch[EventExpanded]], response_model_exclude_unset=True)
+async def read_events(
+    response: Response,
+    limit: Limit = DEFAULT_LIMIT,
+    after: Optional[str] = None,
+    order_by: str = "id",
+    organizer_id: Optional[int] = None,
+    venue_id: Optional[int] = None,
+    from_: Annotated[Optional[datetime], Query(alias="from")] = None,
+    to: Optional[datetime] = None,
+    include: Optional[str] = None,
+    fields: Optional[str] = None,
+    ids: Optional[str] = None,
+    if_none_match: IfNoneMatch = None,
+):
+    """from/to — события с start_date в [from, to). По индексам
+    IX_events_start_date и IX_events_venue_id_start_date; с order_by=start_date
+    страница читается из индекса без сортировки."""
+    if ids is not None:
+        return await read_batch("events", repository.events, EventExpanded, ids, fields)
+    try:
+        included = parse_include(include)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    filters = {
+        "organizer_id": organizer_id, "venue_id": venue_id,
+        "start_date>=": naive_utc(from_), "start_date<": naive_utc(to),
+    }
+    page_fn = partial(events_page, include=included) if included else None
+    return await read_page(
+        "events", repository.events, EventExpanded, response, if_none_match, limit, after, order_by, filters,
+        page_fn, parse_fields(repository.events, fields), [INCLUDE_COLUMNS[name] for name in included])
+
+
+@app.get("/events/export")
+async def export_events(export_format: ExportFormat = "ndjson", fields: Optional[str] = None):
+    return export_response(repository.events, export_format, parse_fields(repository.events, fields))
+
+
+@app.get("/events/upcoming", response_model=Page[EventRead])
+async def read_upcoming_events(
+    days: Annotated[int, Query(ge=1, le=366)] = 7,
+    venue_id: Optional[int] = None,
+    limit: Limit = DEFAULT_LIMIT,
+    after: Optional[str] = None,
+):
+    """События, начинающиеся в ближайшие days дней, по времени начала.
+    Из памяти (timeline.EventTimeline), без запроса к БД."""
+    require_ready(event_timeline, settings.timeline_enabled, "Event timeline")
+    try:
+        key = decode_cursor(after, "upcoming") if after else None
+        key = (datetime.fromisoformat(key[0]), key[1]) if key else None
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="malformed cursor")
+    now = datetime.utcnow()
+    rows, last_key = event_timeline.starting(now, now + timedelta(days=days), limit, venue_id, key)
+    return Page(items=rows, next_cursor=encode_cursor("upcoming", last_key) if last_key else None)
+
+
+@app.get("/events/search", response_model=Page[SearchHit])
+async def search_events(
+    q: Annotated[str, Query(min_length=1, max_length=200)],
+    limit: Limit = DEFAULT_LIMIT,
+    after: Optional[str] = None,
+):
+    """Полнотекстовый поиск по title и description, лучшие совпадения первыми.
+    Последнее слово запроса ищется по префиксу."""
+    require_ready(event_index, settings.search_enabled, "Search index")
+    try:
+        key = decode_cursor(after, "relevance") if after else None
+    except InvalidPageRequest as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    # Ключ поиска — (score, id): курсор с другим значением не сравнить с ключами индекса
+    if key is not None and (isinstance(key[0], bool) or not isinstance(key[0], (int, float))
+                            or isinstance(key[1], bool)):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    hits, last_key = event_index.search(q, limit, key)
+    rows = await run_db("events", repository.events.get_many, [doc_id for doc_id, _ in hits]) if hits else {}
+    # Событие могли удалить между поиском и чтением строк
+    items = [SearchHit(score=score, **rows[doc_id]) for doc_id, score in hits if doc_id in rows]
+    return Page(items=items, next_cursor=encode_cursor("relevance", last_key) if last_key else None)
+
+
+@app.post("/events/bulk", response_model=BulkResult)
+async def create_events_bulk(request: Request, atomic: bool = False):
+    return await bulk_create(
+        request, "events", repository.events, EventCreate, atomic, on_created=index_events)
+
+
+@app.put("/events/bulk", response_model=BulkResult)
+async def update_events_bulk(request: Request, atomic: bool = False):
+    return await bulk_update(
+        request, "events", repository.events, EventUpdate, atomic, on_updated=index_events)
+
+
+@app.delete("/events/bulk", response_model=BulkResult)
+async def delete_events_bulk(body: BulkDelete, atomic: bool = False):
+    return await bulk_delete(body.ids, "events", repository.events, atomic, on_deleted=unindex_events)
 
 
 @app.get("/events/{event_id}", response_model=EventRead)
-def read_event(event_id: int):
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute(
-        "SELECT id, title, description, organizer_id, venue_id, start_date, end_date FROM events WHERE id=?", event_id)
-    row = cursor.fetchone()
-    cursor.close()
-    conn.close()
+async def read_event(
+    event_id: int, response: Response, fields: Optional[str] = None, if_none_match: IfNoneMatch = None,
+):
+    columns = parse_fields(repository.events, fields)
+    row = await read_through(
+        "events", event_id, lambda: run_db("events", repository.events.get, event_id))
     if not row:
         raise HTTPException(status_code=404, detail="Event not found")
-    return EventRead(
-        id=row[0], title=row[1], description=row[2], organizer_id=row[3],
-        venue_id=row[4], start_date=row[5], end_date=row[6])
+    if columns is not None:
+        return sparse_response({column: row[column] for column in columns}, EventRead, if_none_match)
+    return conditional(response, if_none_match, row, lambda: EventRead(**row))
+
+
+@app.get("/events/{event_id}/full", response_model=EventDetail)
+async def read_event_detail(event_id: int, response: Response, if_none_match: IfNoneMatch = None):
+    """Событие с организатором, площадкой и билетами за один запрос к БД."""
+    row = await run_db("events", event_detail, event_id)
+    if not row:
+        raise HTTPException(status_code=404, detail="Event not found")
+    return conditional(response, if_none_match, row, lambda: EventDetail(**row))
+
+
+@app.get("/events/{event_id}/stats", response_model=EventStats)
+async def read_event_stats(event_id: int):
+    """Продажи события: одна строка event_stats, без чтения билетов и участников."""
+    await sales_stats.settle()
+    row = await run_db("events", event_stats, event_id)
+    if row is None:
+        raise HTTPException(status_code=404, detail="Event not found")
+    return EventStats(**row)
+
+
+@app.post("/events/{event_id}/checkin", response_model=CheckinRead)
+async def check_in_attendee(event_id: int, body: CheckinRequest):
+    """Проход на входе по коду билета (id участника) или email: 404 — не
+    зарегистрирован на событие, 409 — уже прошёл. Проверка в памяти
+    (checkin.EventCheckin), запись прохода в БД — пачками в фоне."""
+    checkin = await checkin_desk.index(event_id)
+    if checkin is None:
+        raise HTTPException(status_code=404, detail="Event not found")
+    status, attendee_id = checkin_desk.check_in(checkin, body.attendee_id, body.email)
+    if status == DUPLICATE:
+        raise HTTPException(status_code=409, detail=f"Attendee {attendee_id} already checked in")
+    if status != ADMITTED:
+        raise HTTPException(status_code=404, detail="Attendee is not registered for this event")
+    return CheckinRead(event_id=event_id, attendee_id=attendee_id, status=status)
+
+
+@app.get("/events/{event_id}/checkin")
+async def read_checkin(event_id: int):
+    """Счётчики прохода; заодно загружает индекс до открытия дверей."""
+    checkin = await checkin_desk.index(event_id)
+    if checkin is None:
+        raise HTTPException(status_code=404, detail="Event not found")
+    return checkin.stats()
+
+
+@app.delete("/events/{event_id}/checkin")
+async def close_checkin(event_id: int):
+    """Освобождает память индекса прохода после события."""
+    if not checkin_desk.unload(event_id):
+        raise HTTPException(status_code=404, detail="Check-in is not open for this event")
+    return {"detail": "Check-in closed"}
+
+
+@app.get("/events/{event_id}/tickets/stream")
+async def stream_event_tickets(event_id: int, last_event_id: Annotated[Optional[str], Header()] = None):
+    """Изменения билетов события по SSE вместо опроса /tickets/: сначала
+    снимок (event: snapshot), затем пачки изменившихся билетов (event:
+    tickets). Переподключение с Last-Event-ID досылает пропущенное."""
+    if not settings.feed_enabled:
+        raise HTTPException(status_code=404, detail="Ticket feed is disabled")
+    channel = await ticket_feed.channel(event_id)
+    if channel is None:
+        raise HTTPException(status_code=404, detail="Event not found")
+    return StreamingResponse(
+        ticket_feed.stream(channel, last_event_id), media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 
 
 @app.put("/events/{event_id}", response_model=EventRead)
-def update_event(event_id: int, event: EventCreate):
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute(
-        "UPDATE events SET title=?, description=?, organizer_id=?, venue_id=?, start_date=?, end_date=? WHERE id=?",
-        event.title, event.description, event.organizer_id, event.venue_id, event.start_date, event.end_date, event_id
-    )
-    if cursor.rowcount == 0:
-        cursor.close()
-        conn.close()
+async def update_event(event_id: int, event: EventCreate, if_match: IfMatch = None):
+    if not await run_db("events", repository.events.update, event_id, event.model_dump(), if_match):
         raise HTTPException(status_code=404, detail="Event not found")
-    conn.commit()
-    cursor.close()
-    conn.close()
+    entity_cache.invalidate("events", event_id)
+    index_events([(event_id, event.model_dump())])
     return EventRead(id=event_id, **event.model_dump())
 
 
 @app.delete("/events/{event_id}")
-def delete_event(event_id: int):
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("DELETE FROM events WHERE id=?", event_id)
-    if cursor.rowcount == 0:
-        cursor.close()
-        conn.close()
+async def delete_event(event_id: int, if_match: IfMatch = None):
+    if not await run_db("events", repository.events.delete, event_id, if_match):
         raise HTTPException(status_code=404, detail="Event not found")
-    conn.commit()
-    cursor.close()
-    conn.close()
+    entity_cache.invalidate("events", event_id)
+    unindex_events([event_id])
     return {"detail": "Event deleted"}
 
 
 # --- Tickets CRUD ---
 
 @app.post("/tickets/", response_model=TicketRead)
-def create_ticket(ticket: TicketCreate):
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute(
-        "INSERT INTO tickets (event_id, price, ticket_type, quantity) OUTPUT INSERTED.id VALUES (?, ?, ?, ?)",
-        ticket.event_id, ticket.price, ticket.ticket_type, ticket.quantity
-    )
-    new_id = cursor.fetchone()[0]
-    conn.commit()
-    cursor.close()
-    conn.close()
+async def create_ticket(ticket: TicketCreate):
+    new_id = await insert("tickets", ticket.model_dump())
+    tickets_written([(new_id, ticket.model_dump())])
     return TicketRead(id=new_id, **ticket.model_dump())
 
 
-@app.get("/tickets/", response_model=List[TicketRead])
-def read_tickets():
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT id, event_id, price, ticket_type, quantity FROM tickets")
-    rows = cursor.fetchall()
-    cursor.close()
-    conn.close()
-    return [TicketRead(id=row[0], event_id=row[1], price=float(row[2]), ticket_type=row[3], quantity=row[4]) for row in rows]
+@app.get("/tickets/", response_model=Union[Page[TicketRead], Batch[TicketRead]])
+async def read_tickets(
+    response: Response,
+    limit: Limit = DEFAULT_LIMIT,
+    after: Optional[str] = None,
+    order_by: str = "id",
+    event_id: Optional[int] = None,
+    fields: Optional[str] = None,
+    ids: Optional[str] = None,
+    if_none_match: IfNoneMatch = None,
+):
+    if ids is not None:
+        return await read_batch("tickets", repository.tickets, TicketRead, ids, fields)
+    filters = {"event_id": event_id}
+    return await read_page(
+        "tickets", repository.tickets, TicketRead, response, if_none_match, limit, after, order_by, filters,
+        fields=parse_fields(repository.tickets, fields))
+
+
+@app.get("/tickets/export")
+async def export_tickets(export_format: ExportFormat = "ndjson", fields: Optional[str] = None):
+    return export_response(repository.tickets, export_format, parse_fields(repository.tickets, fields))
+
+
+@app.post("/tickets/bulk", response_model=BulkResult)
+async def create_tickets_bulk(request: Request, atomic: bool = False):
+    return await bulk_create(
+        request, "tickets", repository.tickets, TicketCreate, atomic, on_created=tickets_written)
+
+
+@app.put("/tickets/bulk", response_model=BulkResult)
+async def update_tickets_bulk(request: Request, atomic: bool = False):
+    return await bulk_update(
+        request, "tickets", repository.tickets, TicketRead, atomic, on_updated=tickets_written)
+
+
+@app.delete("/tickets/bulk", response_model=BulkResult)
+async def delete_tickets_bulk(body: BulkDelete, atomic: bool = False):
+    # После удаления события билетов уже не узнать
+    events = await events_of_tickets(body.ids)
+    result = await bulk_delete(
+        body.ids, "tickets", repository.tickets, atomic, on_deleted=ticket_feed.tickets_deleted)
+    sales_stats.events_changed(events)
+    return result
+
+
+@app.post("/tickets/{ticket_id}/purchase", response_model=List[AttendeeRead])
+async def purchase_tickets(ticket_id: int, body: PurchaseRequest):
+    """Атомарно списывает билеты и создаёт участников; 409, если не хватает."""
+    created = await purchase(ticket_id, [person.model_dump() for person in body.attendees])
+    if created is None:
+        raise HTTPException(status_code=404, detail="Ticket not found")
+    attendees_created([(attendee["id"], attendee) for attendee in created])
+    return [AttendeeRead(**attendee) for attendee in created]
+
+
+@app.post("/tickets/{ticket_id}/holds", response_model=HoldRead)
+async def create_ticket_hold(ticket_id: int, body: HoldCreate):
+    hold = await run_db("tickets", create_hold, ticket_id, body.quantity, settings.hold_ttl, priority=CRITICAL)
+    if hold is None:
+        raise HTTPException(status_code=404, detail="Ticket not found")
+    ticket_feed.touch([ticket_id])
+    sales_stats.tickets_changed([ticket_id])
+    return HoldRead(**hold)
+
+
+@app.post("/holds/{hold_id}/purchase", response_model=List[AttendeeRead])
+async def confirm_ticket_hold(hold_id: int, body: PurchaseRequest):
+    created = await run_db(
+        "tickets", confirm_hold, hold_id, [person.model_dump() for person in body.attendees], priority=CRITICAL)
+    if created is None:
+        raise HTTPException(status_code=404, detail="Hold not found or expired")
+    attendees_created([(attendee["id"], attendee) for attendee in created])
+    return [AttendeeRead(**attendee) for attendee in created]
+
+
+@app.delete("/holds/{hold_id}")
+async def release_ticket_hold(hold_id: int):
+    ticket_id = await run_db("tickets", release_hold, hold_id, priority=CRITICAL)
+    if ticket_id is None:
+        raise HTTPException(status_code=404, detail="Hold not found")
+    ticket_feed.touch([ticket_id])
+    sales_stats.tickets_changed([ticket_id])
+    return {"detail": "Hold released"}
 
 
 @app.get("/tickets/{ticket_id}", response_model=TicketRead)
-def read_ticket(ticket_id: int):
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT id, event_id, price, ticket_type, quantity FROM tickets WHERE id=?", ticket_id)
-    row = cursor.fetchone()
-    cursor.close()
-    conn.close()
+async def read_ticket(
+    ticket_id: int, response: Response, fields: Optional[str] = None, if_none_match: IfNoneMatch = None,
+):
+    columns = parse_fields(repository.tickets, fields)
+    row = await run_db("tickets", repository.tickets.get, ticket_id, columns)
     if not row:
         raise HTTPException(status_code=404, detail="Ticket not found")
-    return TicketRead(id=row[0], event_id=row[1], price=float(row[2]), ticket_type=row[3], quantity=row[4])
+    if columns is not None:
+        return sparse_response(row, TicketRead, if_none_match)
+    return conditional(response, if_none_match, row, lambda: TicketRead(**row))
 
 
 @app.put("/tickets/{ticket_id}", response_model=TicketRead)
-def update_ticket(ticket_id: int, ticket: TicketCreate):
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute(
-        "UPDATE tickets SET event_id=?, price=?, ticket_type=?, quantity=? WHERE id=?",
-        ticket.event_id, ticket.price, ticket.ticket_type, ticket.quantity, ticket_id
-    )
-    if cursor.rowcount == 0:
-        cursor.close()
-        conn.close()
+async def update_ticket(ticket_id: int, ticket: TicketCreate, if_match: IfMatch = None):
+    # Билет могли перенести в другое событие: прежнее тоже пересчитывается
+    previous = await events_of_tickets([ticket_id])
+    if not await run_db("tickets", repository.tickets.update, ticket_id, ticket.model_dump(), if_match):
         raise HTTPException(status_code=404, detail="Ticket not found")
-    conn.commit()
-    cursor.close()
-    conn.close()
+    tickets_written([(ticket_id, ticket.model_dump())])
+    sales_stats.events_changed(previous)
     return TicketRead(id=ticket_id, **ticket.model_dump())
 
 
 @app.delete("/tickets/{ticket_id}")
-def delete_ticket(ticket_id: int):
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("DELETE FROM tickets WHERE id=?", ticket_id)
-    if cursor.rowcount == 0:
-        cursor.close()
-        conn.close()
+async def delete_ticket(ticket_id: int, if_match: IfMatch = None):
+    previous = await events_of_tickets([ticket_id])
+    if not await run_db("tickets", repository.tickets.delete, ticket_id, if_match):
         raise HTTPException(status_code=404, detail="Ticket not found")
-    conn.commit()
-    cursor.close()
-    conn.close()
+    ticket_feed.tickets_deleted([ticket_id])
+    sales_stats.events_changed(previous)
     return {"detail": "Ticket deleted"}
 
 
 # --- Attendees CRUD ---
 
 @app.post("/attendees/", response_model=AttendeeRead)
-def create_attendee(att: AttendeeCreate):
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute(
-        "INSERT INTO attendees (ticket_id, name, email) OUTPUT INSERTED.id VALUES (?, ?, ?)",
-        att.ticket_id, att.name, att.email
-    )
-    new_id = cursor.fetchone()[0]
-    conn.commit()
-    cursor.close()
-    conn.close()
+async def create_attendee(att: AttendeeCreate):
+    new_id = await insert("attendees", att.model_dump())
+    attendees_created([(new_id, att.model_dump())])
     return AttendeeRead(id=new_id, **att.model_dump())
 
 
-@app.get("/attendees/", response_model=List[AttendeeRead])
-def read_attendees():
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT id, ticket_id, name, email FROM attendees")
-    rows = cursor.fetchall()
-    cursor.close()
-    conn.close()
-    return [AttendeeRead(id=row[0], ticket_id=row[1], name=row[2], email=row[3]) for row in rows]
+@app.get("/attendees/", response_model=Union[Page[AttendeeRead], Batch[AttendeeRead]])
+async def read_attendees(
+    response: Response,
+    limit: Limit = DEFAULT_LIMIT,
+    after: Optional[str] = None,
+    order_by: str = "id",
+    ticket_id: Optional[int] = None,
+    email: Optional[str] = None,
+    fields: Optional[str] = None,
+    ids: Optional[str] = None,
+    if_none_match: IfNoneMatch = None,
+):
+    if ids is not None:
+        return await read_batch("attendees", repository.attendees, AttendeeRead, ids, fields)
+    filters = {"ticket_id": ticket_id, "email": email}
+    return await read_page(
+        "attendees", repository.attendees, AttendeeRead, response, if_none_match, limit, after, order_by, filters,
+        fields=parse_fields(repository.attendees, fields))
+
+
+@app.get("/attendees/export")
+async def export_attendees(export_format: ExportFormat = "ndjson", fields: Optional[str] = None):
+    return export_response(repository.attendees, export_format, parse_fields(repository.attendees, fields))
+
+
+@app.post("/attendees/bulk", response_model=BulkResult)
+async def create_attendees_bulk(request: Request, atomic: bool = False):
+    return await bulk_create(
+        request, "attendees", repository.attendees, AttendeeCreate, atomic, on_created=attendees_created)
+
+
+@app.put("/attendees/bulk", response_model=BulkResult)
+async def update_attendees_bulk(request: Request, atomic: bool = False):
+    return await bulk_update(
+        request, "attendees", repository.attendees, AttendeeRead, atomic, on_updated=attendees_updated)
+
+
+@app.delete("/attendees/bulk", response_model=BulkResult)
+async def delete_attendees_bulk(body: BulkDelete, atomic: bool = False):
+    tickets = await tickets_of_attendees(body.ids)
+    result = await bulk_delete(
+        body.ids, "attendees", repository.attendees, atomic, on_deleted=checkin_desk.attendees_deleted)
+    sales_stats.tickets_changed(tickets)
+    return result
 
 
 @app.get("/attendees/{attendee_id}", response_model=AttendeeRead)
-def read_attendee(attendee_id: int):
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT id, ticket_id, name, email FROM attendees WHERE id=?", attendee_id)
-    row = cursor.fetchone()
-    cursor.close()
-    conn.close()
+async def read_attendee(
+    attendee_id: int, response: Response, fields: Optional[str] = None, if_none_match: IfNoneMatch = None,
+):
+    columns = parse_fields(repository.attendees, fields)
+    row = await run_db("attendees", repository.attendees.get, attendee_id, columns)
     if not row:
         raise HTTPException(status_code=404, detail="Attendee not found")
-    return AttendeeRead(id=row[0], ticket_id=row[1], name=row[2], email=row[3])
+    if columns is not None:
+        return sparse_response(row, AttendeeRead, if_none_match)
+    return conditional(response, if_none_match, row, lambda: AttendeeRead(**row))
 
 
 @app.put("/attendees/{attendee_id}", response_model=AttendeeRead)
-def update_attendee(attendee_id: int, att: AttendeeCreate):
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute(
-        "UPDATE attendees SET ticket_id=?, name=?, email=? WHERE id=?",
-        att.ticket_id, att.name, att.email, attendee_id
-    )
-    if cursor.rowcount == 0:
-        cursor.close()
-        conn.close()
+async def update_attendee(attendee_id: int, att: AttendeeCreate, if_match: IfMatch = None):
+    previous = await tickets_of_attendees([attendee_id])
+    if not await run_db("attendees", repository.attendees.update, attendee_id, att.model_dump(), if_match):
         raise HTTPException(status_code=404, detail="Attendee not found")
-    conn.commit()
-    cursor.close()
-    conn.close()
+    attendees_updated([(attendee_id, att.model_dump())])
+    sales_stats.tickets_changed(previous)
     return AttendeeRead(id=attendee_id, **att.model_dump())
 
 
 @app.delete("/attendees/{attendee_id}")
-def delete_attendee(attendee_id: int):
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("DELETE FROM attendees WHERE id=?", attendee_id)
-    if cursor.rowcount == 0:
-        cursor.close()
-        conn.close()
+async def delete_attendee(attendee_id: int, if_match: IfMatch = None):
+    # Удаление — возврат билета: сводку события билета нужно пересчитать
+    previous = await tickets_of_attendees([attendee_id])
+    if not await run_db("attendees", repository.attendees.delete, attendee_id, if_match):
         raise HTTPException(status_code=404, detail="Attendee not found")
-    conn.commit()
-    cursor.close()
-    conn.close()
+    checkin_desk.attendees_deleted([attendee_id])
+    sales_stats.tickets_changed(previous)
     return {"detail": "Attendee deleted"}
+
+
+# --- Service ---
+
+@app.get("/stats/pool")
+async def read_pool_stats():
+    return get_pool().stats()
+
+
+@app.get("/stats/replicas")
+async def read_replica_stats():
+    return replica_stats()
+
+
+@app.get("/stats/executor")
+async def read_executor_stats():
+    return executor_stats()
+
+
+@app.get("/stats/cache")
+async def read_cache_stats():
+    return entity_cache.stats()
+
+
+@app.get("/stats/purchases")
+async def read_purchase_stats():
+    return purchase_queue.stats()
+
+
+@app.get("/stats/search")
+async def read_search_stats():
+    return event_index.stats()
+
+
+@app.get("/stats/timeline")
+async def read_timeline_stats():
+    return event_timeline.stats()
+
+
+@app.get("/stats/checkin")
+async def read_checkin_stats():
+    return checkin_desk.stats()
+
+
+@app.get("/stats/admission")
+async def read_admission_stats():
+    return admission.stats()
+
+
+@app.get("/stats/feed")
+async def read_feed_stats():
+    return ticket_feed.stats()
+
+
+@app.get("/stats/sales")
+async def read_sales_stats():
+    return sales_stats.stats()
+
+
+@app.post("/stats/sales/reconcile")
+async def reconcile_sales_stats():
+    """Сверка сводок продаж с нуля сейчас; ответ — отчёт о расхождениях."""
+    return await sales_stats.reconcile()
+
+
+@app.get("/stats/refdata")
+async def read_refdata_stats():
+    return reference_data.stats()
+
+
+@app.get("/stats/writes")
+async def read_write_stats():
+    return write_stats()
+
+
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def read_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,289 @@
+import itertools
+import sqlite3
+import threading
+from datetime import date, datetime
+from decimal import Decimal
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from config import settings
+
+
+SQLITE_SCHEMA = Path(__file__).with_name("sql") / "sqlite_schema.sql"
+
+
+class Backend:
+    """Диалект и подключение к конкретной СУБД.
+
+    Репозитории собирают SQL через эти методы, поэтому одинаково работают
+    на SQL Server и на SQLite. Базовая реализация — SQL Server.
+    """
+
+    name = "mssql"
+    # SELECT TOP (?) — лимит идёт первым параметром; LIMIT ? — последним
+    limit_param_first = True
+
+    def connect(self):
+        raise NotImplementedError
+
+    def pool_overrides(self) -> Dict[str, Any]:
+        return {}
+
+    def select_limited(self, select_list: str, rest: str) -> str:
+        return f"SELECT TOP (?) {select_list} {rest}"
+
+    def insert_returning_id(self, table: str, column_list: str, placeholders: str) -> str:
+        return f"INSERT INTO {table} ({column_list}) OUTPUT INSERTED.id VALUES ({placeholders})"
+
+    def insert_ordered_returning_ids(self, table: str, columns: Sequence[str], rows: int) -> str:
+        """INSERT пачки строк с выдачей IDENTITY в порядке параметра _ord."""
+        column_list = ", ".join(columns)
+        row_placeholder = "(" + ", ".join("?" for _ in columns) + ", ?)"
+        return (
+            f"INSERT INTO {table} ({column_list}) OUTPUT INSERTED.id "
+            f"SELECT {column_list} FROM (VALUES {', '.join([row_placeholder] * rows)}) "
+            f"AS src ({column_list}, _ord) ORDER BY _ord"
+        )
+
+    def update_returning(self, table: str, assignments: str, where: str, returning: Sequence[str]) -> str:
+        output = ", ".join(f"INSERTED.{column}" for column in returning)
+        return f"UPDATE {table} SET {assignments} OUTPUT {output} WHERE {where}"
+
+    def delete_returning(self, table: str, where: str, returning: Sequence[str]) -> str:
+        output = ", ".join(f"DELETED.{column}" for column in returning)
+        return f"DELETE FROM {table} OUTPUT {output} WHERE {where}"
+
+    def locked_select(self, select_list: str, table: str, where: str) -> str:
+        # UPDLOCK держит строку до конца транзакции
+        return f"SELECT {select_list} FROM {table} WITH (UPDLOCK, ROWLOCK) WHERE {where}"
+
+    def begin_write(self, cursor) -> None:
+        """Начинает пишущую транзакцию до первого чтения в ней."""
+
+    def executemany(self, cursor, sql: str, rows: Sequence[Sequence[Any]]) -> None:
+        cursor.fast_executemany = True
+        cursor.executemany(sql, rows)
+
+    def integrity_errors(self) -> Tuple[type, ...]:
+        """Исключения драйвера о нарушении ограничений: внешний ключ, UNIQUE, NOT NULL."""
+        try:
+            import pyodbc
+        except ImportError:
+            # Без драйвера к SQL Server не подключиться, и его ошибок не будет
+            return ()
+        return (pyodbc.IntegrityError,)
+
+
+class SqlServerBackend(Backend):
+
+    def __init__(self, conn_str: str):
+        self.conn_str = conn_str
+
+    def connect(self):
+        # pyodbc нужен только этому бэкенду: на SQLite драйвер ODBC не требуется
+        import pyodbc
+        return pyodbc.connect(self.conn_str)
+
+
+# --- SQLite ---
+
+def _adapt_datetime(value: datetime) -> str:
+    # Тот же ISO 8601, что в JSON и курсорах: даты сравниваются как строки
+    return value.isoformat()
+
+
+sqlite3.register_adapter(Decimal, float)
+sqlite3.register_adapter(datetime, _adapt_datetime)
+sqlite3.register_adapter(date, date.isoformat)
+
+_WRITE_KEYWORDS = {"INSERT", "UPDATE", "DELETE", "REPLACE"}
+
+
+class SQLiteCursor:
+    """Курсор sqlite3 с вызовами в стиле pyodbc: execute(sql, *params)."""
+
+    def __init__(self, conn: "SQLiteConnection"):
+        self._conn = conn
+        self._raw = conn.raw.cursor()
+
+    @property
+    def rowcount(self) -> int:
+        return self._raw.rowcount
+
+    def execute(self, sql: str, *params):
+        if sql.lstrip().split(None, 1)[0].upper() in _WRITE_KEYWORDS:
+            self._conn.begin(immediate=True)
+        self._raw.execute(sql, params)
+        return self
+
+    def executemany(self, sql: str, rows):
+        self._conn.begin(immediate=True)
+        self._raw.executemany(sql, rows)
+
+    def fetchone(self):
+        return self._raw.fetchone()
+
+    def fetchall(self):
+        return self._raw.fetchall()
+
+    def fetchmany(self, size: int):
+        return self._raw.fetchmany(size)
+
+    def close(self) -> None:
+        self._raw.close()
+
+
+class SQLiteConnection:
+    """Соединение sqlite3 в режиме autocommit с явными транзакциями.
+
+    Пишущая транзакция всегда BEGIN IMMEDIATE: блокировка на запись берётся
+    сразу, а не повышается посреди транзакции, где SQLite отвечает
+    «database is locked» без ожидания.
+    """
+
+    def __init__(self, raw: sqlite3.Connection):
+        self.raw = raw
+
+    def begin(self, immediate: bool = False) -> None:
+        if not self.raw.in_transaction:
+            self.raw.execute("BEGIN IMMEDIATE" if immediate else "BEGIN")
+
+    def cursor(self) -> SQLiteCursor:
+        return SQLiteCursor(self)
+
+    def commit(self) -> None:
+        self.raw.commit()
+
+    def rollback(self) -> None:
+        self.raw.rollback()
+
+    def close(self) -> None:
+        self.raw.close()
+
+
+class SQLiteBackend(Backend):
+    """Встроенная БД для локальных и нагрузочных прогонов на Linux.
+
+    path — файл или ":memory:". Схема повторяет EventsPlatform
+    (sql/sqlite_schema.sql) и создаётся при первом подключении.
+    """
+
+    name = "sqlite"
+    limit_param_first = False
+    _memory_ids = itertools.count(1)
+
+    def __init__(self, path: str = ":memory:", busy_timeout: float = 5.0):
+        self.path = path
+        self.busy_timeout = busy_timeout
+        self.memory = path == ":memory:"
+        # Общая in-memory БД для всех соединений процесса; живёт, пока открыто
+        # якорное соединение
+        self._uri = f"file:eventsplatform{next(self._memory_ids)}?mode=memory&cache=shared" if self.memory else path
+        self._anchor: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._initialized = False
+
+    def _open(self) -> sqlite3.Connection:
+        raw = sqlite3.connect(
+            self._uri, uri=self.memory, timeout=self.busy_timeout,
+            isolation_level=None, check_same_thread=False)
+        raw.execute("PRAGMA foreign_keys = ON")
+        if not self.memory:
+            raw.execute("PRAGMA journal_mode = WAL")
+            raw.execute("PRAGMA synchronous = NORMAL")
+        return raw
+
+    def connect(self) -> SQLiteConnection:
+        with self._lock:
+            if not self._initialized:
+                anchor = self._open()
+                anchor.executescript(SQLITE_SCHEMA.read_text(encoding="utf-8"))
+                if self.memory:
+                    self._anchor = anchor
+                else:
+                    anchor.close()
+                self._initialized = True
+        return SQLiteConnection(self._open())
+
+    def pool_overrides(self) -> Dict[str, Any]:
+        # В общей памяти SQLite блокирует таблицы целиком и не ждёт
+        # освобождения — одно соединение на процесс
+        return {"min_size": 1, "max_size": 1} if self.memory else {}
+
+    def close(self) -> None:
+        with self._lock:
+            if self._anchor is not None:
+                self._anchor.close()
+                self._anchor = None
+            self._initialized = False
+
+    def select_limited(self, select_list: str, rest: str) -> str:
+        return f"SELECT {select_list} {rest} LIMIT ?"
+
+    def insert_returning_id(self, table: str, column_list: str, placeholders: str) -> str:
+        return f"INSERT INTO {table} ({column_list}) VALUES ({placeholders}) RETURNING id"
+
+    def insert_ordered_returning_ids(self, table: str, columns: Sequence[str], rows: int) -> str:
+        # Колонки подзапроса VALUES в SQLite называются column1, column2, ...
+        source = ", ".join(f"column{index}" for index in range(1, len(columns) + 1))
+        row_placeholder = "(" + ", ".join("?" for _ in columns) + ", ?)"
+        return (
+            f"INSERT INTO {table} ({', '.join(columns)}) "
+            f"SELECT {source} FROM (VALUES {', '.join([row_placeholder] * rows)}) "
+            f"ORDER BY column{len(columns) + 1} RETURNING id"
+        )
+
+    def update_returning(self, table: str, assignments: str, where: str, returning: Sequence[str]) -> str:
+        return f"UPDATE {table} SET {assignments} WHERE {where} RETURNING {', '.join(returning)}"
+
+    def delete_returning(self, table: str, where: str, returning: Sequence[str]) -> str:
+        return f"DELETE FROM {table} WHERE {where} RETURNING {', '.join(returning)}"
+
+    def locked_select(self, select_list: str, table: str, where: str) -> str:
+        return f"SELECT {select_list} FROM {table} WHERE {where}"
+
+    def begin_write(self, cursor) -> None:
+        # Блокировки строк в SQLite нет: берём блокировку БД на запись до чтения
+        cursor._conn.begin(immediate=True)
+
+    def executemany(self, cursor, sql: str, rows: Sequence[Sequence[Any]]) -> None:
+        cursor.executemany(sql, rows)
+
+    def integrity_errors(self) -> Tuple[type, ...]:
+        return (sqlite3.IntegrityError,)
+
+
+def create_backend(name: str, target: Optional[str] = None) -> Backend:
+    """target — строка подключения (mssql) или путь к файлу (sqlite);
+    по умолчанию — основная БД из настроек."""
+    if name == "mssql":
+        return SqlServerBackend(target or settings.conn_str)
+    if name == "sqlite":
+        return SQLiteBackend(target or settings.sqlite_path)
+    raise ValueError(f"unknown DB_BACKEND {name!r}, expected mssql or sqlite")
+
+
+def create_replica_backends() -> List[Backend]:
+    """Реплики для чтения из DB_REPLICAS, того же типа, что и основная БД."""
+    return [create_backend(settings.db_backend, target) for target in settings.db_replicas]
+
+
+_backend: Optional[Backend] = None
+_backend_lock = threading.Lock()
+
+
+def get_backend() -> Backend:
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = create_backend(settings.db_backend)
+    return _backend
+
+
+def set_backend(backend: Backend) -> Backend:
+    """Подменяет бэкенд процесса (тесты, бенчмарки); возвращает прежний."""
+    global _backend
+    with _backend_lock:
+        previous, _backend = _backend, backend
+    return previous
@@ -0,0 +1,154 @@
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import repository
+from admission import READ, Priority
+from config import settings
+from db import run_db
+
+
+logger = logging.getLogger(__name__)
+
+
+def _size_bucket(size: int) -> int:
+    """Верхняя граница корзины размера пачки: 1, 2, 4, 8, ..."""
+    return 1 << (size - 1).bit_length()
+
+
+class InsertBatcher:
+    """Групповой коммит вставок одной таблицы.
+
+    Вставки, пришедшие в течение window секунд (или пока не набралось
+    max_batch строк), уходят одним многострочным INSERT и одним commit:
+    сброс журнала транзакций делится на всю пачку. Каждый вызывающий
+    получает свой id; если пачка упала, строки повторяются по одной, и
+    ошибку получает только автор плохой строки.
+    """
+
+    def __init__(
+        self, group: str, repo: repository.Repository, window: float, max_batch: int, priority: Priority = READ,
+    ):
+        self.group = group
+        self.repo = repo
+        self.priority = priority
+        self.window = window
+        self.max_batch = max_batch
+        self._pending: List[Tuple[Dict[str, Any], asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._tasks: Set[asyncio.Task] = set()
+        self.rows = 0
+        self.batches = 0
+        self.failed_batches = 0
+        self.max_batch_seen = 0
+        self.batch_sizes: Dict[int, int] = {}
+
+    async def submit(self, data: Dict[str, Any]) -> int:
+        return await self.enqueue(data)
+
+    def enqueue(self, data: Dict[str, Any]) -> asyncio.Future:
+        """Как submit, но без ожидания: future с id строки для фоновой записи."""
+        loop = asyncio.get_running_loop()
+        # Привязка к циклу событий, как у PurchaseQueue
+        if self._loop is not loop:
+            self._pending = []
+            self._timer = None
+            self._loop = loop
+        future = loop.create_future()
+        self._pending.append((data, future))
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+        return future
+
+    async def drain(self) -> None:
+        """Записывает накопленное, не дожидаясь окна; для остановки сервиса."""
+        if self._loop is not asyncio.get_running_loop():
+            return
+        self._flush()
+        while self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        # Клиент уже отключился — его строку не вставляем
+        batch = [(data, future) for data, future in self._pending if not future.cancelled()]
+        self._pending = []
+        if not batch:
+            return
+        task = self._loop.create_task(self._run(batch))
+        # Держим ссылку, иначе задачу может собрать сборщик мусора
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: List[Tuple[Dict[str, Any], asyncio.Future]]) -> None:
+        size = len(batch)
+        self.batches += 1
+        self.max_batch_seen = max(self.max_batch_seen, size)
+        bucket = _size_bucket(size)
+        self.batch_sizes[bucket] = self.batch_sizes.get(bucket, 0) + 1
+        try:
+            if size == 1:
+                ids = [await run_db(self.group, self.repo.insert, batch[0][0], priority=self.priority)]
+            else:
+                ids = await run_db(
+                    self.group, self.repo.insert_many, [data for data, _ in batch], priority=self.priority)
+        except Exception as exc:
+            self.failed_batches += 1
+            if size == 1:
+                _resolve(batch[0][1], exc)
+                return
+            # Ошибка одной строки не должна ронять всю пачку: повторяем по одной
+            logger.warning("%s insert batch of %d failed, retrying one by one", self.repo.table, size, exc_info=True)
+            await asyncio.gather(*(self._run([item]) for item in batch))
+            return
+        self.rows += size
+        for (_, future), new_id in zip(batch, ids):
+            _resolve(future, new_id)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "window_ms": self.window * 1000,
+            "max_batch": self.max_batch,
+            "rows": self.rows,
+            "batches": self.batches,
+            "failed_batches": self.failed_batches,
+            "avg_batch": round(self.rows / self.batches, 2) if self.batches else 0.0,
+            "max_batch_seen": self.max_batch_seen,
+            # Распределение размеров пачек: граница корзины -> число пачек
+            "batch_sizes": {str(bucket): count for bucket, count in sorted(self.batch_sizes.items())},
+            "queued": len(self._pending),
+        }
+
+
+def _resolve(future: asyncio.Future, result: Any) -> None:
+    if future.done():
+        return
+    if isinstance(result, BaseException):
+        future.set_exception(result)
+    else:
+        future.set_result(result)
+
+
+writers = {
+    group: InsertBatcher(group, getattr(repository, group), settings.write_batch_window, settings.write_batch_max)
+    for group in ("attendees", "tickets")
+}
+
+
+async def insert(group: str, data: Dict[str, Any]) -> int:
+    """INSERT одной строки с групповым коммитом, если он включён."""
+    if settings.write_batching_enabled:
+        return await writers[group].submit(data)
+    return await run_db(group, getattr(repository, group).insert, data)
+
+
+def write_stats() -> Dict[str, Any]:
+    return {
+        "enabled": settings.write_batching_enabled,
+        "tables": {group: writer.stats() for group, writer in writers.items()},
+    }
@@ -0,0 +1,158 @@
+"""p99 латентность при 1000 одновременных клиентов: общий threadpool против
+выделенного пула потоков БД с лимитами по группам маршрутов.
+
+Драйвер БД имитируется: execute() блокирует поток на заданное время, как pyodbc.
+Часть клиентов запрашивает «тяжёлый» список attendees, остальные — короткие GET.
+
+    python benchmarks/bench_async.py --clients 1000 --slow-ms 1000 --fast-ms 2
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+MODES = {
+    # «до»: все запросы делят 40 потоков anyio, как синхронные def-обработчики
+    "threadpool": {"DB_EXECUTOR_WORKERS": "0"},
+    # «после»: выделенный пул потоков и лимиты DB_GROUP_LIMITS
+    "executor": {},
+}
+
+
+FAKE_ROWS = {
+    "organizers": (1, "Organizer", "org@example.com"),
+    "venues": (1, "Venue", "Main st. 1"),
+    "events": (1, "Event", None, 1, 1, None, None),
+    "tickets": (1, 1, 10.0, "standard", 100),
+}
+FAST_ROUTES = ("organizers", "venues", "events", "tickets")
+
+
+class SlowCursor:
+    def __init__(self, slow_s, fast_s):
+        self._slow_s = slow_s
+        self._fast_s = fast_s
+        self._rows = []
+        self.rowcount = 1
+
+    def execute(self, sql, *params):
+        table = sql.split(" FROM ")[1].split()[0] if " FROM " in sql else ""
+        time.sleep(self._slow_s if table == "attendees" and "WHERE" not in sql else self._fast_s)
+        if table == "attendees":
+            self._rows = [(i, 1, f"Guest {i}", f"guest{i}@example.com") for i in range(50)]
+        else:
+            self._rows = [FAKE_ROWS[table]]
+
+    def fetchone(self):
+        return self._rows[0] if self._rows else None
+
+    def fetchall(self):
+        return self._rows
+
+    def close(self):
+        pass
+
+
+class SlowConnection:
+    def __init__(self, slow_s, fast_s):
+        self._slow_s = slow_s
+        self._fast_s = fast_s
+
+    def cursor(self):
+        return SlowCursor(self._slow_s, self._fast_s)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def percentile(values, q):
+    values = sorted(values)
+    index = min(len(values) - 1, int(round(q / 100 * (len(values) - 1))))
+    return values[index]
+
+
+async def run_clients(args):
+    import httpx
+
+    import db
+    from app import app
+
+    db.init_pool(lambda: SlowConnection(args.slow_ms / 1000, args.fast_ms / 1000),
+                 min_size=0, health_check_idle=3600)
+    latencies = {"fast": [], "slow": []}
+    errors = 0
+
+    async def client(i, http):
+        nonlocal errors
+        kind = "slow" if i % args.slow_every == 0 else "fast"
+        url = "/attendees/" if kind == "slow" else f"/{FAST_ROUTES[i % len(FAST_ROUTES)]}/{i}"
+        started = time.perf_counter()
+        response = await http.get(url)
+        latencies[kind].append((time.perf_counter() - started) * 1000)
+        if response.status_code != 200:
+            errors += 1
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as http:
+        started = time.perf_counter()
+        await asyncio.gather(*(client(i, http) for i in range(args.clients)))
+        elapsed = time.perf_counter() - started
+
+    result = {"clients": args.clients, "elapsed_s": round(elapsed, 3), "errors": errors}
+    for kind, values in latencies.items():
+        result[kind] = {
+            "count": len(values),
+            "p50_ms": round(statistics.median(values), 1),
+            "p99_ms": round(percentile(values, 99), 1),
+        }
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=1000)
+    parser.add_argument("--slow-ms", type=float, default=1000.0)
+    parser.add_argument("--fast-ms", type=float, default=2.0)
+    parser.add_argument("--slow-every", type=int, default=10, help="каждый N-й клиент — тяжёлый запрос")
+    parser.add_argument("--mode", choices=sorted(MODES), help="запустить один режим (внутренний вызов)")
+    parser.add_argument("--json", help="сохранить результаты в файл")
+    args = parser.parse_args()
+
+    if args.mode:
+        print(json.dumps(asyncio.run(run_clients(args))))
+        return
+
+    results = {}
+    for mode, env in MODES.items():
+        # Каждый режим — отдельный процесс: настройки читаются из окружения при импорте
+        command = [sys.executable, __file__, "--mode", mode] + [
+            arg for arg in sys.argv[1:] if not arg.startswith("--json")]
+        output = subprocess.run(
+            command, env={**os.environ, **env}, check=True, capture_output=True, text=True).stdout
+        results[mode] = json.loads(output.strip().splitlines()[-1])
+
+    print(f"{'mode':<12}{'kind':<6}{'count':>7}{'p50 ms':>10}{'p99 ms':>10}")
+    for mode, result in results.items():
+        for kind in ("fast", "slow"):
+            row = result[kind]
+            print(f"{mode:<12}{kind:<6}{row['count']:>7}{row['p50_ms']:>10}{row['p99_ms']:>10}")
+    if args.json:
+        with open(args.json, "w") as fh:
+            json.dump(results, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
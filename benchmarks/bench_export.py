@@ -0,0 +1,170 @@
+"""Пропускная способность потоковой выгрузки /attendees/export (строк/с),
+время до первого байта и пик памяти в сравнении с «fetchall + модели + json».
+
+Драйвер БД имитируется курсором, который генерирует строки по fetchmany().
+
+    python benchmarks/bench_export.py --rows 200000
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+class GeneratedCursor:
+    def __init__(self, total):
+        self._total = total
+        self._next = 0
+
+    def execute(self, sql, *params):
+        self._next = 0
+
+    def _make(self, count):
+        start = self._next
+        stop = min(self._total, start + count)
+        self._next = stop
+        return [(i, i % 500 + 1, f"Guest {i}", f"guest{i}@example.com") for i in range(start, stop)]
+
+    def fetchmany(self, size):
+        return self._make(size)
+
+    def fetchall(self):
+        return self._make(self._total)
+
+    def close(self):
+        pass
+
+
+class GeneratedConnection:
+    def __init__(self, total):
+        self._total = total
+
+    def cursor(self):
+        return GeneratedCursor(self._total)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+async def _drive(app, path):
+    """Минимальный ASGI-клиент: httpx.ASGITransport буферизует тело целиком,
+    а нам нужно время прихода первого куска."""
+    query = path.split("?", 1)[1] if "?" in path else ""
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": path.split("?", 1)[0], "raw_path": path.encode(),
+        "query_string": query.encode(), "headers": [(b"host", b"bench")],
+        "client": ("127.0.0.1", 1), "server": ("bench", 80), "root_path": "",
+    }
+    done = asyncio.Event()
+    started = time.perf_counter()
+    first_byte = None
+    received = 0
+
+    async def receive():
+        if not hasattr(receive, "sent"):
+            receive.sent = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await done.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal first_byte, received
+        if message["type"] == "http.response.body":
+            if first_byte is None and message.get("body"):
+                first_byte = time.perf_counter() - started
+            received += len(message.get("body", b""))
+            if not message.get("more_body"):
+                done.set()
+
+    await app(scope, receive, send)
+    return time.perf_counter() - started, first_byte, received
+
+
+async def bench_stream(export_format, rows, trace_memory):
+    from app import app
+
+    if trace_memory:
+        tracemalloc.start()
+    elapsed, first_byte, received = await _drive(app, f"/attendees/export?format={export_format}")
+    result = {
+        "rows_per_s": round(rows / elapsed),
+        "first_byte_ms": round(first_byte * 1000, 1),
+        "elapsed_s": round(elapsed, 3),
+        "bytes": received,
+    }
+    if trace_memory:
+        result["peak_mem_mb"] = round(tracemalloc.get_traced_memory()[1] / 2 ** 20, 1)
+        tracemalloc.stop()
+    return result
+
+
+def bench_materialized(rows, trace_memory):
+    # Прежний путь: fetchall() -> список AttendeeRead -> одна JSON-строка
+    from app import AttendeeRead
+
+    if trace_memory:
+        tracemalloc.start()
+    started = time.perf_counter()
+    cursor = GeneratedConnection(rows).cursor()
+    cursor.execute("SELECT id, ticket_id, name, email FROM attendees")
+    fetched = cursor.fetchall()
+    models = [AttendeeRead(id=r[0], ticket_id=r[1], name=r[2], email=r[3]) for r in fetched]
+    body = json.dumps([m.model_dump() for m in models]).encode()
+    elapsed = time.perf_counter() - started
+    result = {
+        "rows_per_s": round(rows / elapsed),
+        "first_byte_ms": round(elapsed * 1000, 1),
+        "elapsed_s": round(elapsed, 3),
+        "bytes": len(body),
+    }
+    if trace_memory:
+        result["peak_mem_mb"] = round(tracemalloc.get_traced_memory()[1] / 2 ** 20, 1)
+        tracemalloc.stop()
+    return result
+
+
+def run_all(rows, trace_memory):
+    return {
+        "materialized": bench_materialized(rows, trace_memory),
+        "ndjson": asyncio.run(bench_stream("ndjson", rows, trace_memory)),
+        "csv": asyncio.run(bench_stream("csv", rows, trace_memory)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--json", help="сохранить результаты в файл")
+    args = parser.parse_args()
+
+    import db
+
+    db.init_pool(lambda: GeneratedConnection(args.rows), min_size=0, health_check_idle=3600)
+    # Скорость меряем без tracemalloc (он замедляет аллокации в разы), память — отдельным прогоном
+    results = run_all(args.rows, trace_memory=False)
+    for mode, row in run_all(args.rows, trace_memory=True).items():
+        results[mode]["peak_mem_mb"] = row["peak_mem_mb"]
+
+    print(f"{'mode':<14}{'rows/s':>10}{'first byte ms':>15}{'peak MB':>10}")
+    for mode, row in results.items():
+        print(f"{mode:<14}{row['rows_per_s']:>10}{row['first_byte_ms']:>15}{row['peak_mem_mb']:>10}")
+    if args.json:
+        with open(args.json, "w") as fh:
+            json.dump(results, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""Снимок площадок и организаторов (refdata.py): время сборки файла, его
+размер и задержка поиска по id в сравнении с запросом к БД и копией
+таблиц в словаре каждого процесса.
+
+БД — файл SQLite во временном каталоге; SQL Server по сети медленнее
+на сетевой круг, снимок от этого не зависит.
+
+    python benchmarks/bench_refdata.py --rows 1000 10000 100000 --json refdata.json
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def seed(conn, count):
+    conn.raw.executemany(
+        "INSERT INTO venues (id, name, address) VALUES (?, ?, ?)",
+        ((index, f"Venue {index}", f"{index} Main Street, Springfield") for index in range(1, count + 1)))
+    conn.raw.executemany(
+        "INSERT INTO organizers (id, name, contact_info) VALUES (?, ?, ?)",
+        ((index, f"Organizer {index}", f"org{index}@example.com") for index in range(1, count + 1)))
+    conn.commit()
+
+
+def measure(lookup, ids):
+    samples = []
+    for item_id in ids:
+        started = time.perf_counter()
+        lookup(item_id)
+        samples.append(time.perf_counter() - started)
+    return {
+        "p50_us": round(percentile(samples, 0.5) * 1e6, 2),
+        "p99_us": round(percentile(samples, 0.99) * 1e6, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10000, 100000],
+                        help="строк в каждой таблице")
+    parser.add_argument("--lookups", type=int, default=20000)
+    parser.add_argument("--builds", type=int, default=5)
+    parser.add_argument("--json", help="сохранить результаты в файл")
+    args = parser.parse_args()
+
+    import backends
+    import repository
+    from refdata import ReferenceData, build_snapshot
+
+    results = []
+    print(f"{'rows':>8}{'build ms':>10}{'file KiB':>10}{'copy KiB':>10}"
+          f"{'snap p50':>10}{'snap p99':>10}{'db p50':>9}{'db p99':>9}{'dict p50':>10}")
+    for count in args.rows:
+        directory = tempfile.mkdtemp()
+        try:
+            backend = backends.SQLiteBackend(os.path.join(directory, "bench.db"))
+            previous = backends.set_backend(backend)
+            conn = backend.connect()
+            seed(conn, count)
+            path = os.path.join(directory, "refdata.snap")
+
+            builds = []
+            for _ in range(args.builds):
+                started = time.perf_counter()
+                build_snapshot(conn, path)
+                builds.append(time.perf_counter() - started)
+
+            # То, что без снимка держал бы в памяти каждый процесс
+            tracemalloc.start()
+            copy = {row["id"]: row for row in repository.venues.find_in(conn, "id", list(range(1, count + 1)))}
+            copy_bytes = tracemalloc.get_traced_memory()[0]
+            tracemalloc.stop()
+
+            rng = random.Random(1)
+            ids = [rng.randint(1, count) for _ in range(args.lookups)]
+            snapshot = ReferenceData(path)
+            snapshot.get("venues", 1)
+            row = {
+                "rows": count,
+                "build_ms": round(percentile(builds, 0.5) * 1000, 2),
+                "file_bytes": os.path.getsize(path),
+                "copy_bytes": copy_bytes,
+                "snapshot": measure(lambda item_id: snapshot.get("venues", item_id), ids),
+                "db": measure(lambda item_id: repository.venues.get(conn, item_id), ids[:args.lookups // 10]),
+                "dict": measure(copy.get, ids),
+            }
+            results.append(row)
+            print(f"{count:>8}{row['build_ms']:>10}{row['file_bytes'] / 1024:>10.0f}{copy_bytes / 1024:>10.0f}"
+                  f"{row['snapshot']['p50_us']:>10}{row['snapshot']['p99_us']:>10}"
+                  f"{row['db']['p50_us']:>9}{row['db']['p99_us']:>9}{row['dict']['p50_us']:>10}")
+            conn.close()
+            backends.set_backend(previous)
+        finally:
+            shutil.rmtree(directory)
+    print("\nзадержки — микросекунды; copy — память словаря площадок в одном процессе")
+
+    if args.json:
+        with open(args.json, "w") as fh:
+            json.dump(results, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Поиск по событиям: время перестроения индекса, его объём в памяти и
+задержка запросов /events/search на синтетическом наборе событий.
+
+    python benchmarks/bench_search.py --events 100000 --json search.json
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+WORDS = [
+    "jazz", "rock", "opera", "festival", "concert", "night", "open", "air", "lecture", "workshop",
+    "python", "data", "summit", "conference", "theatre", "premiere", "gala", "market", "food", "wine",
+    "film", "screening", "quiz", "comedy", "stand", "up", "ballet", "symphony", "orchestra", "choir",
+]
+
+
+def event_rows(count, seed=1):
+    rng = random.Random(seed)
+    # Хвост редких слов, как названия городов и имена артистов
+    rare = [f"word{index}" for index in range(count // 10 or 1)]
+    vocabulary = WORDS + rare
+    for doc_id in range(1, count + 1):
+        title = " ".join(rng.choice(WORDS) for _ in range(3)) + f" {rng.choice(rare)}"
+        description = " ".join(rng.choice(vocabulary) for _ in range(20))
+        yield doc_id, title, description
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def measure_queries(index, queries, limit, repeat):
+    timings = {}
+    for query in queries:
+        samples = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            index.search(query, limit)
+            samples.append(time.perf_counter() - started)
+        timings[query] = samples
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--events", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--json", help="сохранить результаты в файл")
+    args = parser.parse_args()
+
+    from search import SearchIndex
+
+    queries = ["jazz", "jazz night ", "op", "rock festival conc", "word7 ", "nothing "]
+    results = []
+    for count in args.events:
+        index = SearchIndex()
+        # Строки готовим заранее: в rebuild_seconds только построение индекса
+        index.rebuild(list(event_rows(count)))
+        stats = index.stats()
+        print(f"\n{count} events: rebuild {stats['rebuild_seconds']} s, {stats['terms']} terms, "
+              f"{stats['postings']} postings, ~{stats['memory_bytes'] / 2 ** 20:.1f} MiB")
+        print(f"{'query':<22}{'p50 ms':>9}{'p95 ms':>9}")
+        timings = measure_queries(index, queries, args.limit, args.repeat)
+        for query, samples in timings.items():
+            row = {
+                "events": count, "query": query,
+                "p50_ms": round(percentile(samples, 0.5) * 1000, 3),
+                "p95_ms": round(percentile(samples, 0.95) * 1000, 3),
+                "rebuild_seconds": stats["rebuild_seconds"], "memory_bytes": stats["memory_bytes"],
+            }
+            results.append(row)
+            print(f"{query!r:<22}{row['p50_ms']:>9}{row['p95_ms']:>9}")
+
+    if args.json:
+        with open(args.json, "w") as fh:
+            json.dump(results, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
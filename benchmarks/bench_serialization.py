@@ -0,0 +1,99 @@
+"""Стоимость сериализации строки списка: модели Pydantic + response_model
+против быстрого режима FAST_JSON (строки БД прямо в orjson).
+
+«До» повторяет путь FastAPI: модель на каждую строку в обработчике, затем
+проверка Page[...] по response_model и dump_json. «После» — page_body.
+
+    python benchmarks/bench_serialization.py --rows 1000 100000 --json serialization.json
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from decimal import Decimal
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def attendee_rows(count):
+    return [{"id": i, "ticket_id": i % 300, "name": f"Guest {i}", "email": f"guest{i}@example.com"}
+            for i in range(count)]
+
+
+def ticket_rows(count):
+    # pyodbc отдаёт DECIMAL как Decimal
+    return [{"id": i, "event_id": i // 3, "price": Decimal("10.50"), "ticket_type": "standard", "quantity": 100}
+            for i in range(count)]
+
+
+def pydantic_path(model, adapter):
+    from app import Page
+
+    def run(rows):
+        page = Page(items=[model(**row) for row in rows], next_cursor=None)
+        return adapter.dump_json(adapter.validate_python(page))
+    return run
+
+
+def fast_path(model):
+    from serialization import page_body
+
+    def run(rows):
+        return page_body(rows, None, model)
+    return run
+
+
+def measure(fn, make_rows, count, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        # Свежие строки: page_body приводит float на месте
+        rows = make_rows(count)
+        started = time.perf_counter()
+        fn(rows)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 100000])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", help="сохранить результаты в файл")
+    args = parser.parse_args()
+
+    from pydantic import TypeAdapter
+
+    from app import AttendeeRead, Page, TicketRead
+    from serialization import orjson
+
+    datasets = {
+        "attendees": (AttendeeRead, attendee_rows),
+        "tickets": (TicketRead, ticket_rows),
+    }
+    results = []
+    print(f"encoder: {'orjson' if orjson is not None else 'json (orjson not installed)'}")
+    print(f"{'dataset':<11}{'rows':>8}{'pydantic us/row':>17}{'fast us/row':>13}{'speedup':>9}")
+    for name, (model, make_rows) in datasets.items():
+        adapter = TypeAdapter(Page[model])
+        for count in args.rows:
+            before = measure(pydantic_path(model, adapter), make_rows, count, args.repeat)
+            after = measure(fast_path(model), make_rows, count, args.repeat)
+            row = {
+                "dataset": name, "rows": count,
+                "pydantic_us_per_row": round(before / count * 1e6, 3),
+                "fast_us_per_row": round(after / count * 1e6, 3),
+                "speedup": round(before / after, 1),
+            }
+            results.append(row)
+            print(f"{name:<11}{count:>8}{row['pydantic_us_per_row']:>17}{row['fast_us_per_row']:>13}"
+                  f"{row['speedup']:>8}x")
+
+    if args.json:
+        with open(args.json, "w") as fh:
+            json.dump(results, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
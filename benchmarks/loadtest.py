@@ -0,0 +1,399 @@
+"""Нагрузочный прогон всех маршрутов из Postman-коллекции на засеянной БД:
+пропускная способность и p50/p95/p99 по маршрутам, результаты в JSON,
+ненулевой код выхода при регрессии относительно сохранённого прогона.
+
+Работает без сети: по умолчанию приложение крутится в этом же процессе на
+SQLite-файле, с --url запросы идут на локально запущенный сервер (тот же
+DB_BACKEND/SQLITE_PATH, засеять можно через --seed-only).
+
+    python benchmarks/loadtest.py --events 10000 --attendees 1000000 --duration 60 --json run.json
+    python benchmarks/loadtest.py --mix postman --baseline run.json --threshold 0.15
+    python benchmarks/loadtest.py --mix "GET /events/{event_id}=9,POST /attendees/=1"
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+COLLECTION = os.path.join(ROOT, "FastAPI Copy.postman_collection.json")
+ENTITIES = ("organizers", "venues", "events", "tickets", "attendees")
+
+MIXES = {
+    # 80% чтений событий и билетов, 15% регистраций участников, 5% изменений
+    "default": {
+        "GET /events/{event_id}": 30,
+        "GET /events/": 10,
+        "GET /tickets/{ticket_id}": 25,
+        "GET /tickets/": 15,
+        "POST /attendees/": 15,
+        "PUT /events/{event_id}": 2,
+        "PUT /tickets/{ticket_id}": 3,
+    },
+    # Все маршруты коллекции поровну (заполняется из коллекции)
+    "postman": {},
+}
+
+# Маршрут учитывается при сравнении, только если запросов хватает для p95
+MIN_SAMPLES = 50
+
+
+# --- Маршруты ---
+
+def load_routes(path: str = COLLECTION) -> List[str]:
+    """Маршруты коллекции в виде "GET /events/{event_id}"."""
+    with open(path, encoding="utf-8") as fh:
+        collection = json.load(fh)
+    routes: List[str] = []
+
+    def walk(items):
+        for item in items:
+            if "item" in item:
+                walk(item["item"])
+                continue
+            request = item["request"]
+            url = request["url"]["raw"] if isinstance(request["url"], dict) else request["url"]
+            path = re.sub(r":(\w+)", r"{\1}", url.replace("{{baseUrl}}", ""))
+            routes.append(f"{request['method']} {path}")
+
+    walk(collection["item"])
+    return routes
+
+
+def parse_mix(value: str, routes: List[str]) -> Dict[str, float]:
+    if value in MIXES:
+        return dict(MIXES[value]) or {route: 1.0 for route in routes}
+    mix: Dict[str, float] = {}
+    for item in value.split(","):
+        route, weight = item.rsplit("=", 1)
+        mix[route.strip()] = float(weight)
+    return mix
+
+
+class Dataset:
+    """Диапазоны id засеянных строк и id, созданных самим прогоном.
+
+    DELETE удаляет только то, что прогон создал сам: засеянные строки нужны
+    чтениям, а на них ссылаются внешние ключи.
+    """
+
+    def __init__(self, bounds: Dict[str, Tuple[int, int]], rng: random.Random):
+        self.bounds = bounds
+        self.rng = rng
+        self.created: Dict[str, Deque[int]] = {entity: deque() for entity in ENTITIES}
+
+    def pick(self, entity: str) -> int:
+        low, high = self.bounds[entity]
+        return self.rng.randint(low, high)
+
+    def body(self, entity: str) -> Dict[str, Any]:
+        number = self.rng.randint(1, 10 ** 9)
+        if entity == "organizers":
+            return {"name": f"Organizer {number}", "contact_info": f"org{number}@example.com"}
+        if entity == "venues":
+            return {"name": f"Venue {number}", "address": f"Street {number}"}
+        if entity == "events":
+            return {
+                "title": f"Event {number}", "description": None,
+                "organizer_id": self.pick("organizers"), "venue_id": self.pick("venues"),
+                "start_date": "2025-06-01", "end_date": "2025-06-02",
+            }
+        if entity == "tickets":
+            return {"event_id": self.pick("events"), "price": float(number % 500), "ticket_type": "standard",
+                    "quantity": 1000}
+        return {"ticket_id": self.pick("tickets"), "name": f"Guest {number}", "email": f"guest{number}@example.com"}
+
+    def request(self, route: str) -> Tuple[str, str, Optional[Dict[str, Any]]]:
+        method, template = route.split(" ", 1)
+        entity = template.strip("/").split("/")[0]
+        if "{" not in template:
+            if method == "GET":
+                params = ""
+                if entity == "tickets":
+                    params = f"?event_id={self.pick('events')}"
+                elif entity == "attendees":
+                    params = f"?ticket_id={self.pick('tickets')}"
+                return method, template + params, None
+            return method, template, self.body(entity)
+        if method == "DELETE":
+            created = self.created[entity]
+            # Нечего удалять — запрос к отсутствующему id, ответ 404
+            item_id = created.popleft() if created else self.bounds[entity][1] + 10 ** 9
+        else:
+            item_id = self.pick(entity)
+        path = re.sub(r"\{\w+\}", str(item_id), template)
+        return method, path, self.body(entity) if method == "PUT" else None
+
+
+# --- Засев ---
+
+def seed(events: int, attendees: int, rng: random.Random) -> Dict[str, Tuple[int, int]]:
+    """Заполняет пустую БД; соотношения сущностей фиксированы, значения
+    детерминированы зерном."""
+    import db
+    import repository
+
+    counts = {
+        "organizers": max(1, events // 20),
+        "venues": max(1, events // 10),
+        "events": events,
+        "tickets": events * 3,
+        "attendees": attendees,
+    }
+    bounds: Dict[str, Tuple[int, int]] = {}
+
+    def rows(entity: str, count: int):
+        if entity == "organizers":
+            return ({"name": f"Organizer {i}", "contact_info": f"org{i}@example.com"} for i in range(count))
+        if entity == "venues":
+            return ({"name": f"Venue {i}", "address": f"Street {i}"} for i in range(count))
+        if entity == "events":
+            low_o, high_o = bounds["organizers"]
+            low_v, high_v = bounds["venues"]
+            return ({
+                "title": f"Event {i}", "description": f"Description {i}",
+                "organizer_id": rng.randint(low_o, high_o), "venue_id": rng.randint(low_v, high_v),
+                "start_date": f"2025-{i % 12 + 1:02d}-{i % 28 + 1:02d}", "end_date": None,
+            } for i in range(count))
+        if entity == "tickets":
+            low, _ = bounds["events"]
+            return ({
+                "event_id": low + i // 3, "price": float(10 + i % 3 * 40),
+                "ticket_type": ("standard", "premium", "vip")[i % 3], "quantity": 1000,
+            } for i in range(count))
+        low, high = bounds["tickets"]
+        return ({
+            "ticket_id": rng.randint(low, high), "name": f"Guest {i}", "email": f"guest{i}@example.com",
+        } for i in range(count))
+
+    chunk = 10000
+    for entity in ENTITIES:
+        repo = getattr(repository, entity)
+        ids: List[int] = []
+        batch: List[Dict[str, Any]] = []
+        with db.get_connection() as conn:
+            for row in rows(entity, counts[entity]):
+                batch.append(row)
+                if len(batch) == chunk:
+                    ids.extend(repo.insert_many(conn, batch))
+                    batch = []
+            if batch:
+                ids.extend(repo.insert_many(conn, batch))
+        bounds[entity] = (min(ids), max(ids))
+        print(f"seeded {entity}: {len(ids)}", file=sys.stderr)
+    return bounds
+
+
+def existing_bounds() -> Dict[str, Tuple[int, int]]:
+    import db
+
+    bounds = {}
+    with db.get_connection() as conn:
+        cursor = conn.cursor()
+        for entity in ENTITIES:
+            cursor.execute(f"SELECT MIN(id), MAX(id) FROM {entity}")
+            low, high = cursor.fetchone()
+            if low is None:
+                raise SystemExit(f"table {entity} is empty, run without --skip-seed first")
+            bounds[entity] = (low, high)
+    return bounds
+
+
+# --- Прогон ---
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Ближайший ранг: значение, не меньше которого pct% выборки."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(pct / 100 * len(sorted_values) + 0.5 - 1e-9)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def summarize(latencies: List[float], errors: int, elapsed: float) -> Dict[str, Any]:
+    ordered = sorted(latencies)
+    return {
+        "requests": len(ordered),
+        "errors": errors,
+        "rps": round(len(ordered) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(ordered, 50) * 1000, 2),
+        "p95_ms": round(percentile(ordered, 95) * 1000, 2),
+        "p99_ms": round(percentile(ordered, 99) * 1000, 2),
+    }
+
+
+async def run_load(
+    client, dataset: Dataset, mix: Dict[str, float], concurrency: int,
+    duration: Optional[float], total: Optional[int],
+) -> Tuple[Dict[str, List[float]], Dict[str, int], Dict[str, Dict[str, int]], float]:
+    routes = list(mix)
+    weights = [mix[route] for route in routes]
+    latencies: Dict[str, List[float]] = {route: [] for route in routes}
+    errors: Dict[str, int] = {route: 0 for route in routes}
+    statuses: Dict[str, Dict[str, int]] = {route: {} for route in routes}
+    issued = 0
+    started = time.perf_counter()
+    deadline = started + duration if duration else None
+
+    async def worker():
+        nonlocal issued
+        while True:
+            if total is not None and issued >= total:
+                return
+            if deadline is not None and time.perf_counter() >= deadline:
+                return
+            issued += 1
+            route = dataset.rng.choices(routes, weights)[0]
+            method, path, body = dataset.request(route)
+            sent = time.perf_counter()
+            try:
+                response = await client.request(method, path, json=body)
+                status = response.status_code
+            except Exception:
+                status = 0
+            latencies[route].append(time.perf_counter() - sent)
+            statuses[route][str(status)] = statuses[route].get(str(status), 0) + 1
+            if not 200 <= status < 300:
+                errors[route] += 1
+            elif method == "POST" and "{" not in route:
+                dataset.created[route.split("/")[1]].append(response.json()["id"])
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, errors, statuses, time.perf_counter() - started
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    """Регрессии: p95 вырос или rps упал больше чем на threshold."""
+    problems = []
+    for route, now in current["routes"].items():
+        before = baseline.get("routes", {}).get(route)
+        if not before or min(now["requests"], before["requests"]) < MIN_SAMPLES:
+            continue
+        if before["p95_ms"] and now["p95_ms"] > before["p95_ms"] * (1 + threshold):
+            problems.append(f"{route}: p95 {before['p95_ms']} -> {now['p95_ms']} ms")
+        if before["rps"] and now["rps"] < before["rps"] * (1 - threshold):
+            problems.append(f"{route}: rps {before['rps']} -> {now['rps']}")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--events", type=int, default=1000)
+    parser.add_argument("--attendees", type=int, default=20000)
+    parser.add_argument("--mix", default="default", help="default, postman или \"ROUTE=weight,...\"")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=20.0, help="секунды прогона")
+    parser.add_argument("--requests", type=int, help="число запросов вместо --duration")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--backend", choices=("sqlite", "mssql"), default="sqlite")
+    parser.add_argument("--db", help="файл SQLite; по умолчанию временный")
+    parser.add_argument("--skip-seed", action="store_true", help="БД уже засеяна")
+    parser.add_argument("--seed-only", action="store_true")
+    parser.add_argument("--url", help="локальный сервер, например http://127.0.0.1:8000")
+    parser.add_argument("--json", help="сохранить результаты в файл")
+    parser.add_argument("--baseline", help="результаты прошлого прогона для сравнения")
+    parser.add_argument("--threshold", type=float, default=0.10, help="допустимое ухудшение, доля")
+    args = parser.parse_args()
+
+    import httpx
+
+    import backends
+    import db
+
+    routes = load_routes()
+    mix = parse_mix(args.mix, routes)
+    unknown = set(mix) - set(routes) - set(MIXES["default"])
+    if unknown:
+        parser.error(f"unknown routes in mix: {', '.join(sorted(unknown))}")
+
+    workdir = None
+    if args.backend == "sqlite":
+        path = args.db
+        if path is None:
+            workdir = tempfile.TemporaryDirectory()
+            path = os.path.join(workdir.name, "loadtest.db")
+        backends.set_backend(backends.SQLiteBackend(path))
+    else:
+        backends.set_backend(backends.create_backend("mssql"))
+    db.init_pool(**backends.get_backend().pool_overrides())
+
+    rng = random.Random(args.seed)
+    bounds = existing_bounds() if args.skip_seed else seed(args.events, args.attendees, rng)
+    if args.seed_only:
+        return
+
+    dataset = Dataset(bounds, rng)
+    duration = None if args.requests else args.duration
+
+    async def scenario():
+        if args.url:
+            client = httpx.AsyncClient(base_url=args.url, timeout=30)
+        else:
+            from app import app
+            client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=30)
+        async with client:
+            return await run_load(client, dataset, mix, args.concurrency, duration, args.requests)
+
+    latencies, errors, statuses, elapsed = asyncio.run(scenario())
+    db.close_pool()
+
+    result = {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "backend": args.backend,
+            "target": args.url or "in-process",
+            "events": bounds["events"][1] - bounds["events"][0] + 1,
+            "attendees": bounds["attendees"][1] - bounds["attendees"][0] + 1,
+            "mix": mix,
+            "concurrency": args.concurrency,
+            "elapsed_s": round(elapsed, 2),
+        },
+        "routes": {},
+    }
+    for route in mix:
+        result["routes"][route] = dict(summarize(latencies[route], errors[route], elapsed), status=statuses[route])
+    result["total"] = summarize(
+        [value for values in latencies.values() for value in values], sum(errors.values()), elapsed)
+
+    print(f"{'route':<34}{'req':>8}{'err':>6}{'rps':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    for route, row in list(result["routes"].items()) + [("TOTAL", result["total"])]:
+        print(f"{route:<34}{row['requests']:>8}{row['errors']:>6}{row['rps']:>9}"
+              f"{row['p50_ms']:>9}{row['p95_ms']:>9}{row['p99_ms']:>9}")
+    if args.json:
+        with open(args.json, "w") as fh:
+            json.dump(result, fh, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as fh:
+            problems = compare(result, json.load(fh), args.threshold)
+        if problems:
+            print(f"\nregressions above {args.threshold:.0%}:", file=sys.stderr)
+            for problem in problems:
+                print(f"  {problem}", file=sys.stderr)
+            sys.exit(1)
+    if workdir is not None:
+        workdir.cleanup()
+
+
+if __name__ == "__main__":
+    main()
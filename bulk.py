@@ -0,0 +1,189 @@
+import json
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Type
+
+from fastapi import HTTPException, Request
+from pydantic import BaseModel, ValidationError
+
+from admission import SCAN
+from backends import get_backend
+from cache import entity_cache
+from config import settings
+from db import run_db
+from repository import Repository
+
+
+# Уведомление о записанных строках: [(id, данные)] или [id] для удалённых
+OnWritten = Optional[Callable[[List[Tuple[int, Dict[str, Any]]]], None]]
+OnDeleted = Optional[Callable[[List[int]], None]]
+
+
+class BulkItemResult(BaseModel):
+    index: int
+    id: Optional[int] = None
+    error: Optional[Any] = None
+
+
+class BulkResult(BaseModel):
+    succeeded: int
+    failed: int
+    # В порядке входных элементов
+    results: List[BulkItemResult]
+
+
+class BulkDelete(BaseModel):
+    ids: List[int]
+
+
+def _result(results: Dict[int, BulkItemResult]) -> BulkResult:
+    ordered = [results[index] for index in sorted(results)]
+    failed = sum(1 for item in ordered if item.error is not None)
+    return BulkResult(succeeded=len(ordered) - failed, failed=failed, results=ordered)
+
+
+def _reject(results: Dict[int, BulkItemResult]):
+    # atomic=true: при любой ошибке ничего не записано
+    raise HTTPException(status_code=422, detail=_result(results).model_dump())
+
+
+def _constraint_error(exc: Exception) -> str:
+    return f"Constraint violation: {exc}"
+
+
+class _InvalidLine:
+    def __init__(self, message: str):
+        self.message = message
+
+
+async def read_items(request: Request) -> List[Any]:
+    """Тело запроса — JSON-массив или NDJSON (по объекту на строку).
+
+    Нераспарсенная строка NDJSON превращается в ошибку только своего элемента.
+    """
+    body = await request.body()
+    if request.headers.get("content-type", "").startswith(("application/x-ndjson", "application/jsonl")):
+        items: List[Any] = []
+        for line in body.splitlines():
+            if not line.strip():
+                continue
+            try:
+                items.append(json.loads(line))
+            except ValueError as exc:
+                items.append(_InvalidLine(str(exc)))
+    else:
+        try:
+            items = json.loads(body)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Body must be a JSON array or NDJSON")
+        if not isinstance(items, list):
+            raise HTTPException(status_code=400, detail="Body must be a JSON array or NDJSON")
+    if len(items) > settings.bulk_max_items:
+        raise HTTPException(status_code=413, detail=f"At most {settings.bulk_max_items} items per request")
+    return items
+
+
+def validate_items(
+    items: Sequence[Any], model: Type[BaseModel],
+) -> Tuple[List[Tuple[int, BaseModel]], Dict[int, BulkItemResult]]:
+    valid: List[Tuple[int, BaseModel]] = []
+    errors: Dict[int, BulkItemResult] = {}
+    for index, item in enumerate(items):
+        if isinstance(item, _InvalidLine):
+            errors[index] = BulkItemResult(index=index, error=f"Invalid JSON: {item.message}")
+            continue
+        try:
+            valid.append((index, model.model_validate(item)))
+        except ValidationError as exc:
+            errors[index] = BulkItemResult(
+                index=index, error=exc.errors(include_url=False, include_context=False, include_input=False))
+    return valid, errors
+
+
+async def bulk_create(
+    request: Request, group: str, repo: Repository, model: Type[BaseModel], atomic: bool,
+    on_created: OnWritten = None,
+) -> BulkResult:
+    valid, results = validate_items(await read_items(request), model)
+    if results and atomic:
+        _reject(results)
+    if valid:
+        rows = [item.model_dump() for _, item in valid]
+        try:
+            ids = await run_db(group, repo.insert_many, rows, priority=SCAN)
+        except get_backend().integrity_errors():
+            # Строка с неверным внешним ключом откатила всю пачку: повторяем
+            # по одной, как InsertBatcher, — ошибка достаётся своему элементу
+            ids = await run_db(group, repo.insert_each, rows, atomic, priority=SCAN)
+        created = []
+        for (index, _), row, new_id in zip(valid, rows, ids):
+            if isinstance(new_id, Exception):
+                results[index] = BulkItemResult(index=index, error=_constraint_error(new_id))
+            else:
+                results[index] = BulkItemResult(index=index, id=new_id)
+                created.append((new_id, row))
+        if atomic and len(created) < len(rows):
+            # Транзакция откачена на первой ошибке: называем её элемент
+            _reject({index: item for index, item in results.items() if item.error is not None})
+        if on_created is not None:
+            on_created(created)
+    return _result(results)
+
+
+async def bulk_update(
+    request: Request, group: str, repo: Repository, model: Type[BaseModel], atomic: bool,
+    on_updated: OnWritten = None,
+) -> BulkResult:
+    """Элементы — полные объекты с id (модель *Read или *Update)."""
+    valid, results = validate_items(await read_items(request), model)
+    if results and atomic:
+        _reject(results)
+    if valid:
+        fields = repo.columns
+        items = [(item.id, item.model_dump(include=set(fields))) for _, item in valid]
+        # Ошибки ограничений БД по позиции в items
+        failed: Dict[int, Exception] = {}
+        try:
+            try:
+                missing = await run_db(group, repo.update_many, items, atomic, priority=SCAN)
+            except get_backend().integrity_errors():
+                outcomes = await run_db(group, repo.update_each, items, atomic, priority=SCAN)
+                missing = {items[position][0] for position, outcome in enumerate(outcomes) if outcome is False}
+                failed = {
+                    position: outcome for position, outcome in enumerate(outcomes) if isinstance(outcome, Exception)}
+        finally:
+            entity_cache.invalidate_many(group, [item_id for item_id, _ in items])
+        for position, (index, item) in enumerate(valid):
+            if position in failed:
+                results[index] = BulkItemResult(index=index, id=item.id, error=_constraint_error(failed[position]))
+            elif item.id in missing:
+                results[index] = BulkItemResult(index=index, id=item.id, error="Not found")
+            else:
+                results[index] = BulkItemResult(index=index, id=item.id)
+        if failed and atomic:
+            _reject({index: item for index, item in results.items() if item.error is not None})
+        if missing and atomic:
+            _reject(results)
+        if on_updated is not None:
+            on_updated([
+                (item_id, data) for position, (item_id, data) in enumerate(items)
+                if item_id not in missing and position not in failed])
+    return _result(results)
+
+
+async def bulk_delete(
+    ids: Sequence[int], group: str, repo: Repository, atomic: bool, on_deleted: OnDeleted = None,
+) -> BulkResult:
+    if len(ids) > settings.bulk_max_items:
+        raise HTTPException(status_code=413, detail=f"At most {settings.bulk_max_items} items per request")
+    try:
+        missing = await run_db(group, repo.delete_many, list(ids), atomic, priority=SCAN) if ids else set()
+    finally:
+        entity_cache.invalidate_many(group, ids)
+    results = {
+        index: BulkItemResult(index=index, id=item_id, error="Not found" if item_id in missing else None)
+        for index, item_id in enumerate(ids)
+    }
+    if missing and atomic:
+        _reject(results)
+    if on_deleted is not None:
+        on_deleted([item_id for item_id in ids if item_id not in missing])
+    return _result(results)
@@ -0,0 +1,243 @@
+import asyncio
+import time
+from collections import OrderedDict
+from functools import partial
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterable, List, Optional, Sequence, Tuple
+
+from config import settings
+from replicas import pinned_to_primary, reads_from_replica
+
+
+_MISSING = object()
+
+
+class EntityCache:
+    """LRU-кэш одиночных сущностей с TTL по типу сущности.
+
+    Используется только из цикла событий, поэтому без блокировок. Кэш у
+    каждого воркера свой: инвалидация локальная, а устаревание в других
+    воркерах ограничено TTL.
+
+    Здесь же учитываются идущие загрузки (single-flight): одновременные
+    промахи по одному ключу ждут одну загрузку, а не идут в БД каждый.
+
+    Реплика может ещё не получить запись: строку, прочитанную из реплики
+    в течение replica_window секунд после инвалидации ключа, кэш не
+    сохраняет, иначе старая строка прожила бы весь TTL.
+    """
+
+    def __init__(
+        self, max_entries: int, ttls: Dict[str, float], enabled: bool = True, replica_window: float = 0.0,
+    ):
+        self.max_entries = max_entries
+        self.ttls = dict(ttls)
+        self.enabled = enabled
+        self.replica_window = replica_window
+        self._entries: "OrderedDict[Tuple[str, Hashable], Tuple[float, Any]]" = OrderedDict()
+        # Счётчик инвалидаций по сущности: защищает от записи в кэш значения,
+        # прочитанного из БД до конкурентного UPDATE/DELETE
+        self._generations: Dict[str, int] = {}
+        # Время последней инвалидации ключа, от старых к новым
+        self._invalidated_at: "OrderedDict[Tuple[str, Hashable], float]" = OrderedDict()
+        self._counters: Dict[str, Dict[str, int]] = {}
+        self._flights: Dict[Tuple[str, Hashable], asyncio.Future] = {}
+
+    def _count(self, entity: str, counter: str, amount: int = 1) -> None:
+        counters = self._counters.setdefault(
+            entity,
+            {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0, "invalidations": 0, "coalesced": 0,
+             "replica_skips": 0})
+        counters[counter] += amount
+
+    def caches(self, entity: str) -> bool:
+        return self.enabled and entity in self.ttls
+
+    def generation(self, entity: str) -> int:
+        return self._generations.get(entity, 0)
+
+    def get(self, entity: str, key: Hashable) -> Any:
+        entry = self._entries.get((entity, key))
+        if entry is None:
+            self._count(entity, "misses")
+            return _MISSING
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[(entity, key)]
+            self._count(entity, "expirations")
+            self._count(entity, "misses")
+            return _MISSING
+        self._entries.move_to_end((entity, key))
+        self._count(entity, "hits")
+        return value
+
+    def _recently_invalidated(self, entity: str, key: Hashable) -> bool:
+        horizon = time.monotonic() - self.replica_window
+        while self._invalidated_at and next(iter(self._invalidated_at.values())) <= horizon:
+            self._invalidated_at.popitem(last=False)
+        return (entity, key) in self._invalidated_at
+
+    def set(
+        self, entity: str, key: Hashable, value: Any, generation: Optional[int] = None, from_replica: bool = False,
+    ) -> None:
+        if generation is not None and generation != self.generation(entity):
+            return
+        if from_replica and self._recently_invalidated(entity, key):
+            self._count(entity, "replica_skips")
+            return
+        self._entries[(entity, key)] = (time.monotonic() + self.ttls[entity], value)
+        self._entries.move_to_end((entity, key))
+        while len(self._entries) > self.max_entries:
+            (evicted_entity, _), _ = self._entries.popitem(last=False)
+            self._count(evicted_entity, "evictions")
+
+    def invalidate(self, entity: str, key: Hashable) -> None:
+        self.invalidate_many(entity, (key,))
+
+    def invalidate_many(self, entity: str, keys: Iterable[Hashable]) -> None:
+        keys = list(keys)
+        # Загрузка, начатая до записи, может вернуть старое значение: новые
+        # читатели к ней не присоединяются
+        for key in keys:
+            self._flights.pop((entity, key), None)
+        if not self.caches(entity):
+            return
+        self._generations[entity] = self.generation(entity) + 1
+        now = time.monotonic()
+        for key in keys:
+            if self._entries.pop((entity, key), None) is not None:
+                self._count(entity, "invalidations")
+            if self.replica_window > 0:
+                self._invalidated_at[(entity, key)] = now
+                self._invalidated_at.move_to_end((entity, key))
+
+    # --- Идущие загрузки ---
+
+    def flight(self, entity: str, key: Hashable) -> Optional[asyncio.Future]:
+        """Идущая загрузка ключа в текущем цикле событий, если есть."""
+        future = self._flights.get((entity, key))
+        if future is None or future.get_loop() is not asyncio.get_running_loop():
+            return None
+        self._count(entity, "coalesced")
+        return future
+
+    def take_off(self, entity: str, key: Hashable, future: asyncio.Future) -> None:
+        self._flights[(entity, key)] = future
+        future.add_done_callback(partial(self._land, (entity, key)))
+
+    def _land(self, flight: Tuple[str, Hashable], future: asyncio.Future) -> None:
+        if self._flights.get(flight) is future:
+            del self._flights[flight]
+        if not future.cancelled():
+            # Ошибку получат ожидающие; если все отключились, не пишем в лог
+            # «exception was never retrieved»
+            future.exception()
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._flights.clear()
+        self._invalidated_at.clear()
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "size": len(self._entries),
+            "in_flight": len(self._flights),
+            "max_entries": self.max_entries,
+            "ttls": self.ttls,
+            "entities": {entity: dict(counters) for entity, counters in sorted(self._counters.items())},
+        }
+
+
+entity_cache = EntityCache(
+    settings.cache_max_entries, settings.cache_ttls, settings.cache_enabled, settings.replica_sticky_seconds)
+
+
+async def _load_one(entity: str, key: Hashable, load: Callable[[], Awaitable[Any]], generation: int) -> Any:
+    value = await load()
+    if value is not None and entity_cache.caches(entity):
+        entity_cache.set(entity, key, value, generation, reads_from_replica())
+    return value
+
+
+async def _load_batch(
+    entity: str, keys: List[Hashable], load_many: Callable[[List[Hashable]], Awaitable[Dict[Hashable, Any]]],
+    generation: int,
+) -> Dict[Hashable, Any]:
+    values = await load_many(keys)
+    if entity_cache.caches(entity):
+        from_replica = reads_from_replica()
+        for key, value in values.items():
+            entity_cache.set(entity, key, value, generation, from_replica)
+    return values
+
+
+def _distribute(futures: Dict[Hashable, asyncio.Future], batch: asyncio.Future) -> None:
+    for key, future in futures.items():
+        if future.done():
+            continue
+        if batch.cancelled():
+            future.cancel()
+        elif batch.exception() is not None:
+            future.set_exception(batch.exception())
+        else:
+            future.set_result(batch.result().get(key))
+
+
+async def read_through(entity: str, key: Hashable, load: Callable[[], Awaitable[Any]]) -> Any:
+    """Значение из кэша или из load(); None (не найдено) не кэшируется.
+
+    Одновременные промахи по ключу ждут одну загрузку. Загрузка идёт
+    отдельной задачей: отключение первого клиента не отменяет её для
+    остальных.
+
+    Запрос, закреплённый за primary (read-your-writes), мимо кэша и чужих
+    загрузок читает primary: в кэше может лежать строка из отстающей
+    реплики. Прочитанное заменяет её в кэше.
+    """
+    if pinned_to_primary():
+        return await _load_one(entity, key, load, entity_cache.generation(entity))
+    if entity_cache.caches(entity):
+        value = entity_cache.get(entity, key)
+        if value is not _MISSING:
+            return value
+    future = entity_cache.flight(entity, key)
+    if future is None:
+        future = asyncio.ensure_future(_load_one(entity, key, load, entity_cache.generation(entity)))
+        entity_cache.take_off(entity, key, future)
+    return await asyncio.shield(future)
+
+
+async def read_many(
+    entity: str, keys: Sequence[Hashable], load_many: Callable[[List[Hashable]], Awaitable[Dict[Hashable, Any]]],
+) -> Dict[Hashable, Any]:
+    """Значения по списку ключей, None — ключа нет. Из кэша, из уже идущих
+    загрузок этих ключей и одним load_many(ключи) для остальных.
+    Закреплённый за primary запрос читает все ключи сам, как в read_through."""
+    if pinned_to_primary():
+        loaded = await _load_batch(entity, list(dict.fromkeys(keys)), load_many, entity_cache.generation(entity))
+        return {key: loaded.get(key) for key in dict.fromkeys(keys)}
+    values: Dict[Hashable, Any] = {}
+    flights: Dict[Hashable, asyncio.Future] = {}
+    missing: List[Hashable] = []
+    for key in dict.fromkeys(keys):
+        if entity_cache.caches(entity):
+            value = entity_cache.get(entity, key)
+            if value is not _MISSING:
+                values[key] = value
+                continue
+        future = entity_cache.flight(entity, key)
+        if future is None:
+            missing.append(key)
+        else:
+            flights[key] = future
+    if missing:
+        loop = asyncio.get_running_loop()
+        batch = asyncio.ensure_future(_load_batch(entity, missing, load_many, entity_cache.generation(entity)))
+        futures = {key: loop.create_future() for key in missing}
+        for key, future in futures.items():
+            entity_cache.take_off(entity, key, future)
+        batch.add_done_callback(partial(_distribute, futures))
+        flights.update(futures)
+    for key, future in flights.items():
+        values[key] = await asyncio.shield(future)
+    return values
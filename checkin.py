@@ -0,0 +1,304 @@
+import asyncio
+import hashlib
+import logging
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+import repository
+from admission import CRITICAL
+from batching import InsertBatcher
+from config import settings
+from db import run_db
+
+
+logger = logging.getLogger(__name__)
+
+ADMITTED = "admitted"
+DUPLICATE = "duplicate"
+NOT_FOUND = "not_found"
+
+# ~1% ложных срабатываний фильтра Блума
+BLOOM_BITS_PER_ITEM = 10
+BLOOM_HASHES = 7
+
+_ATTENDEES_SQL = (
+    "SELECT a.id, a.email, c.attendee_id "
+    "FROM attendees a "
+    "JOIN tickets t ON t.id = a.ticket_id "
+    "LEFT JOIN checkins c ON c.attendee_id = a.id "
+    "WHERE t.event_id = ?"
+)
+
+
+def email_hash(email: str) -> int:
+    """64-битный хэш email без учёта регистра и пробелов по краям."""
+    digest = hashlib.blake2b(email.strip().casefold().encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "little")
+
+
+class BloomFilter:
+    """Битовый фильтр Блума над 64-битными хэшами; позиции — двойным
+    хэшированием половин хэша."""
+
+    __slots__ = ("bits", "size")
+
+    def __init__(self, capacity: int):
+        self.size = max(64, capacity * BLOOM_BITS_PER_ITEM)
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, value: int) -> Iterable[int]:
+        first, second = value & 0xFFFFFFFF, (value >> 32) | 1
+        return ((first + index * second) % self.size for index in range(BLOOM_HASHES))
+
+    def add(self, value: int) -> None:
+        for position in self._positions(value):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, value: int) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(value))
+
+
+class EventCheckin:
+    """Участники одного события для проверки на входе.
+
+    Вместо строк и словарей — параллельные массивы: хэши email с id
+    владельцев, упорядоченные по хэшу, и id участников с флагом «прошёл»,
+    упорядоченные по id. Около 25 байт на участника. Незнакомый email
+    отсекает фильтр Блума, без поиска по массиву.
+    """
+
+    __slots__ = ("event_id", "ticket_ids", "hashes", "owners", "ids", "checked", "bloom", "bloom_rejects")
+
+    def __init__(self, event_id: int, ticket_ids: Set[int], attendees: Sequence[Tuple[int, str, bool]]):
+        self.event_id = event_id
+        self.ticket_ids = ticket_ids
+        by_hash = sorted((email_hash(email), attendee_id) for attendee_id, email, _ in attendees)
+        self.hashes = array("Q", (value for value, _ in by_hash))
+        self.owners = array("q", (attendee_id for _, attendee_id in by_hash))
+        by_id = sorted((attendee_id, checked) for attendee_id, _, checked in attendees)
+        self.ids = array("q", (attendee_id for attendee_id, _ in by_id))
+        self.checked = bytearray(checked for _, checked in by_id)
+        self.bloom = BloomFilter(len(attendees))
+        for value in self.hashes:
+            self.bloom.add(value)
+        self.bloom_rejects = 0
+
+    def _position(self, attendee_id: int) -> Optional[int]:
+        position = bisect_left(self.ids, attendee_id)
+        if position < len(self.ids) and self.ids[position] == attendee_id:
+            return position
+        return None
+
+    def check_in_id(self, attendee_id: int) -> Tuple[str, Optional[int]]:
+        position = self._position(attendee_id)
+        if position is None:
+            return NOT_FOUND, None
+        if self.checked[position]:
+            return DUPLICATE, attendee_id
+        self.checked[position] = 1
+        return ADMITTED, attendee_id
+
+    def check_in_email(self, email: str) -> Tuple[str, Optional[int]]:
+        """Один email может быть у нескольких участников (купил на всю
+        компанию): проходит первый ещё не прошедший."""
+        value = email_hash(email)
+        if value not in self.bloom:
+            self.bloom_rejects += 1
+            return NOT_FOUND, None
+        first = None
+        for index in range(bisect_left(self.hashes, value), bisect_right(self.hashes, value)):
+            status, attendee_id = self.check_in_id(self.owners[index])
+            if status == ADMITTED:
+                return status, attendee_id
+            first = first or attendee_id
+        return (DUPLICATE, first) if first else (NOT_FOUND, None)
+
+    def add(self, attendee_id: int, email: str, checked: bool = False) -> None:
+        """Новый или изменённый участник; уже прошедший остаётся прошедшим."""
+        checked = self.remove(attendee_id) or checked
+        value = email_hash(email)
+        index = bisect_right(self.hashes, value)
+        self.hashes.insert(index, value)
+        self.owners.insert(index, attendee_id)
+        position = bisect_left(self.ids, attendee_id)
+        self.ids.insert(position, attendee_id)
+        self.checked.insert(position, 1 if checked else 0)
+        self.bloom.add(value)
+
+    def remove(self, attendee_id: int) -> bool:
+        """Возвращает, прошёл ли участник."""
+        position = self._position(attendee_id)
+        if position is None:
+            return False
+        checked = bool(self.checked[position])
+        del self.ids[position]
+        del self.checked[position]
+        # Поиск по owners линейный, но в C; удаление участника у входа — редкость
+        index = self.owners.index(attendee_id)
+        del self.hashes[index]
+        del self.owners[index]
+        return checked
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "event_id": self.event_id,
+            "attendees": len(self.ids),
+            "checked_in": self.checked.count(1),
+            "bloom_rejects": self.bloom_rejects,
+            "memory_bytes": (
+                len(self.hashes) * self.hashes.itemsize + len(self.owners) * self.owners.itemsize
+                + len(self.ids) * self.ids.itemsize + len(self.checked) + len(self.bloom.bits)),
+        }
+
+
+def load_event(conn, event_id: int) -> Optional[EventCheckin]:
+    """Участники события с отметками о проходе; None — события нет."""
+    cursor = conn.cursor()
+    cursor.execute("SELECT id FROM events WHERE id=?", event_id)
+    if not cursor.fetchone():
+        return None
+    cursor.execute("SELECT id FROM tickets WHERE event_id=?", event_id)
+    ticket_ids = {row[0] for row in cursor.fetchall()}
+    cursor.execute(_ATTENDEES_SQL, event_id)
+    attendees: List[Tuple[int, str, bool]] = []
+    while True:
+        rows = cursor.fetchmany(10000)
+        if not rows:
+            break
+        attendees.extend((attendee_id, email, checked is not None) for attendee_id, email, checked in rows)
+    return EventCheckin(event_id, ticket_ids, attendees)
+
+
+class CheckinDesk:
+    """Индексы прохода по событиям и фоновая запись проходов в БД.
+
+    Индекс события загружается при первом обращении (одновременные первые
+    запросы ждут одну загрузку) и обновляется при записи участников и
+    билетов. Держится не больше max_events индексов, вытесняется давно не
+    использованный. Проход отмечается в памяти сразу, в таблицу checkins
+    попадает пачками через InsertBatcher.
+
+    Состояние — в памяти процесса: событие проверяют в одном процессе, иначе
+    повторный проход через другой процесс поймает только UNIQUE в БД.
+    """
+
+    def __init__(self, max_events: int, writer: InsertBatcher):
+        self.max_events = max_events
+        self.writer = writer
+        self.events: "OrderedDict[int, EventCheckin]" = OrderedDict()
+        self._loading: Dict[int, asyncio.Task] = {}
+        # Изменения участников, пришедшие во время загрузки: применяются к
+        # загруженному индексу, иначе он отстанет от БД
+        self._changes: List[Tuple[str, Any]] = []
+        self.counts = {ADMITTED: 0, DUPLICATE: 0, NOT_FOUND: 0}
+        self.persisted = 0
+        self.persist_failed = 0
+
+    async def index(self, event_id: int) -> Optional[EventCheckin]:
+        checkin = self.events.get(event_id)
+        if checkin is not None:
+            self.events.move_to_end(event_id)
+            return checkin
+        task = self._loading.get(event_id)
+        if task is None or task.get_loop() is not asyncio.get_running_loop():
+            task = self._loading[event_id] = asyncio.ensure_future(self._load(event_id))
+        return await asyncio.shield(task)
+
+    async def _load(self, event_id: int) -> Optional[EventCheckin]:
+        try:
+            checkin = await run_db("attendees", load_event, event_id, priority=CRITICAL)
+        finally:
+            self._loading.pop(event_id, None)
+            changes = self._changes
+            if not self._loading:
+                self._changes = []
+        if checkin is None:
+            return None
+        for kind, change in changes:
+            self._apply(checkin, kind, change)
+        self.events[event_id] = checkin
+        while len(self.events) > self.max_events:
+            self.events.popitem(last=False)
+        return checkin
+
+    def check_in(
+        self, checkin: EventCheckin, attendee_id: Optional[int] = None, email: Optional[str] = None,
+    ) -> Tuple[str, Optional[int]]:
+        if attendee_id is not None:
+            status, attendee_id = checkin.check_in_id(attendee_id)
+        else:
+            status, attendee_id = checkin.check_in_email(email)
+        self.counts[status] += 1
+        if status == ADMITTED:
+            future = self.writer.enqueue({"attendee_id": attendee_id, "checked_in_at": datetime.utcnow()})
+            future.add_done_callback(self._persisted)
+        return status, attendee_id
+
+    def _persisted(self, future: asyncio.Future) -> None:
+        if future.cancelled() or future.exception() is not None:
+            self.persist_failed += 1
+            logger.error("check-in was not saved", exc_info=None if future.cancelled() else future.exception())
+        else:
+            self.persisted += 1
+
+    def unload(self, event_id: int) -> bool:
+        return self.events.pop(event_id, None) is not None
+
+    # --- Изменения участников и билетов ---
+
+    def _record(self, kind: str, change: Any) -> None:
+        if self._loading:
+            self._changes.append((kind, change))
+        for checkin in self.events.values():
+            self._apply(checkin, kind, change)
+
+    @staticmethod
+    def _apply(checkin: EventCheckin, kind: str, change: Any) -> None:
+        if kind == "attendee":
+            attendee_id, ticket_id, email = change
+            # Участника могли перенести на билет другого события; правка
+            # имени или email не даёт пройти второй раз
+            checked = checkin.remove(attendee_id)
+            if ticket_id in checkin.ticket_ids:
+                checkin.add(attendee_id, email, checked)
+        elif kind == "deleted":
+            checkin.remove(change)
+        elif kind == "ticket":
+            ticket_id, event_id = change
+            if event_id == checkin.event_id:
+                checkin.ticket_ids.add(ticket_id)
+            else:
+                checkin.ticket_ids.discard(ticket_id)
+
+    def attendees_written(self, attendees: List[Tuple[int, Dict[str, Any]]]) -> None:
+        for attendee_id, data in attendees:
+            self._record("attendee", (attendee_id, data["ticket_id"], data["email"]))
+
+    def attendees_deleted(self, attendee_ids: Iterable[int]) -> None:
+        for attendee_id in attendee_ids:
+            self._record("deleted", attendee_id)
+
+    def tickets_written(self, tickets: List[Tuple[int, Dict[str, Any]]]) -> None:
+        for ticket_id, data in tickets:
+            self._record("ticket", (ticket_id, data["event_id"]))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "events": [checkin.stats() for checkin in self.events.values()],
+            "loading": len(self._loading),
+            "admitted": self.counts[ADMITTED],
+            "duplicates": self.counts[DUPLICATE],
+            "not_found": self.counts[NOT_FOUND],
+            "persisted": self.persisted,
+            "persist_failed": self.persist_failed,
+            "writer": self.writer.stats(),
+        }
+
+
+checkin_desk = CheckinDesk(
+    settings.checkin_max_events,
+    InsertBatcher(
+        "attendees", repository.checkins, settings.checkin_batch_window, settings.write_batch_max, priority=CRITICAL))
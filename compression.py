@@ -0,0 +1,49 @@
+from starlette.datastructures import Headers
+from starlette.middleware.gzip import GZipMiddleware, IdentityResponder
+
+try:
+    import brotli
+except ImportError:
+    # Необязательная зависимость: без неё сжимаем только gzip
+    brotli = None
+
+
+def _accepts(header: str, coding: str) -> bool:
+    """coding есть в Accept-Encoding и не запрещён через q=0."""
+    for item in header.split(","):
+        name, _, params = item.strip().partition(";")
+        if name.strip().lower() == coding:
+            return params.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000")
+    return False
+
+
+class BrotliResponder(IdentityResponder):
+    content_encoding = "br"
+
+    def __init__(self, app, minimum_size: int, quality: int):
+        super().__init__(app, minimum_size)
+        self.quality = quality
+        self._compressor = None
+
+    async def apply_compression(self, body: bytes, *, more_body: bool) -> bytes:
+        if self._compressor is None:
+            self._compressor = brotli.Compressor(quality=self.quality)
+        data = self._compressor.process(body)
+        return data + (self._compressor.flush() if more_body else self._compressor.finish())
+
+
+class CompressionMiddleware(GZipMiddleware):
+    """gzip из Starlette плюс brotli, если установлен пакет brotli и клиент
+    его принимает. Маленькие ответы (меньше minimum_size) не сжимаются:
+    заголовки и кадр сжатия съедят выигрыш."""
+
+    def __init__(self, app, minimum_size: int = 1000, gzip_level: int = 6, brotli_quality: int = 4):
+        super().__init__(app, minimum_size=minimum_size, compresslevel=gzip_level)
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and brotli is not None:
+            if _accepts(Headers(scope=scope).get("Accept-Encoding", ""), "br"):
+                responder = BrotliResponder(self.app, self.minimum_size, self.brotli_quality)
+                return await responder(scope, receive, send)
+        await super().__call__(scope, receive, send)
@@ -0,0 +1,236 @@
+import os
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Tuple
+
+
+DEFAULT_CONN_STR = (
+    r"DRIVER={ODBC Driver 17 for SQL Server};"
+    r"SERVER=(localdb)\MSSQLLocalDB;"
+    r"DATABASE=EventsPlatform;"
+    r"Trusted_Connection=yes;"
+)
+
+
+def _env_str(name: str, default: str) -> str:
+    return os.environ.get(name, default)
+
+
+def _env_int(name: str, default: int) -> int:
+    value = os.environ.get(name)
+    return int(value) if value not in (None, "") else default
+
+
+def _env_float(name: str, default: float) -> float:
+    value = os.environ.get(name)
+    return float(value) if value not in (None, "") else default
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    value = os.environ.get(name)
+    if value in (None, ""):
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def _env_list(name: str, default: Tuple[str, ...], separator: str = "|") -> Tuple[str, ...]:
+    """Список через separator; "|", потому что в строках ODBC уже есть ";"."""
+    value = os.environ.get(name)
+    if value in (None, ""):
+        return default
+    return tuple(item.strip() for item in value.split(separator) if item.strip())
+
+
+def _env_mapping(name: str, default: Dict[str, Any], cast: Callable[[str], Any] = int) -> Dict[str, Any]:
+    """Разбирает строку вида "events=8,tickets=8" поверх значений по умолчанию."""
+    mapping = dict(default)
+    for item in os.environ.get(name, "").split(","):
+        if "=" in item:
+            key, value = item.split("=", 1)
+            mapping[key.strip()] = cast(value)
+    return mapping
+
+
+DEFAULT_GROUP_LIMITS = {
+    "organizers": 4,
+    "venues": 4,
+    "events": 8,
+    "tickets": 8,
+    "attendees": 8,
+    # Полные выгрузки держат соединение минутами — отдельный небольшой лимит
+    "exports": 2,
+}
+
+# Секунды жизни записи в кэше одиночных GET по сущностям
+DEFAULT_CACHE_TTLS = {
+    "events": 30.0,
+    "venues": 300.0,
+    "organizers": 300.0,
+}
+
+
+# Сколько запрос класса может ждать допуска к БД, прежде чем получить 503
+DEFAULT_ADMISSION_DEADLINES = {
+    "critical": 5.0,
+    "read": 1.0,
+    "scan": 0.5,
+}
+
+
+@dataclass(frozen=True)
+class Settings:
+    # mssql — SQL Server через pyodbc, sqlite — встроенная БД (файл или :memory:)
+    db_backend: str = "mssql"
+    conn_str: str = DEFAULT_CONN_STR
+    sqlite_path: str = ":memory:"
+    # Реплики для чтения: строки подключения (mssql) или пути к файлам (sqlite).
+    # GET читают из них, записи и фоновые задачи идут в основную БД
+    db_replicas: Tuple[str, ...] = ()
+    # Сколько секунд после записи чтения клиента идут в основную БД
+    replica_sticky_seconds: float = 5.0
+    # Через сколько секунд снова пробовать недоступную реплику
+    replica_retry_interval: float = 10.0
+    # Ожидание свободного соединения реплики, прежде чем идти в следующую
+    replica_acquire_timeout: float = 0.5
+
+    # Пул соединений
+    pool_min_size: int = 2
+    pool_max_size: int = 32
+    pool_timeout: float = 5.0
+    pool_max_lifetime: float = 1800.0
+    pool_health_check_idle: float = 5.0
+
+    # Выделенный пул потоков для запросов к БД; 0 — общий threadpool Starlette
+    db_executor_workers: int = 32
+    db_group_limits: Dict[str, int] = field(default_factory=lambda: dict(DEFAULT_GROUP_LIMITS))
+    db_group_limit_default: int = 4
+
+    export_chunk_size: int = 1000
+    bulk_max_items: int = 10000
+    # Списки сериализуются из строк БД без моделей Pydantic (orjson, если есть)
+    fast_json: bool = False
+    # Сжатие ответов от compression_min_size байт; 0 — без сжатия
+    compression_min_size: int = 1000
+    gzip_level: int = 6
+    brotli_quality: int = 4
+
+    # Кэш одиночных GET
+    cache_enabled: bool = True
+    cache_max_entries: int = 10000
+    cache_ttls: Dict[str, float] = field(default_factory=lambda: dict(DEFAULT_CACHE_TTLS))
+
+    # Покупка билетов: очередь с пачками по типу билета и временные брони
+    purchase_queue_enabled: bool = True
+    purchase_batch_max: int = 256
+    hold_ttl: float = 600.0
+    hold_sweep_interval: float = 10.0
+
+    # Индекс полнотекстового поиска событий строится при старте
+    search_enabled: bool = True
+    # Упорядоченные по дате события в памяти: /events/upcoming, /venues/{id}/bookings
+    timeline_enabled: bool = True
+
+    # Проход на входе: сколько событий держать в памяти и окно пачки записи
+    checkin_max_events: int = 20
+    checkin_batch_window: float = 0.05
+
+    # Поток изменений билетов (SSE): окно склейки изменений в секундах, сколько
+    # сообщений канала хранить для Last-Event-ID, период ping и число каналов
+    feed_enabled: bool = True
+    feed_coalesce_window: float = 0.25
+    feed_history: int = 256
+    feed_heartbeat: float = 15.0
+    feed_max_channels: int = 1000
+
+    # Сводки продаж (event_stats, organizer_stats): окно склейки пересчётов
+    # в секундах и период полной сверки с нуля (0 — только по запросу)
+    sales_stats_window: float = 0.5
+    sales_reconcile_interval: float = 3600.0
+
+    # Общий для процессов хоста снимок площадок и организаторов (mmap):
+    # путь к файлу, лучше на tmpfs (/dev/shm/...); пусто — выключен. Снимок
+    # пересобирается при записи и не бывает старше max_age секунд
+    refdata_path: str = ""
+    refdata_max_age: float = 60.0
+
+    # Групповой коммит INSERT attendees и tickets: окно в секундах и размер пачки
+    write_batching_enabled: bool = False
+    write_batch_window: float = 0.002
+    write_batch_max: int = 500
+
+    # Допуск к БД: начальный, минимальный и максимальный предел одновременных
+    # операций, целевая задержка операции, длина очереди и дедлайны ожидания
+    # по классам запросов (секунды)
+    admission_enabled: bool = True
+    admission_limit: int = 32
+    admission_min_limit: int = 4
+    admission_max_limit: int = 32
+    admission_target_latency: float = 0.25
+    admission_max_queue: int = 1000
+    admission_deadlines: Dict[str, float] = field(default_factory=lambda: dict(DEFAULT_ADMISSION_DEADLINES))
+
+    # Метрики /metrics и журнал медленных запросов (пороги в секундах)
+    metrics_enabled: bool = True
+    slow_query_threshold: float = 0.5
+    slow_request_threshold: float = 1.0
+
+    @classmethod
+    def from_env(cls) -> "Settings":
+        return cls(
+            db_backend=_env_str("DB_BACKEND", cls.db_backend),
+            conn_str=_env_str("DB_CONN_STR", DEFAULT_CONN_STR),
+            sqlite_path=_env_str("SQLITE_PATH", cls.sqlite_path),
+            db_replicas=_env_list("DB_REPLICAS", cls.db_replicas),
+            replica_sticky_seconds=_env_float("REPLICA_STICKY_SECONDS", cls.replica_sticky_seconds),
+            replica_retry_interval=_env_float("REPLICA_RETRY_INTERVAL", cls.replica_retry_interval),
+            replica_acquire_timeout=_env_float("REPLICA_ACQUIRE_TIMEOUT", cls.replica_acquire_timeout),
+            pool_min_size=_env_int("DB_POOL_MIN_SIZE", cls.pool_min_size),
+            pool_max_size=_env_int("DB_POOL_MAX_SIZE", cls.pool_max_size),
+            pool_timeout=_env_float("DB_POOL_TIMEOUT", cls.pool_timeout),
+            pool_max_lifetime=_env_float("DB_POOL_MAX_LIFETIME", cls.pool_max_lifetime),
+            pool_health_check_idle=_env_float("DB_POOL_HEALTH_CHECK_IDLE", cls.pool_health_check_idle),
+            db_executor_workers=_env_int("DB_EXECUTOR_WORKERS", cls.db_executor_workers),
+            db_group_limits=_env_mapping("DB_GROUP_LIMITS", DEFAULT_GROUP_LIMITS),
+            db_group_limit_default=_env_int("DB_GROUP_LIMIT_DEFAULT", cls.db_group_limit_default),
+            export_chunk_size=_env_int("EXPORT_CHUNK_SIZE", cls.export_chunk_size),
+            bulk_max_items=_env_int("BULK_MAX_ITEMS", cls.bulk_max_items),
+            fast_json=_env_bool("FAST_JSON", cls.fast_json),
+            compression_min_size=_env_int("COMPRESSION_MIN_SIZE", cls.compression_min_size),
+            gzip_level=_env_int("GZIP_LEVEL", cls.gzip_level),
+            brotli_quality=_env_int("BROTLI_QUALITY", cls.brotli_quality),
+            cache_enabled=_env_bool("CACHE_ENABLED", cls.cache_enabled),
+            cache_max_entries=_env_int("CACHE_MAX_ENTRIES", cls.cache_max_entries),
+            cache_ttls=_env_mapping("CACHE_TTLS", DEFAULT_CACHE_TTLS, float),
+            purchase_queue_enabled=_env_bool("PURCHASE_QUEUE_ENABLED", cls.purchase_queue_enabled),
+            purchase_batch_max=_env_int("PURCHASE_BATCH_MAX", cls.purchase_batch_max),
+            hold_ttl=_env_float("HOLD_TTL", cls.hold_ttl),
+            hold_sweep_interval=_env_float("HOLD_SWEEP_INTERVAL", cls.hold_sweep_interval),
+            search_enabled=_env_bool("SEARCH_ENABLED", cls.search_enabled),
+            timeline_enabled=_env_bool("TIMELINE_ENABLED", cls.timeline_enabled),
+            checkin_max_events=_env_int("CHECKIN_MAX_EVENTS", cls.checkin_max_events),
+            checkin_batch_window=_env_float("CHECKIN_BATCH_WINDOW", cls.checkin_batch_window),
+            feed_enabled=_env_bool("FEED_ENABLED", cls.feed_enabled),
+            feed_coalesce_window=_env_float("FEED_COALESCE_WINDOW", cls.feed_coalesce_window),
+            feed_history=_env_int("FEED_HISTORY", cls.feed_history),
+            feed_heartbeat=_env_float("FEED_HEARTBEAT", cls.feed_heartbeat),
+            feed_max_channels=_env_int("FEED_MAX_CHANNELS", cls.feed_max_channels),
+            sales_stats_window=_env_float("SALES_STATS_WINDOW", cls.sales_stats_window),
+            sales_reconcile_interval=_env_float("SALES_RECONCILE_INTERVAL", cls.sales_reconcile_interval),
+            refdata_path=_env_str("REFDATA_PATH", cls.refdata_path),
+            refdata_max_age=_env_float("REFDATA_MAX_AGE", cls.refdata_max_age),
+            write_batching_enabled=_env_bool("WRITE_BATCHING_ENABLED", cls.write_batching_enabled),
+            write_batch_window=_env_float("WRITE_BATCH_WINDOW", cls.write_batch_window),
+            write_batch_max=_env_int("WRITE_BATCH_MAX", cls.write_batch_max),
+            admission_enabled=_env_bool("ADMISSION_ENABLED", cls.admission_enabled),
+            admission_limit=_env_int("ADMISSION_LIMIT", cls.admission_limit),
+            admission_min_limit=_env_int("ADMISSION_MIN_LIMIT", cls.admission_min_limit),
+            admission_max_limit=_env_int("ADMISSION_MAX_LIMIT", cls.admission_max_limit),
+            admission_target_latency=_env_float("ADMISSION_TARGET_LATENCY", cls.admission_target_latency),
+            admission_max_queue=_env_int("ADMISSION_MAX_QUEUE", cls.admission_max_queue),
+            admission_deadlines=_env_mapping("ADMISSION_DEADLINES", DEFAULT_ADMISSION_DEADLINES, float),
+            metrics_enabled=_env_bool("METRICS_ENABLED", cls.metrics_enabled),
+            slow_query_threshold=_env_float("SLOW_QUERY_THRESHOLD", cls.slow_query_threshold),
+            slow_request_threshold=_env_float("SLOW_REQUEST_THRESHOLD", cls.slow_request_threshold),
+        )
+
+
+settings = Settings.from_env()
@@ -0,0 +1,289 @@
+import asyncio
+import contextvars
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, Optional, Sequence
+
+from starlette.concurrency import run_in_threadpool
+
+from admission import BACKGROUND, READ, Priority, admission
+from backends import Backend, create_replica_backends, get_backend
+from config import settings
+from metrics import instrument_connect, observe
+from pool import ConnectionPool, PooledConnection
+from replicas import Replica, ReplicaSet, reads_from_replica
+
+
+_pool: Optional[ConnectionPool] = None
+_replicas: Optional[ReplicaSet] = None
+_pool_lock = threading.Lock()
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+def _connect():
+    return get_backend().connect()
+
+
+def _create_pool(connect: Optional[Callable[[], Any]] = None, **overrides) -> ConnectionPool:
+    options = dict(
+        min_size=settings.pool_min_size,
+        max_size=settings.pool_max_size,
+        timeout=settings.pool_timeout,
+        max_lifetime=settings.pool_max_lifetime,
+        health_check_idle=settings.pool_health_check_idle,
+    )
+    if connect is None:
+        options.update(get_backend().pool_overrides())
+        connect = instrument_connect(_connect) if settings.metrics_enabled else _connect
+    options.update(overrides)
+    return ConnectionPool(connect, **options)
+
+
+def init_pool(connect: Optional[Callable[[], Any]] = None, **overrides) -> ConnectionPool:
+    """Пересоздаёт пул соединений. connect и overrides нужны тестам и бенчмаркам."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+        _pool = _create_pool(connect, **overrides)
+        return _pool
+
+
+def get_pool() -> ConnectionPool:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = _create_pool()
+    return _pool
+
+
+def get_connection() -> PooledConnection:
+    """Соединение из пула. Использовать как контекстный менеджер:
+
+        with get_connection() as conn:
+            ...
+
+    На выходе соединение возвращается в пул, незакоммиченное откатывается.
+    """
+    started = time.perf_counter()
+    conn = get_pool().acquire()
+    observe("acquire", time.perf_counter() - started)
+    return conn
+
+
+def close_pool() -> None:
+    global _pool, _replicas
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+        if _replicas is not None:
+            _replicas.close()
+            _replicas = None
+
+
+# --- Реплики для чтения ---
+
+def init_replicas(backends: Optional[Sequence[Backend]] = None, **overrides) -> Optional[ReplicaSet]:
+    """Пересоздаёт пулы реплик; по умолчанию — из DB_REPLICAS. Без реплик
+    все запросы идут в основную БД."""
+    global _replicas
+    if backends is None:
+        backends = create_replica_backends()
+    with _pool_lock:
+        if _replicas is not None:
+            _replicas.close()
+            _replicas = None
+        if backends:
+            _replicas = ReplicaSet(
+                [Replica(f"replica{index}", _create_pool(
+                    instrument_connect(backend.connect) if settings.metrics_enabled else backend.connect,
+                    **{**backend.pool_overrides(), **overrides}))
+                 for index, backend in enumerate(backends, 1)],
+                settings.replica_retry_interval, settings.replica_acquire_timeout)
+        return _replicas
+
+
+def replicas_enabled() -> bool:
+    return _replicas is not None
+
+
+def replica_stats() -> Dict[str, Any]:
+    replicas = _replicas
+    if replicas is None:
+        return {"enabled": False}
+    return {"enabled": True, "sticky_seconds": settings.replica_sticky_seconds, **replicas.stats()}
+
+
+def _acquire() -> PooledConnection:
+    """Соединение для текущей операции: чтение GET-запроса — из реплики,
+    остальное и откат при недоступных репликах — из основной БД."""
+    replicas = _replicas
+    if replicas is not None and reads_from_replica():
+        started = time.perf_counter()
+        conn = replicas.acquire()
+        if conn is not None:
+            observe("acquire", time.perf_counter() - started)
+            return conn
+    return get_connection()
+
+
+# --- Асинхронный доступ ---
+
+class GroupLimiter:
+    """Ограничение числа одновременных запросов к БД для группы маршрутов.
+
+    Медленные списки attendees не должны занимать все потоки и соединения,
+    пока короткие запросы organizers ждут в очереди.
+    """
+
+    def __init__(self, name: str, limit: int):
+        self.name = name
+        self.limit = limit
+        self.in_flight = 0
+        self.waiting = 0
+        self.completed = 0
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        # Семафор привязан к циклу событий; тесты запускают новый цикл на каждый вызов
+        if self._semaphore is None or self._loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.limit)
+            self._loop = loop
+        return self._semaphore
+
+    async def __aenter__(self):
+        semaphore = self._get_semaphore()
+        self.waiting += 1
+        try:
+            await semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        self.in_flight += 1
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.in_flight -= 1
+        self.completed += 1
+        self._semaphore.release()
+        return False
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "limit": self.limit,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "completed": self.completed,
+        }
+
+
+_limiters: Dict[str, GroupLimiter] = {}
+
+
+def get_limiter(group: str) -> GroupLimiter:
+    limiter = _limiters.get(group)
+    if limiter is None:
+        limit = settings.db_group_limits.get(group, settings.db_group_limit_default)
+        limiter = _limiters.setdefault(group, GroupLimiter(group, limit))
+    return limiter
+
+
+def get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _pool_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=settings.db_executor_workers, thread_name_prefix="db")
+    return _executor
+
+
+def shutdown_executor() -> None:
+    global _executor
+    with _pool_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False)
+            _executor = None
+
+
+def _call_with_connection(fn: Callable, args: tuple):
+    with _acquire() as conn:
+        return fn(conn, *args)
+
+
+async def _run_blocking(fn: Callable, *args):
+    if settings.db_executor_workers <= 0:
+        return await run_in_threadpool(fn, *args)
+    loop = asyncio.get_running_loop()
+    # Контекст (contextvars) переносим в поток вручную: run_in_executor его не копирует
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(get_executor(), context.run, fn, *args)
+
+
+def _admission_slot(priority: Priority, measure: bool = True):
+    return admission.slot(priority, measure) if settings.admission_enabled else nullcontext()
+
+
+async def _admitted(fn: Callable, args: tuple, priority: Priority):
+    async with _admission_slot(priority):
+        return await _run_blocking(_call_with_connection, fn, args)
+
+
+async def run_db(group: str, fn: Callable, *args, priority: Priority = READ):
+    """Выполняет fn(conn, *args) на соединении из пула, не блокируя цикл событий.
+
+    priority — класс запроса для допуска к БД (admission): при перегрузке
+    SCAN ждёт дольше всех и отбрасывается первым (admission.Overloaded).
+    """
+    if settings.db_executor_workers <= 0:
+        return await _admitted(fn, args, priority)
+    # Сначала лимит группы: ожидающие в группе не занимают общие слоты
+    async with get_limiter(group):
+        return await _admitted(fn, args, priority)
+
+
+def _close_stream(chunks: Optional[Iterator], conn: PooledConnection) -> None:
+    try:
+        if chunks is not None:
+            chunks.close()
+    finally:
+        conn.close()
+
+
+async def stream_db(group: str, fn: Callable, *args) -> AsyncIterator:
+    """Асинхронно отдаёт элементы генератора fn(conn, *args).
+
+    Соединение удерживается на всё время выгрузки, каждый следующий элемент
+    читается в пуле потоков только когда потребитель готов его принять.
+    Выгрузка ждёт допуска без дедлайна (BACKGROUND): заголовки ответа уже
+    отправлены, отказать 503 поздно. Её длительность в предел не идёт.
+    """
+    async with get_limiter(group), _admission_slot(BACKGROUND, measure=False):
+        conn = await _run_blocking(_acquire)
+        chunks = None
+        try:
+            chunks = fn(conn, *args)
+            while True:
+                chunk = await _run_blocking(next, chunks, None)
+                if chunk is None:
+                    break
+                yield chunk
+        finally:
+            # Не ждём: при отмене (клиент отключился) await в finally уже недоступен
+            if settings.db_executor_workers <= 0:
+                _close_stream(chunks, conn)
+            else:
+                get_executor().submit(_close_stream, chunks, conn)
+
+
+def executor_stats() -> dict:
+    return {
+        "workers": settings.db_executor_workers,
+        "groups": {name: limiter.stats() for name, limiter in sorted(_limiters.items())},
+        "admission": admission.stats(),
+    }
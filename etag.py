@@ -0,0 +1,43 @@
+import hashlib
+import json
+from typing import Any, Optional
+
+from fastapi import Response
+
+from jsontypes import json_default
+
+
+class PreconditionFailed(Exception):
+    """If-Match не совпал с текущей версией строки."""
+
+
+def compute_etag(payload: Any) -> str:
+    """Сильный ETag — хэш содержимого. В схеме нет rowversion, поэтому версию
+    строки считаем по значениям колонок, без сериализации ответа."""
+    canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=json_default)
+    return '"' + hashlib.sha1(canonical.encode()).hexdigest() + '"'
+
+
+def _tags(header: str):
+    return [tag.strip() for tag in header.split(",") if tag.strip()]
+
+
+def is_not_modified(header: Optional[str], etag: str) -> bool:
+    """Слабое сравнение (RFC 9110, 13.1.2): W/ не учитывается."""
+    if not header:
+        return False
+    for tag in _tags(header):
+        if tag == "*" or tag.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+def precondition_holds(header: Optional[str], etag: str) -> bool:
+    """Сильное сравнение (RFC 9110, 13.1.1): слабые ETag не совпадают никогда."""
+    if not header:
+        return True
+    return any(tag == "*" or tag == etag for tag in _tags(header))
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag})
@@ -0,0 +1,54 @@
+import csv
+import io
+import json
+from typing import AsyncIterator, List, Optional, Sequence
+
+from fastapi.responses import StreamingResponse
+
+from config import settings
+from db import stream_db
+from jsontypes import json_default
+from repository import Repository
+
+
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+
+
+async def encode_ndjson(columns: Sequence[str], chunks: AsyncIterator[List[tuple]]) -> AsyncIterator[bytes]:
+    dumps = json.JSONEncoder(default=json_default, ensure_ascii=False, separators=(",", ":")).encode
+    async for rows in chunks:
+        yield "".join(dumps(dict(zip(columns, row))) + "\n" for row in rows).encode()
+
+
+async def encode_csv(columns: Sequence[str], chunks: AsyncIterator[List[tuple]]) -> AsyncIterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    # Заголовок уходит сразу, до первого обращения к БД
+    writer.writerow(columns)
+    yield buffer.getvalue().encode()
+    async for rows in chunks:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(rows)
+        yield buffer.getvalue().encode()
+
+
+ENCODERS = {
+    "ndjson": encode_ndjson,
+    "csv": encode_csv,
+}
+
+
+def export_response(
+    repo: Repository, export_format: str, columns: Optional[Sequence[str]] = None,
+) -> StreamingResponse:
+    """Потоковая выгрузка таблицы: в памяти одновременно не больше одной порции строк."""
+    chunks = stream_db("exports", repo.stream, settings.export_chunk_size, columns)
+    return StreamingResponse(
+        ENCODERS[export_format](columns or repo.select_columns, chunks),
+        media_type=MEDIA_TYPES[export_format],
+        headers={"Content-Disposition": f'attachment; filename="{repo.table}.{export_format}"'},
+    )
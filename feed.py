@@ -0,0 +1,282 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict, deque
+from typing import Any, AsyncIterator, Deque, Dict, Iterable, List, Optional, Set, Tuple
+
+import repository
+from config import settings
+from db import run_db
+from serialization import dumps
+
+
+logger = logging.getLogger(__name__)
+
+PING = b": ping\n\n"
+
+
+def load_tickets(conn, event_id: int) -> Optional[List[Dict[str, Any]]]:
+    """Билеты события; None — события нет."""
+    cursor = conn.cursor()
+    cursor.execute("SELECT id FROM events WHERE id=?", event_id)
+    if not cursor.fetchone():
+        return None
+    return repository.tickets.find_in(conn, "event_id", [event_id])
+
+
+class Channel:
+    """Канал одного события: текущие строки билетов и последние сообщения.
+
+    Сообщение кодируется один раз и хранится готовым кадром SSE; подписчики
+    читают кадры из history по своему номеру и ждут общий future wakeup,
+    а не держат каждый свою очередь.
+    """
+
+    __slots__ = ("event_id", "tickets", "seq", "history", "wakeup", "subscribers")
+
+    def __init__(self, event_id: int, rows: Iterable[Dict[str, Any]], history: int, loop: asyncio.AbstractEventLoop):
+        self.event_id = event_id
+        self.tickets: Dict[int, Dict[str, Any]] = {row["id"]: row for row in rows}
+        self.seq = 0
+        self.history: Deque[Tuple[int, bytes]] = deque(maxlen=history)
+        self.wakeup = loop.create_future()
+        self.subscribers = 0
+
+    def frames_after(self, seq: int) -> Optional[List[bytes]]:
+        """Кадры после seq; None — часть уже вытеснена из history."""
+        if seq == self.seq:
+            return []
+        if seq > self.seq or not self.history or self.history[0][0] > seq + 1:
+            return None
+        return [frame for number, frame in self.history if number > seq]
+
+
+class TicketFeed:
+    """Поток изменений билетов событий для GET /events/{id}/tickets/stream.
+
+    Обработчики записи сообщают id затронутых билетов (touch), подписчиков
+    не трогают. Изменения копятся window секунд, затем одним запросом
+    WHERE id IN (...) читаются текущие строки и в канал каждого события
+    уходит одно сообщение со всеми изменившимися билетами: сотня покупок
+    за окно — одно сообщение и один запрос. Билет, которого больше нет
+    (или который перенесли в другое событие), приходит как {"id", "deleted"}.
+
+    Каналы создаются первым подписчиком (один запрос билетов события) и
+    держат строки билетов: следующие подписчики получают снимок из памяти.
+    Каналы без подписчиков остаются для возобновления по Last-Event-ID, пока
+    их не больше max_channels. id сообщения — "<эпоха>-<номер>": после
+    перезапуска процесса или вытеснения канала клиент получает снимок.
+
+    Состояние — в памяти процесса: записи через другой процесс сюда не
+    попадают, для нескольких процессов нужна внешняя шина.
+    """
+
+    def __init__(self, window: float, history: int, heartbeat: float, max_channels: int):
+        self.window = window
+        self.history = history
+        self.heartbeat = heartbeat
+        self.max_channels = max_channels
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._reset()
+        self.messages = 0
+        self.flushes = 0
+        self.flush_failed = 0
+        self.touched = 0
+
+    def _reset(self) -> None:
+        self.epoch = format(time.time_ns() // 1000, "x")
+        self.channels: "OrderedDict[int, Channel]" = OrderedDict()
+        # Билет -> событие, для билетов всех каналов
+        self._owners: Dict[int, int] = {}
+        self._loading: Dict[int, asyncio.Task] = {}
+        self._dirty: Set[int] = set()
+        self._flush: Optional[Any] = None
+        self.closed = False
+
+    def _bind(self) -> asyncio.AbstractEventLoop:
+        loop = asyncio.get_running_loop()
+        # Futures привязаны к циклу событий; тесты запускают новый цикл на каждый вызов
+        if self._loop is not loop:
+            self._reset()
+            self._loop = loop
+        return loop
+
+    # --- Изменения ---
+
+    def touch(self, ticket_ids: Iterable[int], event_id: Optional[int] = None) -> None:
+        """Билеты изменились; event_id — событие записанного билета, если известно.
+        Без подписчиков на событие ничего не делает."""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        # Другой цикл — подписчиков в нём ещё нет
+        if loop is not self._loop or self.closed:
+            return
+        for ticket_id in ticket_ids:
+            # Пока канал загружается, его билеты ещё не известны: берём все
+            if ticket_id in self._owners or event_id in self.channels or self._loading:
+                self._dirty.add(ticket_id)
+                self.touched += 1
+        self._schedule()
+
+    def tickets_written(self, tickets: List[Tuple[int, Dict[str, Any]]]) -> None:
+        for ticket_id, data in tickets:
+            self.touch([ticket_id], data.get("event_id"))
+
+    def tickets_deleted(self, ticket_ids: Iterable[int]) -> None:
+        self.touch(ticket_ids)
+
+    def attendees_written(self, attendees: List[Tuple[int, Dict[str, Any]]]) -> None:
+        self.touch({data["ticket_id"] for _, data in attendees})
+
+    def _schedule(self) -> None:
+        if self._dirty and self._flush is None:
+            self._flush = self._loop.call_later(self.window, self._start_flush)
+
+    def _start_flush(self) -> None:
+        self._flush = self._loop.create_task(self._run_flush())
+
+    async def _run_flush(self) -> None:
+        dirty, self._dirty = self._dirty, set()
+        try:
+            rows = await run_db("tickets", repository.tickets.get_many, sorted(dirty))
+        except Exception:
+            # Изменения не теряем: повторим со следующей пачкой
+            self.flush_failed += 1
+            logger.warning("ticket feed flush failed", exc_info=True)
+            self._dirty |= dirty
+        else:
+            self.flushes += 1
+            self._dispatch(dirty, rows)
+        finally:
+            self._flush = None
+        self._schedule()
+
+    def _dispatch(self, ticket_ids: Iterable[int], rows: Dict[int, Dict[str, Any]]) -> None:
+        changes: Dict[int, List[Dict[str, Any]]] = {}
+        for ticket_id in sorted(ticket_ids):
+            row = rows.get(ticket_id)
+            owner = self._owners.get(ticket_id)
+            event_id = row["event_id"] if row else None
+            if owner is not None and owner != event_id:
+                del self._owners[ticket_id]
+                self.channels[owner].tickets.pop(ticket_id, None)
+                changes.setdefault(owner, []).append({"id": ticket_id, "deleted": True})
+            channel = self.channels.get(event_id)
+            if channel is not None:
+                self._owners[ticket_id] = event_id
+                if channel.tickets.get(ticket_id) != row:
+                    channel.tickets[ticket_id] = row
+                    changes.setdefault(event_id, []).append(row)
+        for event_id, items in changes.items():
+            self._publish(self.channels[event_id], "tickets", items)
+
+    def _publish(self, channel: Channel, kind: str, payload: Any) -> None:
+        channel.seq += 1
+        channel.history.append((channel.seq, self._frame(channel, kind, payload)))
+        self.messages += 1
+        wakeup, channel.wakeup = channel.wakeup, self._loop.create_future()
+        wakeup.set_result(None)
+
+    def _frame(self, channel: Channel, kind: str, payload: Any) -> bytes:
+        return b"id: %s-%d\nevent: %s\ndata: %s\n\n" % (
+            self.epoch.encode(), channel.seq, kind.encode(), dumps(payload))
+
+    # --- Подписчики ---
+
+    async def channel(self, event_id: int) -> Optional[Channel]:
+        """Канал события, при первом обращении — с загрузкой билетов; None — события нет."""
+        self._bind()
+        channel = self.channels.get(event_id)
+        if channel is not None:
+            self.channels.move_to_end(event_id)
+            return channel
+        task = self._loading.get(event_id)
+        if task is None:
+            task = self._loading[event_id] = asyncio.ensure_future(self._load(event_id))
+        return await asyncio.shield(task)
+
+    async def _load(self, event_id: int) -> Optional[Channel]:
+        try:
+            rows = await run_db("tickets", load_tickets, event_id)
+        finally:
+            self._loading.pop(event_id, None)
+        if rows is None:
+            return None
+        channel = self.channels[event_id] = Channel(event_id, rows, self.history, self._loop)
+        for ticket_id in channel.tickets:
+            self._owners[ticket_id] = event_id
+        self._evict()
+        return channel
+
+    def _evict(self) -> None:
+        for event_id in list(self.channels):
+            if len(self.channels) <= self.max_channels:
+                break
+            channel = self.channels[event_id]
+            if channel.subscribers:
+                continue
+            del self.channels[event_id]
+            for ticket_id in channel.tickets:
+                self._owners.pop(ticket_id, None)
+
+    def _parse_last_id(self, last_event_id: Optional[str]) -> Optional[int]:
+        epoch, _, seq = (last_event_id or "").strip().partition("-")
+        if epoch != self.epoch or not seq.isdigit():
+            return None
+        return int(seq)
+
+    def _snapshot(self, channel: Channel) -> bytes:
+        rows = [channel.tickets[ticket_id] for ticket_id in sorted(channel.tickets)]
+        return self._frame(channel, "snapshot", rows)
+
+    async def stream(self, channel: Channel, last_event_id: Optional[str] = None) -> AsyncIterator[bytes]:
+        """Кадры SSE: снимок или пропущенные сообщения после Last-Event-ID,
+        затем новые сообщения; комментарий-ping каждые heartbeat секунд
+        тишины, чтобы прокси не закрывали соединение."""
+        channel.subscribers += 1
+        try:
+            seq = self._parse_last_id(last_event_id)
+            yield b"retry: %d\n\n" % int(self.heartbeat * 1000)
+            while not self.closed:
+                frames = channel.frames_after(seq) if seq is not None else None
+                if frames is None:
+                    # Новый клиент, чужая эпоха или отстал больше чем на history
+                    frames = [self._snapshot(channel)]
+                seq = channel.seq
+                for frame in frames:
+                    yield frame
+                if channel.seq == seq and not self.closed:
+                    try:
+                        await asyncio.wait_for(asyncio.shield(channel.wakeup), self.heartbeat)
+                    except asyncio.TimeoutError:
+                        yield PING
+        finally:
+            channel.subscribers -= 1
+
+    def close(self) -> None:
+        """Остановка сервиса: подписчики завершают потоки."""
+        self.closed = True
+        if self._flush is not None:
+            self._flush.cancel()
+            self._flush = None
+        for channel in self.channels.values():
+            if not channel.wakeup.done():
+                channel.wakeup.set_result(None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "channels": len(self.channels),
+            "subscribers": sum(channel.subscribers for channel in self.channels.values()),
+            "loading": len(self._loading),
+            "pending": len(self._dirty),
+            "touched": self.touched,
+            "flushes": self.flushes,
+            "flush_failed": self.flush_failed,
+            "messages": self.messages,
+        }
+
+
+ticket_feed = TicketFeed(
+    settings.feed_coalesce_window, settings.feed_history, settings.feed_heartbeat, settings.feed_max_channels)
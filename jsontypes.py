@@ -0,0 +1,17 @@
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any
+
+
+def json_default(value: Any) -> Any:
+    """Типы драйвера БД, которых нет в JSON, — так же, как их отдаёт Pydantic:
+    Decimal — число, даты — ISO 8601.
+
+    Общая для ответов, выгрузок и ETag: хэш строки из БД совпадает с хэшем
+    модели после PUT, только пока все они приводят типы одинаково.
+    """
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
@@ -0,0 +1,400 @@
+import functools
+import inspect
+import logging
+import re
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from fastapi.routing import APIRoute
+
+from config import settings
+
+
+logger = logging.getLogger(__name__)
+
+# Границы корзин гистограмм, секунды
+LATENCY_BUCKETS = (
+    0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+    0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+# Метка route для работы вне HTTP-запроса: очередь покупок, чистка броней
+BACKGROUND = "<background>"
+UNMATCHED = "<unmatched>"
+
+# Фазы запроса в порядке выполнения:
+#   acquire  — ожидание соединения из пула
+#   connect  — открытие нового физического соединения
+#   execute  — cursor.execute / executemany
+#   fetch    — fetchone / fetchall / fetchmany
+#   pydantic — сборка моделей ответа в обработчике
+#   json     — проверка по response_model и кодирование в JSON (FastAPI
+#              делает и то и другое одним вызовом pydantic-core)
+PHASES = ("acquire", "connect", "execute", "fetch", "pydantic", "json")
+
+
+class Histogram:
+    __slots__ = ("counts", "total")
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.total = 0.0
+
+    def observe(self, value: float) -> None:
+        # bisect_left: значение на границе попадает в корзину le=граница
+        self.counts[bisect_left(LATENCY_BUCKETS, value)] += 1
+        self.total += value
+
+
+class RequestMetrics:
+    """Замеры одного HTTP-запроса.
+
+    Пополняется без блокировок (list.append атомарен), в том числе из потоков
+    пула БД — contextvars переносятся туда в db._run_blocking. В общий реестр
+    попадает разом в конце запроса, когда уже известен шаблон маршрута.
+    """
+
+    __slots__ = ("phases", "rows", "endpoint_done", "done")
+
+    def __init__(self):
+        self.phases: List[Tuple[str, str, float]] = []
+        self.rows: List[Tuple[str, int]] = []
+        self.endpoint_done: Optional[float] = None
+        self.done = False
+
+
+_current: ContextVar[Optional[RequestMetrics]] = ContextVar("request_metrics", default=None)
+
+
+class Metrics:
+    """Реестр метрик процесса в текстовом формате Prometheus."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests: Dict[Tuple[str, str], Histogram] = {}
+        self.responses: Dict[Tuple[str, str, str], int] = {}
+        self.phases: Dict[Tuple[str, str, str], Histogram] = {}
+        self.rows: Dict[Tuple[str, str], int] = {}
+        self.connections_opened = 0
+        self.slow_queries = 0
+        self.slow_requests = 0
+
+    def _observe_phase(self, route: str, phase: str, statement: str, seconds: float) -> None:
+        histogram = self.phases.get((route, phase, statement))
+        if histogram is None:
+            histogram = self.phases[(route, phase, statement)] = Histogram()
+        histogram.observe(seconds)
+
+    def record_request(self, method: str, route: str, status: int, seconds: float, current: RequestMetrics) -> None:
+        with self._lock:
+            histogram = self.requests.get((method, route))
+            if histogram is None:
+                histogram = self.requests[(method, route)] = Histogram()
+            histogram.observe(seconds)
+            key = (method, route, str(status))
+            self.responses[key] = self.responses.get(key, 0) + 1
+            # Развёрнуто вручную: цикл выполняется на каждый запрос
+            phases = self.phases
+            for phase, statement, value in current.phases:
+                key = (route, phase, statement)
+                histogram = phases.get(key)
+                if histogram is None:
+                    histogram = phases[key] = Histogram()
+                histogram.counts[bisect_left(LATENCY_BUCKETS, value)] += 1
+                histogram.total += value
+            rows = self.rows
+            for statement, count in current.rows:
+                key = (route, statement)
+                rows[key] = rows.get(key, 0) + count
+
+    def record_phase(self, route: str, phase: str, statement: str, seconds: float) -> None:
+        with self._lock:
+            self._observe_phase(route, phase, statement, seconds)
+
+    def record_rows(self, route: str, statement: str, count: int) -> None:
+        with self._lock:
+            self.rows[(route, statement)] = self.rows.get((route, statement), 0) + count
+
+    def count(self, counter: str) -> None:
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def clear(self) -> None:
+        with self._lock:
+            self.requests.clear()
+            self.responses.clear()
+            self.phases.clear()
+            self.rows.clear()
+            self.connections_opened = self.slow_queries = self.slow_requests = 0
+
+    def render(self) -> str:
+        lines: List[str] = []
+        with self._lock:
+            _render_histograms(
+                lines, "app_request_duration_seconds", "HTTP request latency by route template",
+                ("method", "route"), self.requests)
+            _render_counters(
+                lines, "app_requests_total", "HTTP responses by route template and status",
+                ("method", "route", "status"), self.responses)
+            _render_histograms(
+                lines, "app_phase_duration_seconds", "Time spent in each request phase",
+                ("route", "phase", "statement"), self.phases)
+            _render_counters(
+                lines, "app_db_rows_total", "Rows fetched from the database",
+                ("route", "statement"), self.rows)
+            for name, help_text, value in (
+                ("app_db_connections_opened_total", "Physical database connections opened",
+                 self.connections_opened),
+                ("app_slow_queries_total", "Statements slower than SLOW_QUERY_THRESHOLD", self.slow_queries),
+                ("app_slow_requests_total", "Requests slower than SLOW_REQUEST_THRESHOLD", self.slow_requests),
+            ):
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter", f"{name} {value}"]
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _labels(names: Sequence[str], values: Sequence[str]) -> str:
+    return ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+
+
+def _render_histograms(lines, name: str, help_text: str, label_names, histograms) -> None:
+    lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+    for key, histogram in sorted(histograms.items()):
+        labels = _labels(label_names, key)
+        cumulative = 0
+        for bound, count in zip(LATENCY_BUCKETS, histogram.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+        cumulative += histogram.counts[-1]
+        lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {cumulative}')
+        lines.append(f"{name}_sum{{{labels}}} {histogram.total}")
+        lines.append(f"{name}_count{{{labels}}} {cumulative}")
+
+
+def _render_counters(lines, name: str, help_text: str, label_names, counters) -> None:
+    lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+    for key, value in sorted(counters.items()):
+        lines.append(f"{name}{{{_labels(label_names, key)}}} {value}")
+
+
+metrics = Metrics()
+
+
+def observe(phase: str, seconds: float, statement: str = "") -> None:
+    current = _current.get()
+    if current is None or current.done:
+        metrics.record_phase(BACKGROUND, phase, statement, seconds)
+    else:
+        current.phases.append((phase, statement, seconds))
+
+
+def _observe_rows(statement: str, count: int) -> None:
+    current = _current.get()
+    if current is None or current.done:
+        metrics.record_rows(BACKGROUND, statement, count)
+    else:
+        current.rows.append((statement, count))
+
+
+# --- SQL ---
+
+_PLACEHOLDER_RUN = re.compile(r"\?(?:\s*,\s*\?)+")
+_ROW_RUN = re.compile(r"\(\?\.\.\.\)(?:\s*,\s*\(\?\.\.\.\))+")
+_SPACES = re.compile(r"\s+")
+# Список колонок SELECT задаёт клиент (?fields=): в метке его нет
+_PROJECTION = re.compile(r"^(SELECT (?:DISTINCT )?(?:TOP \(\?\) )?).+? FROM ", re.IGNORECASE)
+_STATEMENT_LABELS_MAX = 1000
+_statement_labels: Dict[str, str] = {}
+
+
+def statement_label(sql: str) -> str:
+    """Метка запроса: IN-списки и пачки VALUES разной длины сводятся к одной
+    метке, чтобы число рядов метрик не зависело от размера запроса. Колонки
+    SELECT заменяются на *: иначе каждый порядок и набор ?fields= заводил бы
+    свои ряды."""
+    label = _statement_labels.get(sql)
+    if label is None:
+        label = _SPACES.sub(" ", sql).strip()
+        label = _ROW_RUN.sub("(?...), ...", _PLACEHOLDER_RUN.sub("?...", label))
+        label = _PROJECTION.sub(r"\1* FROM ", label, count=1)
+        if len(_statement_labels) < _STATEMENT_LABELS_MAX:
+            _statement_labels[sql] = label
+    return label
+
+
+class InstrumentedCursor:
+    """Курсор, замеряющий execute и fetch; остальное отдаёт исходному курсору."""
+
+    __slots__ = ("_cursor", "_statement")
+
+    def __init__(self, cursor):
+        object.__setattr__(self, "_cursor", cursor)
+        object.__setattr__(self, "_statement", "")
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __setattr__(self, name, value):
+        # fast_executemany и подобные флаги должны попасть в драйвер
+        setattr(self._cursor, name, value)
+
+    def _executed(self, sql: str, started: float) -> None:
+        elapsed = time.perf_counter() - started
+        label = statement_label(sql)
+        object.__setattr__(self, "_statement", label)
+        observe("execute", elapsed, label)
+        if elapsed >= settings.slow_query_threshold:
+            metrics.count("slow_queries")
+            logger.warning("slow query %.1f ms: %s", elapsed * 1000, label)
+
+    def execute(self, sql: str, *params):
+        started = time.perf_counter()
+        self._cursor.execute(sql, *params)
+        self._executed(sql, started)
+        return self
+
+    def executemany(self, sql: str, rows):
+        started = time.perf_counter()
+        self._cursor.executemany(sql, rows)
+        self._executed(sql, started)
+
+    def _fetched(self, started: float, count: int) -> None:
+        observe("fetch", time.perf_counter() - started, self._statement)
+        _observe_rows(self._statement, count)
+
+    def fetchone(self):
+        started = time.perf_counter()
+        row = self._cursor.fetchone()
+        self._fetched(started, 0 if row is None else 1)
+        return row
+
+    def fetchall(self):
+        started = time.perf_counter()
+        rows = self._cursor.fetchall()
+        self._fetched(started, len(rows))
+        return rows
+
+    def fetchmany(self, size: int):
+        started = time.perf_counter()
+        rows = self._cursor.fetchmany(size)
+        self._fetched(started, len(rows))
+        return rows
+
+
+class InstrumentedConnection:
+
+    __slots__ = ("_conn",)
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def cursor(self) -> InstrumentedCursor:
+        return InstrumentedCursor(self._conn.cursor())
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+def instrument_connect(connect: Callable[[], Any]) -> Callable[[], Any]:
+    """Оборачивает фабрику соединений: время открытия, счётчик, курсоры с замерами."""
+
+    @functools.wraps(connect)
+    def wrapper():
+        started = time.perf_counter()
+        conn = connect()
+        observe("connect", time.perf_counter() - started)
+        metrics.count("connections_opened")
+        return InstrumentedConnection(conn)
+
+    return wrapper
+
+
+# --- HTTP ---
+
+def timed_build(build: Callable[[], Any]) -> Any:
+    """Вызывает build() и засчитывает время в фазу pydantic."""
+    started = time.perf_counter()
+    result = build()
+    observe("pydantic", time.perf_counter() - started)
+    return result
+
+
+def _mark_endpoint_done(endpoint: Callable) -> Callable:
+    if not inspect.iscoroutinefunction(endpoint):
+        return endpoint
+
+    @functools.wraps(endpoint)
+    async def wrapper(*args, **kwargs):
+        result = await endpoint(*args, **kwargs)
+        current = _current.get()
+        if current is not None:
+            current.endpoint_done = time.perf_counter()
+        return result
+
+    return wrapper
+
+
+class InstrumentedRoute(APIRoute):
+    """Маршрут, отмечающий конец обработчика: всё от этой отметки до начала
+    ответа — сериализация FastAPI (фаза json)."""
+
+    def __init__(self, path: str, endpoint: Callable, **kwargs):
+        super().__init__(path, _mark_endpoint_done(endpoint), **kwargs)
+
+
+class MetricsMiddleware:
+    """ASGI-middleware: длительность запроса, фазы и медленные запросы.
+
+    Чистый ASGI без BaseHTTPMiddleware — без лишней задачи и очереди на запрос.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        current = RequestMetrics()
+        token = _current.set(current)
+        status = 500
+        streaming = False
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status, streaming
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                streaming = (b"content-type", b"text/event-stream") in (
+                    (name.lower(), value.split(b";")[0]) for name, value in message.get("headers", ()))
+                if current.endpoint_done is not None:
+                    current.phases.append(("json", "", time.perf_counter() - current.endpoint_done))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            current.done = True
+            _current.reset(token)
+            route = scope.get("route")
+            route = route.path if route is not None else UNMATCHED
+            # Поток SSE открыт минутами: его длительность не задержка запроса
+            if not streaming:
+                metrics.record_request(scope["method"], route, status, elapsed, current)
+                if elapsed >= settings.slow_request_threshold:
+                    metrics.count("slow_requests")
+                    _log_slow_request(scope["method"], route, status, elapsed, current)
+
+
+def _log_slow_request(method: str, route: str, status: int, elapsed: float, current: RequestMetrics) -> None:
+    totals = dict.fromkeys(PHASES, 0.0)
+    for phase, _, value in current.phases:
+        totals[phase] = totals.get(phase, 0.0) + value
+    breakdown = ", ".join(f"{phase} {value * 1000:.1f}" for phase, value in totals.items() if value)
+    logger.warning("slow request %s %s %d: %.1f ms (%s)", method, route, status, elapsed * 1000, breakdown)
@@ -0,0 +1,65 @@
+import base64
+import binascii
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, List, Sequence, Tuple
+
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+
+
+class InvalidPageRequest(ValueError):
+    """Неизвестная сортировка или повреждённый курсор."""
+
+
+def parse_order_by(value: str, allowed: Sequence[str]) -> Tuple[str, bool]:
+    """"title" -> ("title", False), "-title" -> ("title", True)."""
+    descending = value.startswith("-")
+    column = value[1:] if descending else value
+    if column not in allowed:
+        raise InvalidPageRequest(f"order_by must be one of: {', '.join(allowed)} (prefix '-' for descending)")
+    return column, descending
+
+
+def _jsonable(value: Any) -> Any:
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def encode_cursor(order_by: str, key: Tuple[Any, int]) -> str:
+    payload = json.dumps([order_by, _jsonable(key[0]), key[1]], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, order_by: str) -> Tuple[Any, int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        cursor_order, value, last_id = json.loads(base64.urlsafe_b64decode(padded))
+    except (binascii.Error, ValueError, TypeError):
+        raise InvalidPageRequest("malformed cursor")
+    if cursor_order != order_by or not isinstance(last_id, int):
+        raise InvalidPageRequest("cursor does not match order_by")
+    return value, last_id
+
+
+def keyset_condition(column: str, descending: bool, last_value: Any, last_id: int) -> Tuple[str, List[Any]]:
+    """Условие «строго после (last_value, last_id)» для ORDER BY column, id.
+
+    NULL в SQL Server и SQLite при ASC идут первыми, при DESC — последними.
+    """
+    if column == "id":
+        return ("id < ?" if descending else "id > ?"), [last_id]
+    op = "<" if descending else ">"
+    if last_value is None:
+        if descending:
+            return f"({column} IS NULL AND id {op} ?)", [last_id]
+        return f"(({column} IS NULL AND id {op} ?) OR {column} IS NOT NULL)", [last_id]
+    condition = f"({column} {op} ? OR ({column} = ? AND id {op} ?)"
+    if descending:
+        condition += f" OR {column} IS NULL"
+    return condition + ")", [last_value, last_value, last_id]
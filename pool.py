@@ -0,0 +1,254 @@
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, List, Optional
+
+
+logger = logging.getLogger(__name__)
+
+
+class PoolTimeout(Exception):
+    """Свободное соединение не появилось за отведённое время."""
+
+
+class PooledConnection:
+    """Соединение, выданное пулом.
+
+    close() и выход из with возвращают соединение в пул, а не закрывают его.
+    Открытые курсоры закрываются, незакоммиченная транзакция откатывается.
+    """
+
+    def __init__(self, pool: "ConnectionPool", raw: Any, created_at: float):
+        self._pool = pool
+        self.raw = raw
+        self.created_at = created_at
+        self.last_used = time.monotonic()
+        self._cursors: List[Any] = []
+        self._released = False
+
+    def cursor(self):
+        cursor = self.raw.cursor()
+        self._cursors.append(cursor)
+        return cursor
+
+    def commit(self):
+        self.raw.commit()
+
+    def rollback(self):
+        self.raw.rollback()
+
+    def close(self):
+        if not self._released:
+            self._released = True
+            self._pool.release(self)
+
+    def __getattr__(self, name):
+        return getattr(self.raw, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def _reset(self) -> bool:
+        """Готовит соединение к повторной выдаче; False — соединение испорчено."""
+        for cursor in self._cursors:
+            try:
+                cursor.close()
+            except Exception:
+                pass
+        self._cursors.clear()
+        try:
+            self.raw.rollback()
+        except Exception:
+            return False
+        return True
+
+
+class ConnectionPool:
+    def __init__(
+        self,
+        connect: Callable[[], Any],
+        min_size: int = 2,
+        max_size: int = 20,
+        timeout: float = 5.0,
+        max_lifetime: float = 1800.0,
+        health_check_idle: float = 5.0,
+        health_check: Optional[Callable[[Any], None]] = None,
+    ):
+        if max_size < 1 or not 0 <= min_size <= max_size:
+            raise ValueError("pool size must satisfy 0 <= min_size <= max_size, max_size >= 1")
+        self._connect = connect
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.health_check_idle = health_check_idle
+        self._health_check = health_check or _select_one
+        self._cond = threading.Condition()
+        self._idle: Deque[PooledConnection] = deque()
+        self._size = 0
+        self._waiting = 0
+        self._closed = False
+
+        self._acquired = 0
+        self._created = 0
+        self._recycled = 0
+        self._discarded = 0
+        self._timeouts = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    def prewarm(self) -> int:
+        """Открывает соединения до min_size; возвращает число открытых."""
+        opened = 0
+        while True:
+            with self._cond:
+                if self._closed or self._size >= self.min_size:
+                    return opened
+                self._size += 1
+            try:
+                conn = self._open()
+            except Exception:
+                with self._cond:
+                    self._size -= 1
+                    self._cond.notify()
+                raise
+            with self._cond:
+                self._idle.append(conn)
+                self._cond.notify()
+            opened += 1
+
+    def acquire(self, timeout: Optional[float] = None) -> PooledConnection:
+        timeout = self.timeout if timeout is None else timeout
+        started = time.monotonic()
+        deadline = started + timeout
+        while True:
+            conn = None
+            create = False
+            with self._cond:
+                self._waiting += 1
+                try:
+                    while not self._idle and self._size >= self.max_size:
+                        if self._closed:
+                            raise RuntimeError("connection pool is closed")
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            self._timeouts += 1
+                            raise PoolTimeout(
+                                f"no database connection available within {timeout:.1f}s")
+                        self._cond.wait(remaining)
+                finally:
+                    self._waiting -= 1
+                if self._closed:
+                    raise RuntimeError("connection pool is closed")
+                if self._idle:
+                    # LIFO: недавно использованные соединения «теплее»
+                    conn = self._idle.pop()
+                else:
+                    self._size += 1
+                    create = True
+
+            if create:
+                try:
+                    conn = self._open()
+                except Exception:
+                    with self._cond:
+                        self._size -= 1
+                        self._cond.notify()
+                    raise
+            elif not self._usable(conn):
+                continue
+
+            waited = time.monotonic() - started
+            with self._cond:
+                self._acquired += 1
+                self._wait_total += waited
+                if waited > self._wait_max:
+                    self._wait_max = waited
+            conn._released = False
+            return conn
+
+    def release(self, conn: PooledConnection) -> None:
+        healthy = conn._reset()
+        expired = time.monotonic() - conn.created_at >= self.max_lifetime
+        with self._cond:
+            if healthy and not expired and not self._closed:
+                conn.last_used = time.monotonic()
+                self._idle.append(conn)
+                self._cond.notify()
+                return
+        self._discard(conn, recycled=healthy and expired)
+
+    def stats(self) -> dict:
+        with self._cond:
+            idle = len(self._idle)
+            return {
+                "size": self._size,
+                "in_use": self._size - idle,
+                "idle": idle,
+                "waiting": self._waiting,
+                "min_size": self.min_size,
+                "max_size": self.max_size,
+                "acquired": self._acquired,
+                "created": self._created,
+                "recycled": self._recycled,
+                "discarded": self._discarded,
+                "timeouts": self._timeouts,
+                "wait_avg_ms": round(self._wait_total / self._acquired * 1000, 3) if self._acquired else 0.0,
+                "wait_max_ms": round(self._wait_max * 1000, 3),
+            }
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+            self._cond.notify_all()
+        for conn in idle:
+            self._discard(conn)
+
+    def _open(self) -> PooledConnection:
+        raw = self._connect()
+        with self._cond:
+            self._created += 1
+        return PooledConnection(self, raw, time.monotonic())
+
+    def _usable(self, conn: PooledConnection) -> bool:
+        now = time.monotonic()
+        if now - conn.created_at >= self.max_lifetime:
+            self._discard(conn, recycled=True)
+            return False
+        if now - conn.last_used >= self.health_check_idle:
+            try:
+                self._health_check(conn.raw)
+            except Exception:
+                logger.warning("discarding broken pooled connection", exc_info=True)
+                self._discard(conn)
+                return False
+        return True
+
+    def _discard(self, conn: PooledConnection, recycled: bool = False) -> None:
+        try:
+            conn.raw.close()
+        except Exception:
+            pass
+        with self._cond:
+            self._size -= 1
+            if recycled:
+                self._recycled += 1
+            else:
+                self._discarded += 1
+            self._cond.notify()
+
+
+def _select_one(raw) -> None:
+    cursor = raw.cursor()
+    try:
+        cursor.execute("SELECT 1")
+        cursor.fetchone()
+    finally:
+        cursor.close()
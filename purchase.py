@@ -0,0 +1,285 @@
+import asyncio
+import logging
+from collections import deque
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import Any, Deque, Dict, List, Optional, Sequence, Set, Tuple
+
+import repository
+from admission import BACKGROUND, CRITICAL
+from backends import Backend, get_backend
+from config import settings
+from db import run_db
+
+
+logger = logging.getLogger(__name__)
+
+# Больше билетов за одну покупку или бронь не продаём
+MAX_PURCHASE_SIZE = 100
+# Сколько раз пересчитывать распределение, если остаток изменил другой процесс
+MAX_ALLOCATION_ATTEMPTS = 5
+
+_INCREMENT_SQL = "UPDATE tickets SET quantity = quantity + ? WHERE id = ?"
+_AVAILABLE_SQL = "SELECT quantity FROM tickets WHERE id = ?"
+
+
+@lru_cache(maxsize=None)
+def _statements(backend: Backend) -> Dict[str, str]:
+    """Запросы с OUTPUT/RETURNING на диалекте бэкенда."""
+    return {
+        "decrement": backend.update_returning(
+            "tickets", "quantity = quantity - ?", "id = ? AND quantity >= ?", ("quantity",)),
+        "insert_hold": backend.insert_returning_id("ticket_holds", "ticket_id, quantity, expires_at", "?, ?, ?"),
+        "take_hold": backend.delete_returning("ticket_holds", "id = ? AND expires_at > ?", ("ticket_id", "quantity")),
+        "drop_hold": backend.delete_returning("ticket_holds", "id = ?", ("ticket_id", "quantity")),
+        "take_expired": backend.delete_returning("ticket_holds", "expires_at <= ?", ("ticket_id", "quantity")),
+    }
+
+
+def _sql(name: str) -> str:
+    return _statements(get_backend())[name]
+
+
+class SoldOut(Exception):
+    """Билетов этого типа осталось меньше, чем запрошено."""
+
+
+class HoldMismatch(ValueError):
+    """Число участников не совпадает с количеством в брони."""
+
+
+def _sold_out(ticket_id: int) -> SoldOut:
+    return SoldOut(f"not enough tickets of type {ticket_id}")
+
+
+def _decrement(cursor, ticket_id: int, quantity: int) -> Optional[int]:
+    """Атомарно списывает quantity; возвращает остаток или None, если не хватило."""
+    cursor.execute(_sql("decrement"), quantity, ticket_id, quantity)
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def _available(cursor, ticket_id: int) -> Optional[int]:
+    cursor.execute(_AVAILABLE_SQL, ticket_id)
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def _insert_attendees(conn, ticket_id: int, requests: Sequence[Sequence[Dict[str, Any]]]) -> List[List[Dict[str, Any]]]:
+    items = [dict(person, ticket_id=ticket_id) for people in requests for person in people]
+    ids = iter(repository.attendees.insert_many(conn, items, commit=False))
+    created = iter(items)
+    return [[dict(next(created), id=next(ids)) for _ in people] for people in requests]
+
+
+def purchase_batch(conn, ticket_id: int, requests: Sequence[Sequence[Dict[str, Any]]]) -> List[Any]:
+    """Покупки одного типа билета одной короткой транзакцией.
+
+    requests — списки участников, по одному на покупку. Для каждой покупки
+    возвращается список созданных участников, SoldOut или None (билета нет).
+    Остаток никогда не читается и не пишется обратно целиком: списание —
+    условный UPDATE quantity = quantity - ? WHERE quantity >= ?, поэтому
+    перепродажа невозможна даже при нескольких процессах.
+    """
+    cursor = conn.cursor()
+    counts = [len(people) for people in requests]
+    granted = list(range(len(requests)))
+    remaining = _decrement(cursor, ticket_id, sum(counts))
+    attempts = 0
+    while remaining is None:
+        # На всех не хватило: раздаём остаток по порядку очереди тем, кому хватает
+        available = _available(cursor, ticket_id)
+        if available is None:
+            return [None] * len(requests)
+        granted = []
+        for index, count in enumerate(counts):
+            if count <= available:
+                granted.append(index)
+                available -= count
+        attempts += 1
+        if not granted or attempts > MAX_ALLOCATION_ATTEMPTS:
+            conn.rollback()
+            return [_sold_out(ticket_id) for _ in requests]
+        remaining = _decrement(cursor, ticket_id, sum(counts[index] for index in granted))
+
+    created = _insert_attendees(conn, ticket_id, [requests[index] for index in granted])
+    conn.commit()
+    results: List[Any] = [_sold_out(ticket_id) for _ in requests]
+    for index, attendees in zip(granted, created):
+        results[index] = attendees
+    return results
+
+
+# --- Брони ---
+
+def create_hold(conn, ticket_id: int, quantity: int, ttl: float) -> Optional[Dict[str, Any]]:
+    cursor = conn.cursor()
+    if _decrement(cursor, ticket_id, quantity) is None:
+        if _available(cursor, ticket_id) is None:
+            return None
+        raise _sold_out(ticket_id)
+    expires_at = datetime.utcnow() + timedelta(seconds=ttl)
+    cursor.execute(_sql("insert_hold"), ticket_id, quantity, expires_at)
+    hold_id = cursor.fetchone()[0]
+    conn.commit()
+    return {"id": hold_id, "ticket_id": ticket_id, "quantity": quantity, "expires_at": expires_at}
+
+
+def confirm_hold(conn, hold_id: int, people: Sequence[Dict[str, Any]]) -> Optional[List[Dict[str, Any]]]:
+    """Превращает бронь в участников. None — брони нет или она истекла."""
+    cursor = conn.cursor()
+    cursor.execute(_sql("take_hold"), hold_id, datetime.utcnow())
+    row = cursor.fetchone()
+    if not row:
+        return None
+    ticket_id, quantity = row
+    if quantity != len(people):
+        conn.rollback()
+        raise HoldMismatch(f"hold {hold_id} is for {quantity} tickets, got {len(people)} attendees")
+    created = _insert_attendees(conn, ticket_id, [people])[0]
+    conn.commit()
+    return created
+
+
+def release_hold(conn, hold_id: int) -> Optional[int]:
+    """Возвращает билеты брони в продажу; id типа билета или None — брони нет."""
+    cursor = conn.cursor()
+    cursor.execute(_sql("drop_hold"), hold_id)
+    row = cursor.fetchone()
+    if not row:
+        return None
+    cursor.execute(_INCREMENT_SQL, row[1], row[0])
+    conn.commit()
+    return row[0]
+
+
+def release_expired_holds(conn) -> int:
+    """Возвращает в продажу билеты из просроченных броней; число броней."""
+    cursor = conn.cursor()
+    cursor.execute(_sql("take_expired"), datetime.utcnow())
+    expired = cursor.fetchall()
+    released: Dict[int, int] = {}
+    for ticket_id, quantity in expired:
+        released[ticket_id] = released.get(ticket_id, 0) + quantity
+    # Порядок по id билета — одинаковый порядок блокировок у всех процессов
+    for ticket_id in sorted(released):
+        cursor.execute(_INCREMENT_SQL, released[ticket_id], ticket_id)
+    conn.commit()
+    return len(expired)
+
+
+async def sweep_expired_holds(interval: float) -> None:
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            released = await run_db("tickets", release_expired_holds, priority=BACKGROUND)
+            if released:
+                logger.info("released %d expired ticket holds", released)
+        except Exception:
+            logger.warning("expired hold sweep failed", exc_info=True)
+
+
+# --- Очередь покупок ---
+
+class PurchaseQueue:
+    """Очередь покупок на каждый тип билета внутри процесса.
+
+    Пока транзакция по билету выполняется, новые покупки копятся в очереди
+    и следующей пачкой (до max_batch) уходят в одну транзакцию. По горячему
+    билету работает ровно одна транзакция на процесс: нет борьбы за
+    блокировку строки, а цена коммита делится на всю пачку.
+    """
+
+    def __init__(self, max_batch: int):
+        self.max_batch = max_batch
+        self._pending: Dict[int, Deque[Tuple[List[Dict[str, Any]], asyncio.Future]]] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._tasks: Set[asyncio.Task] = set()
+        self.purchases = 0
+        self.sold_out = 0
+        self.batches = 0
+        self.max_batch_seen = 0
+
+    async def submit(self, ticket_id: int, people: List[Dict[str, Any]]):
+        loop = asyncio.get_running_loop()
+        # Очередь привязана к циклу событий; тесты запускают новый цикл на каждый вызов
+        if self._loop is not loop:
+            self._pending = {}
+            self._loop = loop
+        future = loop.create_future()
+        queue = self._pending.get(ticket_id)
+        if queue is None:
+            queue = self._pending[ticket_id] = deque()
+            task = loop.create_task(self._drain(ticket_id, queue))
+            # Держим ссылку, иначе задачу может собрать сборщик мусора
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        queue.append((people, future))
+        return await future
+
+    async def _drain(self, ticket_id: int, queue: Deque) -> None:
+        try:
+            while queue:
+                batch = []
+                while queue and len(batch) < self.max_batch:
+                    people, future = queue.popleft()
+                    # Клиент уже отключился — билеты ему не списываем
+                    if not future.cancelled():
+                        batch.append((people, future))
+                if batch:
+                    await self._run(ticket_id, batch)
+        finally:
+            if self._pending.get(ticket_id) is queue:
+                del self._pending[ticket_id]
+
+    async def _run(self, ticket_id: int, batch) -> None:
+        self.batches += 1
+        self.max_batch_seen = max(self.max_batch_seen, len(batch))
+        try:
+            results = await run_db(
+                "tickets", purchase_batch, ticket_id, [people for people, _ in batch], priority=CRITICAL)
+        except Exception as exc:
+            if len(batch) == 1:
+                results = [exc]
+            else:
+                # Ошибка одной покупки не должна ронять всю пачку: повторяем по одной
+                logger.warning("purchase batch for ticket %s failed, retrying one by one", ticket_id, exc_info=True)
+                for item in batch:
+                    await self._run(ticket_id, [item])
+                return
+        for (_, future), result in zip(batch, results):
+            if isinstance(result, SoldOut):
+                self.sold_out += 1
+            elif isinstance(result, list):
+                self.purchases += 1
+            if future.done():
+                continue
+            if isinstance(result, BaseException):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": settings.purchase_queue_enabled,
+            "max_batch": self.max_batch,
+            "purchases": self.purchases,
+            "sold_out": self.sold_out,
+            "batches": self.batches,
+            "avg_batch": round((self.purchases + self.sold_out) / self.batches, 2) if self.batches else 0.0,
+            "max_batch_seen": self.max_batch_seen,
+            "queued": sum(len(queue) for queue in self._pending.values()),
+        }
+
+
+purchase_queue = PurchaseQueue(settings.purchase_batch_max)
+
+
+async def purchase(ticket_id: int, people: List[Dict[str, Any]]) -> Optional[List[Dict[str, Any]]]:
+    """Покупка билетов на список участников; SoldOut, если не хватает."""
+    if settings.purchase_queue_enabled:
+        return await purchase_queue.submit(ticket_id, people)
+    result = (await run_db("tickets", purchase_batch, ticket_id, [people], priority=CRITICAL))[0]
+    if isinstance(result, SoldOut):
+        raise result
+    return result
@@ -0,0 +1,330 @@
+import array
+import asyncio
+import bisect
+import logging
+import mmap
+import os
+import struct
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, NamedTuple, Optional, Sequence, Tuple
+
+import repository
+from admission import BACKGROUND, READ
+from config import settings
+from db import run_db
+from serialization import dumps, loads
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: сборки процессов хоста не упорядочены между собой
+    fcntl = None
+
+
+logger = logging.getLogger(__name__)
+
+TABLES = (repository.venues, repository.organizers)
+
+MAGIC = b"EVREFSNP"
+FORMAT = 1
+# magic, формат, флаг «файл заменён», версия, время сборки (unix), число таблиц
+_HEADER = struct.Struct("<8sHB5xQdQ")
+_STALE_AT = 10
+# Имя таблицы, число строк, смещения id, смещений строк и данных
+_TABLE = struct.Struct("<16sQQQQ")
+
+
+class Header(NamedTuple):
+    version: int
+    built_at: float
+    stale: bool
+
+
+def _pad(size: int) -> int:
+    return (size + 7) & ~7
+
+
+def _encode_table(conn, repo: repository.Repository) -> Tuple[array.array, array.array, bytes]:
+    """id по возрастанию, конец JSON каждой строки в data и сами строки."""
+    ids = array.array("q")
+    ends = array.array("Q", [0])
+    data = bytearray()
+    for chunk in repo.stream(conn, 1000):
+        for row in chunk:
+            record = repo.to_dict(row)
+            ids.append(record["id"])
+            data += dumps(record)
+            ends.append(len(data))
+    return ids, ends, bytes(data)
+
+
+def encode_snapshot(tables: Sequence[Tuple[str, array.array, array.array, bytes]], version: int) -> bytes:
+    """Файл снимка: заголовок, каталог таблиц, затем по каждой таблице
+    массив id (int64), массив концов строк (uint64) и JSON строк подряд.
+    Массивы выровнены по 8 байт и читаются из отображения без копий;
+    порядок байт — хоста, файл между машинами не переносится."""
+    position = _HEADER.size + _TABLE.size * len(tables)
+    directory = bytearray()
+    for name, ids, ends, data in tables:
+        ids_at = position
+        ends_at = ids_at + ids.itemsize * len(ids)
+        data_at = ends_at + ends.itemsize * len(ends)
+        position = _pad(data_at + len(data))
+        directory += _TABLE.pack(name.encode(), len(ids), ids_at, ends_at, data_at)
+    out = bytearray(_HEADER.pack(MAGIC, FORMAT, 0, version, time.time(), len(tables)))
+    out += directory
+    for _, ids, ends, data in tables:
+        out += ids.tobytes()
+        out += ends.tobytes()
+        out += data
+        out += bytes(_pad(len(out)) - len(out))
+    return bytes(out)
+
+
+def read_header(path: str) -> Optional[Header]:
+    """Заголовок файла снимка; None — файла нет или он не наш."""
+    try:
+        with open(path, "rb") as file:
+            raw = file.read(_HEADER.size)
+    except OSError:
+        return None
+    if len(raw) < _HEADER.size:
+        return None
+    magic, fmt, stale, version, built_at, _ = _HEADER.unpack(raw)
+    if magic != MAGIC or fmt != FORMAT:
+        return None
+    return Header(version, built_at, bool(stale))
+
+
+def _mark_stale(file) -> None:
+    # Процессы видят байт через свои отображения файла и открывают новый
+    file.seek(_STALE_AT)
+    file.write(b"\x01")
+    file.flush()
+
+
+@contextmanager
+def _locked(path: str):
+    with open(path + ".lock", "a+b") as lock:
+        if fcntl is not None:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def build_snapshot(conn, path: str, max_age: Optional[float] = None) -> Optional[int]:
+    """Собирает снимок площадок и организаторов и атомарно подменяет файл path
+    (os.replace). Прежний файл помечается заменённым. Возвращает версию;
+    None — файл моложе max_age, сборка не нужна.
+
+    Сборки процессов хоста идут по очереди (flock), и таблицы читаются под
+    блокировкой: версия старше — значит, и данные не старее. Если собрать
+    не удалось, текущий файл тоже помечается: процессы читают из БД, а не
+    из снимка, который уже не совпадает с ней.
+    """
+    with _locked(path):
+        current = read_header(path)
+        if (max_age is not None and current is not None and not current.stale
+                and time.time() - current.built_at < max_age):
+            return None
+        # Прежний файл открыт до подмены: помечаем именно его, а не новый
+        previous = open(path, "r+b") if current is not None else None
+        try:
+            tables = [(repo.table, *_encode_table(conn, repo)) for repo in TABLES]
+            version = (current.version if current is not None else 0) + 1
+            temporary = f"{path}.{os.getpid()}.tmp"
+            with open(temporary, "wb") as file:
+                file.write(encode_snapshot(tables, version))
+            os.replace(temporary, path)
+            return version
+        finally:
+            if previous is not None:
+                _mark_stale(previous)
+                previous.close()
+
+
+class _Table:
+    __slots__ = ("ids", "ends", "data")
+
+    def __init__(self, ids: memoryview, ends: memoryview, data: memoryview):
+        self.ids = ids
+        self.ends = ends
+        self.data = data
+
+
+class ReferenceData:
+    """Площадки и организаторы из общего для процессов хоста файла снимка.
+
+    Файл отображается в память (mmap) только на чтение: страницы одни на
+    все процессы uvicorn, память не растёт с их числом. Поиск по id —
+    двоичный поиск по массиву id прямо в отображении и разбор одной строки
+    JSON, без БД и без копий таблицы в процессе.
+
+    Запись площадки или организатора пересобирает файл (refresh) и ждёт
+    сборку: к ответу на запись её видят все процессы хоста. Новый файл
+    подменяет старый атомарно, старый помечается байтом в заголовке:
+    процессы проверяют его при каждом поиске (чтение памяти, не системный
+    вызов) и открывают новую версию. Уже открытые отображения остаются
+    целыми до конца поиска. Нет снимка или id в нём — чтение идёт в БД.
+
+    Записи с других хостов сюда не сообщают: refresh_periodically держит
+    снимок не старше REFDATA_MAX_AGE.
+    """
+
+    def __init__(self, path: str, retry_interval: float = 1.0):
+        self.path = path
+        self.retry_interval = retry_interval
+        self._map: Optional[mmap.mmap] = None
+        self._tables: Dict[str, _Table] = {}
+        self._next_open = 0.0
+        self.version = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
+        # Номер последнего запроса сборки и последнего, покрытого сборкой
+        self._requested = 0
+        self._built = 0
+        self.hits = 0
+        self.misses = 0
+        self.reloads = 0
+        self.builds = 0
+        self.build_failed = 0
+        self.build_seconds = 0.0
+
+    # --- Чтение ---
+
+    def _current(self) -> Optional[Dict[str, _Table]]:
+        mapped = self._map
+        if mapped is not None and not mapped[_STALE_AT]:
+            return self._tables
+        if not self.path:
+            return None
+        # Файла нет или он помечен без замены: не открываем его на каждом поиске
+        now = time.monotonic()
+        if mapped is None and now < self._next_open:
+            return None
+        self._open()
+        if self._map is None:
+            self._next_open = now + self.retry_interval
+            return None
+        return self._tables
+
+    def _open(self) -> None:
+        # Прежнее отображение закроется, когда на него не останется ссылок
+        self._map, self._tables = None, {}
+        try:
+            with open(self.path, "rb") as file:
+                mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, fmt, stale, version, _, count = _HEADER.unpack_from(mapped)
+        except (OSError, ValueError, struct.error):
+            return
+        if magic != MAGIC or fmt != FORMAT or stale:
+            return
+        view = memoryview(mapped)
+        tables = {}
+        for index in range(count):
+            name, rows, ids_at, ends_at, data_at = _TABLE.unpack_from(mapped, _HEADER.size + index * _TABLE.size)
+            tables[name.rstrip(b"\0").decode()] = _Table(
+                view[ids_at:ends_at].cast("q"), view[ends_at:data_at].cast("Q"), view[data_at:])
+        self._map, self._tables, self.version = mapped, tables, version
+        self.reloads += 1
+
+    def close(self) -> None:
+        """Отпускает отображение; следующий поиск откроет файл заново."""
+        self._map, self._tables, self._next_open = None, {}, 0.0
+
+    def get(self, table: str, item_id: int) -> Optional[Dict[str, Any]]:
+        """Строка по id; None — снимка нет или id в нём нет: читать из БД."""
+        tables = self._current()
+        entry = tables.get(table) if tables is not None else None
+        if entry is None:
+            return None
+        index = bisect.bisect_left(entry.ids, item_id)
+        if index == len(entry.ids) or entry.ids[index] != item_id:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return loads(entry.data[entry.ends[index]:entry.ends[index + 1]])
+
+    def get_many(self, table: str, ids: Iterable[int]) -> Dict[int, Dict[str, Any]]:
+        """Найденные в снимке строки; остальные id — читать из БД."""
+        rows = {}
+        for item_id in ids:
+            row = self.get(table, item_id)
+            if row is not None:
+                rows[item_id] = row
+        return rows
+
+    # --- Сборка ---
+
+    def _bind(self) -> asyncio.AbstractEventLoop:
+        loop = asyncio.get_running_loop()
+        # Задача привязана к циклу событий; тесты запускают новый цикл на каждый вызов
+        if self._loop is not loop:
+            self._task = None
+            self._loop = loop
+        return loop
+
+    async def refresh(self, max_age: Optional[float] = None) -> None:
+        """Пересобирает снимок и ждёт сборку, начатую после вызова: после
+        записи площадки или организатора. Одновременные записи ждут одну
+        сборку. max_age — собрать, только если файл старше (фоновая задача)."""
+        if not self.path:
+            return
+        self._bind()
+        self._requested += 1
+        target = self._requested
+        while self._built < target:
+            if self._task is None:
+                self._task = self._loop.create_task(self._build(self._requested, max_age))
+            await asyncio.shield(self._task)
+
+    async def _build(self, generation: int, max_age: Optional[float]) -> None:
+        started = time.perf_counter()
+        try:
+            version = await run_db(
+                "venues", build_snapshot, self.path, max_age,
+                priority=BACKGROUND if max_age is not None else READ)
+        except Exception:
+            # Файл помечен заменённым: процессы читают из БД до следующей сборки
+            self.build_failed += 1
+            logger.warning("reference data snapshot build failed", exc_info=True)
+        else:
+            if version is not None:
+                self.builds += 1
+                self.build_seconds = round(time.perf_counter() - started, 6)
+        finally:
+            self._built = max(self._built, generation)
+            self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        tables = self._current()
+        return {
+            "enabled": bool(self.path),
+            "version": self.version if tables is not None else None,
+            "rows": {name: len(entry.ids) for name, entry in (tables or {}).items()},
+            "size_bytes": len(self._map) if tables is not None else 0,
+            "hits": self.hits,
+            "misses": self.misses,
+            "reloads": self.reloads,
+            "builds": self.builds,
+            "build_failed": self.build_failed,
+            "build_seconds": self.build_seconds,
+        }
+
+
+async def refresh_periodically(interval: float) -> None:
+    """Сборка при старте и затем раз в interval, если файл старше interval:
+    из всех процессов хоста собирает один, остальные видят свежий файл."""
+    while True:
+        try:
+            await reference_data.refresh(max_age=interval)
+        except Exception:
+            logger.warning("reference data snapshot refresh failed", exc_info=True)
+        await asyncio.sleep(interval)
+
+
+reference_data = ReferenceData(settings.refdata_path)
@@ -0,0 +1,107 @@
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import repository
+
+
+# Связанные сущности, которые можно подгрузить к списку событий через ?include=
+EVENT_INCLUDES = ("organizer", "venue", "tickets")
+# Колонки события, по которым подгружается связь: при ?fields= их всё равно
+# нужно выбрать
+INCLUDE_COLUMNS = {"organizer": "organizer_id", "venue": "venue_id", "tickets": "id"}
+
+
+def parse_include(value: Optional[str], allowed: Sequence[str] = EVENT_INCLUDES) -> Tuple[str, ...]:
+    """"organizer,venue" -> ("organizer", "venue"); ValueError на неизвестное имя."""
+    if not value:
+        return ()
+    names = tuple(dict.fromkeys(name.strip() for name in value.split(",") if name.strip()))
+    unknown = [name for name in names if name not in allowed]
+    if unknown:
+        raise ValueError(f"include must be a subset of: {', '.join(allowed)}")
+    return names
+
+
+def attach_event_relations(conn, events: List[Dict[str, Any]], include: Sequence[str]) -> None:
+    """Дописывает к событиям organizer/venue/tickets.
+
+    На каждую связь — один запрос WHERE ... IN (...) на всю страницу, а не
+    по запросу на событие.
+    """
+    if not events:
+        return
+    if "organizer" in include:
+        organizers = repository.organizers.get_many(conn, [event["organizer_id"] for event in events])
+        for event in events:
+            event["organizer"] = organizers.get(event["organizer_id"])
+    if "venue" in include:
+        venues = repository.venues.get_many(conn, [event["venue_id"] for event in events])
+        for event in events:
+            event["venue"] = venues.get(event["venue_id"])
+    if "tickets" in include:
+        by_event: Dict[int, List[Dict[str, Any]]] = {event["id"]: [] for event in events}
+        for ticket in repository.tickets.find_in(conn, "event_id", list(by_event)):
+            by_event[ticket["event_id"]].append(ticket)
+        for event in events:
+            event["tickets"] = by_event[event["id"]]
+
+
+def events_page(conn, *page_args, include: Sequence[str] = ()):
+    """Страница событий и связи к ней на одном соединении."""
+    rows, last_key = repository.events.page(conn, *page_args)
+    attach_event_relations(conn, rows, include)
+    return rows, last_key
+
+
+def _select_list(alias: str, repo: repository.Repository) -> List[str]:
+    return [f"{alias}.{column}" for column in repo.select_columns]
+
+
+_EVENT_DETAIL_SQL = (
+    "SELECT " + ", ".join(
+        _select_list("e", repository.events)
+        + _select_list("o", repository.organizers)
+        + _select_list("v", repository.venues)
+        + _select_list("t", repository.tickets)) + " "
+    "FROM events e "
+    "LEFT JOIN organizers o ON o.id = e.organizer_id "
+    "LEFT JOIN venues v ON v.id = e.venue_id "
+    "LEFT JOIN tickets t ON t.event_id = e.id "
+    "WHERE e.id = ? "
+    "ORDER BY t.id"
+)
+
+
+def _split(row, repos: Sequence[repository.Repository]) -> List[Optional[Dict[str, Any]]]:
+    parts: List[Optional[Dict[str, Any]]] = []
+    offset = 0
+    for repo in repos:
+        width = len(repo.select_columns)
+        values = row[offset:offset + width]
+        offset += width
+        # LEFT JOIN без пары даёт NULL во всех колонках, в том числе в id
+        parts.append(repo.to_dict(values) if values[0] is not None else None)
+    return parts
+
+
+def event_detail(conn, event_id: int) -> Optional[Dict[str, Any]]:
+    """Событие с организатором, площадкой и билетами одним запросом с JOIN.
+
+    Строк в результате столько, сколько у события типов билетов (или одна,
+    если билетов нет); событие, организатор и площадка в них повторяются.
+    quantity билета — оставшееся количество, покупка его уменьшает.
+    """
+    cursor = conn.cursor()
+    cursor.execute(_EVENT_DETAIL_SQL, event_id)
+    rows = cursor.fetchall()
+    if not rows:
+        return None
+    repos = (repository.events, repository.organizers, repository.venues, repository.tickets)
+    event, organizer, venue, _ = _split(rows[0], repos)
+    tickets = [ticket for ticket in (_split(row, repos)[3] for row in rows) if ticket is not None]
+    event.update(
+        organizer=organizer,
+        venue=venue,
+        tickets=tickets,
+        tickets_remaining=sum(ticket["quantity"] or 0 for ticket in tickets),
+    )
+    return event
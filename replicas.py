@@ -0,0 +1,174 @@
+import contextvars
+import itertools
+import logging
+import threading
+import time
+from http.cookies import CookieError, SimpleCookie
+from typing import Any, Callable, Dict, List, Optional
+
+from pool import ConnectionPool, PooledConnection, PoolTimeout
+
+
+logger = logging.getLogger(__name__)
+
+# Кука клиента, только что писавшего в БД: до этого момента (unix-время)
+# его чтения идут в primary
+STICKY_COOKIE = "read_primary_until"
+# Заголовок для клиентов без кук: любое значение — читать из primary
+PRIMARY_HEADER = b"x-read-primary"
+
+_READ_METHODS = ("GET", "HEAD")
+
+# Куда идут чтения текущего запроса; вне запросов (фоновые задачи) — primary
+_read_from_replica: contextvars.ContextVar[bool] = contextvars.ContextVar("read_from_replica", default=False)
+# GET-запрос ушёл в primary из-за куки или заголовка: ему нельзя отдавать
+# то, что прочитали из реплики другие запросы (кэш сущностей)
+_pinned_to_primary: contextvars.ContextVar[bool] = contextvars.ContextVar("pinned_to_primary", default=False)
+
+
+class Replica:
+    __slots__ = ("name", "pool", "down_until", "failures", "served", "busy")
+
+    def __init__(self, name: str, pool: ConnectionPool):
+        self.name = name
+        self.pool = pool
+        self.down_until = 0.0
+        self.failures = 0
+        self.served = 0
+        self.busy = 0
+
+    def stats(self, now: float) -> Dict[str, Any]:
+        return {
+            "healthy": self.down_until <= now,
+            "down_for": round(max(0.0, self.down_until - now), 3),
+            "served": self.served,
+            "failures": self.failures,
+            "busy": self.busy,
+            "pool": self.pool.stats(),
+        }
+
+
+class ReplicaSet:
+    """Реплики для чтения: по кругу, мимо недоступных, с откатом на primary.
+
+    Реплика, к которой не удалось подключиться, считается недоступной
+    retry_interval секунд; после этого первое же чтение пробует её снова.
+    Занятая реплика (нет свободного соединения за acquire_timeout) не
+    помечается недоступной — чтение просто идёт в следующую. Если живых
+    реплик нет, acquire возвращает None и чтение уходит в primary.
+    """
+
+    def __init__(self, replicas: List[Replica], retry_interval: float, acquire_timeout: float):
+        self.replicas = replicas
+        self.retry_interval = retry_interval
+        self.acquire_timeout = acquire_timeout
+        self._order = itertools.count()
+        self._lock = threading.Lock()
+        self.fallbacks = 0
+
+    def acquire(self) -> Optional[PooledConnection]:
+        count = len(self.replicas)
+        start = next(self._order)
+        for offset in range(count):
+            replica = self.replicas[(start + offset) % count]
+            if replica.down_until > time.monotonic():
+                continue
+            try:
+                conn = replica.pool.acquire(self.acquire_timeout)
+            except PoolTimeout:
+                with self._lock:
+                    replica.busy += 1
+                continue
+            except Exception:
+                with self._lock:
+                    replica.failures += 1
+                    replica.down_until = time.monotonic() + self.retry_interval
+                logger.warning("read replica %s is unavailable, failing over", replica.name, exc_info=True)
+                continue
+            with self._lock:
+                replica.served += 1
+                replica.down_until = 0.0
+            return conn
+        with self._lock:
+            self.fallbacks += 1
+        return None
+
+    def close(self) -> None:
+        for replica in self.replicas:
+            replica.pool.close()
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        return {
+            "replicas": {replica.name: replica.stats(now) for replica in self.replicas},
+            "fallbacks": self.fallbacks,
+        }
+
+
+def reads_from_replica() -> bool:
+    return _read_from_replica.get()
+
+
+def pinned_to_primary() -> bool:
+    return _pinned_to_primary.get()
+
+
+def read_from_primary() -> None:
+    """Чтения текущей задачи — из primary. Для фоновых задач, запущенных из
+    GET-запроса: они наследуют его контекст, но пишут."""
+    _read_from_replica.set(False)
+
+
+def _sticky(scope, now: float) -> bool:
+    cookie_header = b""
+    for name, value in scope.get("headers", ()):
+        if name == PRIMARY_HEADER:
+            return True
+        if name == b"cookie":
+            cookie_header = value
+    if not cookie_header:
+        return False
+    cookie = SimpleCookie()
+    try:
+        cookie.load(cookie_header.decode("latin-1"))
+        return float(cookie[STICKY_COOKIE].value) > now
+    except (CookieError, KeyError, ValueError):
+        return False
+
+
+class ReadRoutingMiddleware:
+    """Чистый ASGI: GET и HEAD читают из реплик, всё остальное — из primary.
+
+    Успешный запрос на запись ставит клиенту куку STICKY_COOKIE на
+    sticky_seconds: пока она жива, его чтения идут в primary и он видит
+    свою запись, даже если реплики отстают (read-your-writes). Кука хранит
+    момент окончания, поэтому работает и через несколько процессов.
+    """
+
+    def __init__(self, app, sticky_seconds: float, enabled: Callable[[], bool]):
+        self.app = app
+        self.sticky_seconds = sticky_seconds
+        self.enabled = enabled
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.enabled():
+            return await self.app(scope, receive, send)
+        if scope["method"] in _READ_METHODS:
+            sticky = _sticky(scope, time.time())
+            token = _read_from_replica.set(not sticky)
+            pinned = _pinned_to_primary.set(sticky)
+            try:
+                return await self.app(scope, receive, send)
+            finally:
+                _pinned_to_primary.reset(pinned)
+                _read_from_replica.reset(token)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and message["status"] < 400 and self.sticky_seconds > 0:
+                until = time.time() + self.sticky_seconds
+                cookie = (f"{STICKY_COOKIE}={until:.3f}; Max-Age={int(self.sticky_seconds) or 1}; "
+                          f"Path=/; HttpOnly; SameSite=Lax")
+                message = dict(message, headers=[*message.get("headers", ()), (b"set-cookie", cookie.encode())])
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
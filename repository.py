@@ -0,0 +1,357 @@
+import re
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Set, Tuple, Union
+
+from backends import get_backend
+from etag import PreconditionFailed, compute_etag, precondition_holds
+from pagination import keyset_condition
+
+
+# SQL Server принимает не больше 2100 параметров на запрос
+MAX_PARAMS = 2000
+
+# Ключ фильтра: "venue_id" — равенство, "start_date>=" — сравнение
+_FILTER = re.compile(r"^(\w+)(>=|<=|>|<)?$")
+
+
+class Repository:
+    """CRUD-запросы к одной таблице. Методы синхронные и принимают соединение
+    первым аргументом, поэтому выполняются в пуле потоков через db.run_db."""
+
+    def __init__(
+        self,
+        table: str,
+        columns: Sequence[str],
+        sortable: Sequence[str] = (),
+        filterable: Sequence[str] = (),
+    ):
+        self.table = table
+        # Колонки без id, в порядке полей модели
+        self.columns: Tuple[str, ...] = tuple(columns)
+        self.select_columns: Tuple[str, ...] = ("id",) + self.columns
+        # Белые списки для ORDER BY и WHERE в списочных запросах
+        self.sortable: Tuple[str, ...] = ("id",) + tuple(sortable)
+        self.filterable: Tuple[str, ...] = tuple(filterable)
+
+        self._statements: Dict[str, Dict[str, str]] = {}
+
+    def _sql(self) -> Dict[str, str]:
+        """Запросы таблицы на диалекте текущего бэкенда, собранные один раз."""
+        backend = get_backend()
+        statements = self._statements.get(backend.name)
+        if statements is None:
+            column_list = ", ".join(self.columns)
+            placeholders = ", ".join("?" for _ in self.columns)
+            assignments = ", ".join(f"{column}=?" for column in self.columns)
+            select_list = ", ".join(self.select_columns)
+            statements = self._statements[backend.name] = {
+                "insert": backend.insert_returning_id(self.table, column_list, placeholders),
+                "get": f"SELECT {select_list} FROM {self.table} WHERE id=?",
+                # Строка заблокирована до конца транзакции: между проверкой
+                # If-Match и UPDATE/DELETE её никто не изменит
+                "locked_get": backend.locked_select(select_list, self.table, "id=?"),
+                "export": f"SELECT {select_list} FROM {self.table} ORDER BY id",
+                "update": f"UPDATE {self.table} SET {assignments} WHERE id=?",
+                "delete": f"DELETE FROM {self.table} WHERE id=?",
+            }
+        return statements
+
+    def to_dict(self, row, columns: Optional[Sequence[str]] = None) -> Dict[str, Any]:
+        return dict(zip(columns or self.select_columns, row))
+
+    def fields(self, value: Optional[str]) -> Optional[Tuple[str, ...]]:
+        """Разбирает ?fields=a,b в список колонок для SELECT; id есть всегда.
+        None — все колонки."""
+        if value is None:
+            return None
+        names = [name.strip() for name in value.split(",") if name.strip()]
+        unknown = [name for name in names if name not in self.select_columns]
+        if not names or unknown:
+            raise ValueError(
+                f"unknown fields for {self.table}: {', '.join(unknown) or value!r}, "
+                f"expected any of {', '.join(self.select_columns)}")
+        return tuple(dict.fromkeys(["id"] + names))
+
+    def values(self, data: Dict[str, Any]) -> List[Any]:
+        return [data[column] for column in self.columns]
+
+    def insert(self, conn, data: Dict[str, Any]) -> int:
+        cursor = conn.cursor()
+        cursor.execute(self._sql()["insert"], *self.values(data))
+        new_id = cursor.fetchone()[0]
+        conn.commit()
+        return new_id
+
+    def get(self, conn, item_id: int, columns: Optional[Sequence[str]] = None) -> Optional[Dict[str, Any]]:
+        cursor = conn.cursor()
+        if columns is None:
+            cursor.execute(self._sql()["get"], item_id)
+        else:
+            cursor.execute(f"SELECT {', '.join(columns)} FROM {self.table} WHERE id=?", item_id)
+        row = cursor.fetchone()
+        return self.to_dict(row, columns) if row else None
+
+    def page(
+        self,
+        conn,
+        limit: int,
+        order_by: str = "id",
+        descending: bool = False,
+        after: Optional[Tuple[Any, int]] = None,
+        filters: Optional[Dict[str, Any]] = None,
+        columns: Optional[Sequence[str]] = None,
+    ) -> Tuple[List[Dict[str, Any]], Optional[Tuple[Any, int]]]:
+        """Одна страница по ключу (order_by, id). Возвращает строки и ключ
+        последней строки, если дальше есть ещё данные.
+
+        columns сужает SELECT; id и order_by выбираются всегда — из них
+        строится курсор.
+        """
+        if order_by not in self.sortable:
+            raise ValueError(f"cannot order {self.table} by {order_by}")
+        if columns is None:
+            columns = self.select_columns
+        else:
+            columns = tuple(dict.fromkeys(("id", order_by) + tuple(columns)))
+        where: List[str] = []
+        params: List[Any] = []
+        for name, value in (filters or {}).items():
+            match = _FILTER.match(name)
+            if not match or match.group(1) not in self.filterable:
+                raise ValueError(f"cannot filter {self.table} by {name}")
+            column, op = match.groups()
+            where.append(f"{column}{op or '='}?")
+            params.append(value)
+        if after is not None:
+            condition, condition_params = keyset_condition(order_by, descending, *after)
+            where.append(condition)
+            params.extend(condition_params)
+
+        direction = " DESC" if descending else ""
+        order = [f"{order_by}{direction}"] if order_by == "id" else [f"{order_by}{direction}", f"id{direction}"]
+        rest = f"FROM {self.table}"
+        if where:
+            rest += " WHERE " + " AND ".join(where)
+        rest += " ORDER BY " + ", ".join(order)
+        backend = get_backend()
+        sql = backend.select_limited(", ".join(columns), rest)
+        params = [limit + 1] + params if backend.limit_param_first else params + [limit + 1]
+
+        cursor = conn.cursor()
+        cursor.execute(sql, *params)
+        rows = [self.to_dict(row, columns) for row in cursor.fetchall()]
+        if len(rows) <= limit:
+            return rows, None
+        rows = rows[:limit]
+        return rows, (rows[-1][order_by], rows[-1]["id"])
+
+    def stream(self, conn, chunk_size: int, columns: Optional[Sequence[str]] = None) -> Iterator[List[tuple]]:
+        """Вся таблица порциями по chunk_size строк, без fetchall()."""
+        cursor = conn.cursor()
+        if columns is None:
+            cursor.execute(self._sql()["export"])
+        else:
+            cursor.execute(f"SELECT {', '.join(columns)} FROM {self.table} ORDER BY id")
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                return
+            yield rows
+
+    def insert_many(self, conn, items: Sequence[Dict[str, Any]], commit: bool = True) -> List[int]:
+        """Вставляет строки одной транзакцией, возвращает id в порядке items.
+        commit=False — вставка часть транзакции вызывающего.
+
+        Порядок строк в OUTPUT не гарантирован, зато INSERT ... SELECT ... ORDER BY
+        гарантирует порядок выдачи IDENTITY. Поэтому отсортированные id
+        соответствуют входному порядку.
+        """
+        backend = get_backend()
+        per_chunk = max(1, MAX_PARAMS // (len(self.columns) + 1))
+        cursor = conn.cursor()
+        ids: List[int] = []
+        for start in range(0, len(items), per_chunk):
+            chunk = items[start:start + per_chunk]
+            sql = backend.insert_ordered_returning_ids(self.table, self.columns, len(chunk))
+            params: List[Any] = []
+            for position, data in enumerate(chunk):
+                params.extend(self.values(data))
+                params.append(position)
+            cursor.execute(sql, *params)
+            ids.extend(sorted(row[0] for row in cursor.fetchall()))
+        if commit:
+            conn.commit()
+        return ids
+
+    def insert_each(
+        self, conn, items: Sequence[Dict[str, Any]], atomic: bool = False,
+    ) -> List[Union[int, Exception]]:
+        """Вставляет строки по одной, когда insert_many упал на ограничении БД.
+
+        Для каждой строки — новый id или ошибка целостности драйвера. Без
+        atomic каждая строка коммитится отдельно; с atomic — одной
+        транзакцией, которая на первой ошибке откатывается, а список
+        обрывается на ней.
+        """
+        errors = get_backend().integrity_errors()
+        cursor = conn.cursor()
+        results: List[Union[int, Exception]] = []
+        for data in items:
+            try:
+                cursor.execute(self._sql()["insert"], *self.values(data))
+                results.append(cursor.fetchone()[0])
+            except errors as exc:
+                conn.rollback()
+                results.append(exc)
+                if atomic:
+                    return results
+                continue
+            if not atomic:
+                conn.commit()
+        conn.commit()
+        return results
+
+    def existing_ids(self, conn, ids: Sequence[int]) -> Set[int]:
+        cursor = conn.cursor()
+        found: Set[int] = set()
+        for start in range(0, len(ids), MAX_PARAMS):
+            chunk = ids[start:start + MAX_PARAMS]
+            cursor.execute(
+                f"SELECT id FROM {self.table} WHERE id IN ({', '.join('?' for _ in chunk)})", *chunk)
+            found.update(row[0] for row in cursor.fetchall())
+        return found
+
+    def find_in(self, conn, column: str, values: Sequence[Any]) -> List[Dict[str, Any]]:
+        """Строки с column IN (values): один запрос на MAX_PARAMS значений
+        вместо запроса на каждое значение."""
+        if column != "id" and column not in self.filterable:
+            raise ValueError(f"cannot filter {self.table} by {column}")
+        values = list(dict.fromkeys(values))
+        cursor = conn.cursor()
+        rows: List[Dict[str, Any]] = []
+        for start in range(0, len(values), MAX_PARAMS):
+            chunk = values[start:start + MAX_PARAMS]
+            cursor.execute(
+                f"SELECT {', '.join(self.select_columns)} FROM {self.table} "
+                f"WHERE {column} IN ({', '.join('?' for _ in chunk)}) ORDER BY id", *chunk)
+            rows.extend(self.to_dict(row) for row in cursor.fetchall())
+        return rows
+
+    def get_many(self, conn, ids: Sequence[int]) -> Dict[int, Dict[str, Any]]:
+        return {row["id"]: row for row in self.find_in(conn, "id", ids)}
+
+    def update_many(
+        self, conn, items: Sequence[Tuple[int, Dict[str, Any]]], atomic: bool = False,
+    ) -> Set[int]:
+        """Обновляет строки одной транзакцией через executemany
+        (fast_executemany на SQL Server).
+
+        Возвращает множество отсутствующих id. При atomic=True и хотя бы одном
+        отсутствующем id ничего не коммитится.
+        """
+        found = self.existing_ids(conn, [item_id for item_id, _ in items])
+        missing = {item_id for item_id, _ in items if item_id not in found}
+        if missing and atomic:
+            return missing
+        rows = [self.values(data) + [item_id] for item_id, data in items if item_id in found]
+        if rows:
+            get_backend().executemany(conn.cursor(), self._sql()["update"], rows)
+        conn.commit()
+        return missing
+
+    def update_each(
+        self, conn, items: Sequence[Tuple[int, Dict[str, Any]]], atomic: bool = False,
+    ) -> List[Union[bool, Exception]]:
+        """Обновляет строки по одной, когда update_many упал на ограничении БД.
+
+        Для каждой строки — True, False (строки нет) или ошибка целостности.
+        Транзакции — как в insert_each; с atomic отсутствующая строка тоже
+        откатывает всё.
+        """
+        errors = get_backend().integrity_errors()
+        cursor = conn.cursor()
+        results: List[Union[bool, Exception]] = []
+        for item_id, data in items:
+            try:
+                cursor.execute(self._sql()["update"], *self.values(data), item_id)
+                results.append(cursor.rowcount > 0)
+            except errors as exc:
+                conn.rollback()
+                results.append(exc)
+                if atomic:
+                    return results
+                continue
+            if atomic and not results[-1]:
+                conn.rollback()
+                return results
+            if not atomic:
+                conn.commit()
+        conn.commit()
+        return results
+
+    def delete_many(self, conn, ids: Sequence[int], atomic: bool = False) -> Set[int]:
+        """Удаляет строки по списку id одной транзакцией; возвращает отсутствующие id."""
+        found = self.existing_ids(conn, ids)
+        missing = set(ids) - found
+        if missing and atomic:
+            return missing
+        cursor = conn.cursor()
+        existing = sorted(found)
+        for start in range(0, len(existing), MAX_PARAMS):
+            chunk = existing[start:start + MAX_PARAMS]
+            cursor.execute(
+                f"DELETE FROM {self.table} WHERE id IN ({', '.join('?' for _ in chunk)})", *chunk)
+        conn.commit()
+        return missing
+
+    def _check_version(self, cursor, item_id: int, if_match: str) -> bool:
+        """False — строки нет; PreconditionFailed — строка изменилась."""
+        get_backend().begin_write(cursor)
+        cursor.execute(self._sql()["locked_get"], item_id)
+        row = cursor.fetchone()
+        if not row:
+            return False
+        if not precondition_holds(if_match, compute_etag(self.to_dict(row))):
+            raise PreconditionFailed(f"{self.table} {item_id} was modified")
+        return True
+
+    def update(self, conn, item_id: int, data: Dict[str, Any], if_match: Optional[str] = None) -> bool:
+        cursor = conn.cursor()
+        if if_match is not None and not self._check_version(cursor, item_id, if_match):
+            return False
+        cursor.execute(self._sql()["update"], *self.values(data), item_id)
+        if cursor.rowcount == 0:
+            return False
+        conn.commit()
+        return True
+
+    def delete(self, conn, item_id: int, if_match: Optional[str] = None) -> bool:
+        cursor = conn.cursor()
+        if if_match is not None and not self._check_version(cursor, item_id, if_match):
+            return False
+        cursor.execute(self._sql()["delete"], item_id)
+        if cursor.rowcount == 0:
+            return False
+        conn.commit()
+        return True
+
+
+organizers = Repository(
+    "organizers", ("name", "contact_info"),
+    sortable=("name",))
+venues = Repository(
+    "venues", ("name", "address"),
+    sortable=("name",))
+events = Repository(
+    "events", ("title", "description", "organizer_id", "venue_id", "start_date", "end_date"),
+    sortable=("title", "start_date", "end_date"),
+    filterable=("organizer_id", "venue_id", "start_date", "end_date"))
+tickets = Repository(
+    "tickets", ("event_id", "price", "ticket_type", "quantity"),
+    sortable=("price", "ticket_type"),
+    filterable=("event_id",))
+attendees = Repository(
+    "attendees", ("ticket_id", "name", "email"),
+    sortable=("name", "email"),
+    filterable=("ticket_id", "email"))
+checkins = Repository(
+    "checkins", ("attendee_id", "checked_in_at"))
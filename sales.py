@@ -0,0 +1,387 @@
+import asyncio
+import logging
+import time
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from admission import BACKGROUND
+from backends import get_backend
+from config import settings
+from db import run_db
+from replicas import read_from_primary
+from repository import MAX_PARAMS
+
+
+logger = logging.getLogger(__name__)
+
+EVENT_COLUMNS = ("organizer_id", "ticket_types", "tickets_remaining", "tickets_sold", "revenue")
+ORGANIZER_COLUMNS = ("events", "ticket_types", "tickets_remaining", "tickets_sold", "revenue")
+
+# Сводка событий по билетам и участникам. Проданные считаются по индексу
+# IX_attendees_ticket_id для каждого билета: события без билетов тоже
+# получают строку, а чтение attendees ограничено билетами этих событий.
+_EVENT_TOTALS = (
+    "SELECT e.id, e.organizer_id, COUNT(t.id), COALESCE(SUM(t.quantity), 0), "
+    "COALESCE(SUM(t.sold), 0), COALESCE(SUM(t.sold * t.price), 0) "
+    "FROM events e LEFT JOIN ("
+    "SELECT tickets.id, tickets.event_id, tickets.quantity, tickets.price, "
+    "(SELECT COUNT(*) FROM attendees a WHERE a.ticket_id = tickets.id) AS sold FROM tickets"
+    ") t ON t.event_id = e.id"
+)
+_ORGANIZER_TOTALS = (
+    "SELECT organizer_id, COUNT(*), SUM(ticket_types), SUM(tickets_remaining), SUM(tickets_sold), SUM(revenue) "
+    "FROM event_stats"
+)
+
+Totals = Tuple[int, int, int, int, float]
+
+
+def _marks(values: Sequence[Any]) -> str:
+    return ", ".join("?" for _ in values)
+
+
+def _chunks(ids: Sequence[int]) -> Iterable[Sequence[int]]:
+    for start in range(0, len(ids), MAX_PARAMS):
+        yield ids[start:start + MAX_PARAMS]
+
+
+def _totals(row: Sequence[Any]) -> Totals:
+    # DECIMAL приходит из SQL Server как Decimal, из SQLite — как float
+    return int(row[0]), int(row[1]), int(row[2]), int(row[3]), round(float(row[4]), 2)
+
+
+def _distinct(conn, column: str, table: str, ids: Sequence[int]) -> Set[int]:
+    cursor = conn.cursor()
+    found: Set[int] = set()
+    for chunk in _chunks(sorted(set(ids))):
+        cursor.execute(f"SELECT DISTINCT {column} FROM {table} WHERE id IN ({_marks(chunk)})", *chunk)
+        found.update(row[0] for row in cursor.fetchall())
+    return found
+
+
+def event_totals(conn, event_ids: Optional[Sequence[int]] = None) -> Dict[int, Totals]:
+    """Сводки событий, посчитанные заново; None — всех событий."""
+    cursor = conn.cursor()
+    if event_ids is None:
+        cursor.execute(_EVENT_TOTALS + " GROUP BY e.id, e.organizer_id")
+        return {row[0]: _totals(row[1:]) for row in cursor.fetchall()}
+    totals: Dict[int, Totals] = {}
+    for chunk in _chunks(sorted(event_ids)):
+        cursor.execute(_EVENT_TOTALS + f" WHERE e.id IN ({_marks(chunk)}) GROUP BY e.id, e.organizer_id", *chunk)
+        totals.update((row[0], _totals(row[1:])) for row in cursor.fetchall())
+    return totals
+
+
+def organizer_totals(conn, organizer_ids: Optional[Sequence[int]] = None) -> Dict[int, Totals]:
+    """Сводки организаторов по строкам event_stats; None — всех."""
+    cursor = conn.cursor()
+    if organizer_ids is None:
+        cursor.execute(_ORGANIZER_TOTALS + " GROUP BY organizer_id")
+        return {row[0]: _totals(row[1:]) for row in cursor.fetchall()}
+    totals: Dict[int, Totals] = {}
+    for chunk in _chunks(sorted(organizer_ids)):
+        cursor.execute(_ORGANIZER_TOTALS + f" WHERE organizer_id IN ({_marks(chunk)}) GROUP BY organizer_id", *chunk)
+        totals.update((row[0], _totals(row[1:])) for row in cursor.fetchall())
+    return totals
+
+
+def _stored(cursor, table: str, key: str, columns: Sequence[str]) -> Dict[int, Totals]:
+    cursor.execute(f"SELECT {key}, {', '.join(columns)} FROM {table}")
+    return {row[0]: _totals(row[1:]) for row in cursor.fetchall()}
+
+
+def _replace(cursor, table: str, key: str, columns: Sequence[str], ids: Sequence[int], totals: Dict[int, Totals]):
+    """Строки ids заменяются значениями из totals; id без значения — удаляется."""
+    for chunk in _chunks(ids):
+        cursor.execute(f"DELETE FROM {table} WHERE {key} IN ({_marks(chunk)})", *chunk)
+    rows = [(item_id, *totals[item_id]) for item_id in ids if item_id in totals]
+    if rows:
+        get_backend().executemany(
+            cursor, f"INSERT INTO {table} ({key}, {', '.join(columns)}) VALUES (?, {_marks(columns)})", rows)
+
+
+def refresh_stats(conn, event_ids: Sequence[int], ticket_ids: Sequence[int] = ()) -> int:
+    """Пересчитывает строки событий event_ids и событий билетов ticket_ids,
+    затем строки их организаторов, прежних и новых, одной транзакцией.
+    Возвращает число пересчитанных событий."""
+    cursor = conn.cursor()
+    get_backend().begin_write(cursor)
+    events = set(event_ids) | _distinct(conn, "event_id", "tickets", ticket_ids)
+    ordered = sorted(events)
+    # Организатор события мог смениться: прежний тоже пересчитывается
+    organizers: Set[int] = set()
+    for chunk in _chunks(ordered):
+        cursor.execute(f"SELECT organizer_id FROM event_stats WHERE event_id IN ({_marks(chunk)})", *chunk)
+        organizers.update(row[0] for row in cursor.fetchall())
+    totals = event_totals(conn, ordered)
+    organizers.update(values[0] for values in totals.values())
+    _replace(cursor, "event_stats", "event_id", EVENT_COLUMNS, ordered, totals)
+    affected = sorted(organizers)
+    _replace(cursor, "organizer_stats", "organizer_id", ORGANIZER_COLUMNS, affected, organizer_totals(conn, affected))
+    conn.commit()
+    return len(ordered)
+
+
+def _drift(item_id: int, columns: Sequence[str], stored: Optional[Totals], actual: Optional[Totals]) -> Dict[str, Any]:
+    return {
+        "id": item_id,
+        "stored": dict(zip(columns, stored)) if stored else None,
+        "actual": dict(zip(columns, actual)) if actual else None,
+    }
+
+
+def rebuild_stats(conn, samples: int = 20) -> Dict[str, Any]:
+    """Сверка: пересчитывает все сводки с нуля и исправляет расходящиеся строки.
+
+    Отчёт — число проверенных и расходившихся строк и до samples примеров
+    (хранилось/на самом деле). Изменения последнего окна, ещё не
+    пересчитанные другим процессом, тоже попадают в расхождения.
+    """
+    started = time.perf_counter()
+    cursor = conn.cursor()
+    get_backend().begin_write(cursor)
+    stored = _stored(cursor, "event_stats", "event_id", EVENT_COLUMNS)
+    actual = event_totals(conn)
+    drifted = sorted(item_id for item_id in stored.keys() | actual.keys() if stored.get(item_id) != actual.get(item_id))
+    _replace(cursor, "event_stats", "event_id", EVENT_COLUMNS, drifted, actual)
+    # Организаторы сверяются с уже исправленными строками событий
+    stored_organizers = _stored(cursor, "organizer_stats", "organizer_id", ORGANIZER_COLUMNS)
+    actual_organizers = organizer_totals(conn)
+    organizers_drifted = sorted(
+        item_id for item_id in stored_organizers.keys() | actual_organizers.keys()
+        if stored_organizers.get(item_id) != actual_organizers.get(item_id))
+    _replace(cursor, "organizer_stats", "organizer_id", ORGANIZER_COLUMNS, organizers_drifted, actual_organizers)
+    conn.commit()
+    return {
+        "events": len(actual),
+        "events_drifted": len(drifted),
+        "organizers": len(actual_organizers),
+        "organizers_drifted": len(organizers_drifted),
+        "samples": {
+            "events": [
+                _drift(item_id, EVENT_COLUMNS, stored.get(item_id), actual.get(item_id))
+                for item_id in drifted[:samples]],
+            "organizers": [
+                _drift(item_id, ORGANIZER_COLUMNS, stored_organizers.get(item_id), actual_organizers.get(item_id))
+                for item_id in organizers_drifted[:samples]],
+        },
+        "seconds": round(time.perf_counter() - started, 3),
+        "finished_at": time.time(),
+    }
+
+
+def event_stats(conn, event_id: int) -> Optional[Dict[str, Any]]:
+    """Сводка события; None — события нет. Если строки ещё нет (событие
+    записано другим процессом до пересчёта), она считается на месте без
+    записи: чтение может идти из реплики."""
+    cursor = conn.cursor()
+    cursor.execute(f"SELECT {', '.join(EVENT_COLUMNS)} FROM event_stats WHERE event_id=?", event_id)
+    row = cursor.fetchone()
+    values = _totals(row) if row else event_totals(conn, [event_id]).get(event_id)
+    if values is None:
+        return None
+    return {"event_id": event_id, **dict(zip(EVENT_COLUMNS, values))}
+
+
+def organizer_stats(conn, organizer_id: int) -> Optional[Dict[str, Any]]:
+    """Сводка организатора; None — организатора нет. Без строки (нет событий
+    или они ещё не пересчитаны) считается на месте по его событиям."""
+    cursor = conn.cursor()
+    cursor.execute(f"SELECT {', '.join(ORGANIZER_COLUMNS)} FROM organizer_stats WHERE organizer_id=?", organizer_id)
+    row = cursor.fetchone()
+    if row:
+        return {"organizer_id": organizer_id, **dict(zip(ORGANIZER_COLUMNS, _totals(row)))}
+    cursor.execute("SELECT id FROM organizers WHERE id=?", organizer_id)
+    if not cursor.fetchone():
+        return None
+    cursor.execute("SELECT id FROM events WHERE organizer_id=?", organizer_id)
+    totals = event_totals(conn, [row[0] for row in cursor.fetchall()]).values()
+    return {
+        "organizer_id": organizer_id,
+        "events": len(totals),
+        "ticket_types": sum(values[1] for values in totals),
+        "tickets_remaining": sum(values[2] for values in totals),
+        "tickets_sold": sum(values[3] for values in totals),
+        "revenue": round(sum(values[4] for values in totals), 2),
+    }
+
+
+async def events_of_tickets(ticket_ids: Sequence[int]) -> Set[int]:
+    """События билетов — до переноса или удаления билетов."""
+    return await run_db("tickets", _distinct, "event_id", "tickets", ticket_ids)
+
+
+async def tickets_of_attendees(attendee_ids: Sequence[int]) -> Set[int]:
+    """Билеты участников — до их переноса или удаления."""
+    return await run_db("attendees", _distinct, "ticket_id", "attendees", attendee_ids)
+
+
+class SalesStats:
+    """Сводки продаж по событиям и организаторам: таблицы event_stats и
+    organizer_stats для GET /events/{id}/stats и /organizers/{id}/stats.
+
+    Обработчики записи сообщают затронутые события или билеты и отвечают,
+    не дожидаясь пересчёта. Изменения копятся window секунд, затем строки
+    затронутых событий пересчитываются одним запросом по билетам и
+    участникам этих событий, строки их организаторов — из строк событий,
+    всё одной транзакцией. Сотня покупок за окно по одному событию — один
+    пересчёт; чтение сводки — одна строка по ключу.
+
+    Строка пересчитывается целиком, а не сдвигается на разницу: ошибки не
+    копятся, пропущенное изменение исправит следующий пересчёт события или
+    сверка (rebuild_stats). Прежнее событие билета и прежний билет участника
+    обработчик узнаёт до записи (events_of_tickets, tickets_of_attendees);
+    массовое PUT этого не делает — прежнее событие догонит сверка.
+    """
+
+    def __init__(self, window: float):
+        self.window = window
+        self._events: Set[int] = set()
+        self._tickets: Set[int] = set()
+        # Когда появилось самое старое непересчитанное изменение
+        self._since = 0.0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._flushing: Optional[asyncio.Task] = None
+        self.flushes = 0
+        self.flush_failed = 0
+        self.refreshed = 0
+        self.reconciles = 0
+        self.last_reconcile: Optional[Dict[str, Any]] = None
+
+    def _bind(self) -> asyncio.AbstractEventLoop:
+        loop = asyncio.get_running_loop()
+        # Таймер и задача привязаны к циклу событий, накопленные изменения — нет
+        if self._loop is not loop:
+            self._timer = None
+            self._flushing = None
+            self._loop = loop
+        return loop
+
+    @property
+    def pending(self) -> int:
+        return len(self._events) + len(self._tickets)
+
+    # --- Изменения ---
+
+    def events_changed(self, event_ids: Iterable[int]) -> None:
+        self._mark(event_ids, ())
+
+    def tickets_changed(self, ticket_ids: Iterable[int]) -> None:
+        self._mark((), ticket_ids)
+
+    def events_written(self, events: List[Tuple[int, Dict[str, Any]]]) -> None:
+        self.events_changed(event_id for event_id, _ in events)
+
+    def tickets_written(self, tickets: List[Tuple[int, Dict[str, Any]]]) -> None:
+        self.events_changed({data["event_id"] for _, data in tickets})
+
+    def attendees_written(self, attendees: List[Tuple[int, Dict[str, Any]]]) -> None:
+        self.tickets_changed({data["ticket_id"] for _, data in attendees})
+
+    def _mark(self, event_ids: Iterable[int], ticket_ids: Iterable[int]) -> None:
+        if not self.pending:
+            self._since = time.monotonic()
+        self._events.update(event_ids)
+        self._tickets.update(ticket_ids)
+        try:
+            self._bind()
+        except RuntimeError:
+            return
+        self._schedule()
+
+    def _schedule(self) -> None:
+        if self.pending and self._timer is None and self._flushing is None:
+            self._timer = self._loop.call_later(self.window, self._start)
+
+    def _start(self) -> None:
+        self._timer = None
+        if self.pending and self._flushing is None:
+            self._flushing = self._loop.create_task(self._run())
+
+    async def _run(self) -> None:
+        # Задача могла начаться из GET-запроса: пересчёт пишет в primary
+        read_from_primary()
+        events, tickets = self._events, self._tickets
+        self._events, self._tickets = set(), set()
+        try:
+            self.refreshed += await run_db(
+                "events", refresh_stats, sorted(events), sorted(tickets), priority=BACKGROUND)
+        except Exception:
+            # Изменения не теряем: повторим со следующим пересчётом
+            self.flush_failed += 1
+            logger.warning("sales stats refresh failed", exc_info=True)
+            self._restore(events, tickets)
+        except BaseException:
+            self._restore(events, tickets)
+            raise
+        else:
+            self.flushes += 1
+        finally:
+            self._flushing = None
+        self._schedule()
+
+    def _restore(self, events: Set[int], tickets: Set[int]) -> None:
+        if not self.pending:
+            self._since = time.monotonic()
+        self._events |= events
+        self._tickets |= tickets
+
+    async def flush(self) -> None:
+        """Пересчитывает накопленное сейчас, не дожидаясь окна."""
+        self._bind()
+        while True:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if self._flushing is not None:
+                await asyncio.shield(self._flushing)
+                continue
+            if not self.pending:
+                return
+            self._flushing = self._loop.create_task(self._run())
+            await asyncio.shield(self._flushing)
+            return
+
+    async def settle(self) -> None:
+        """Перед чтением сводки: изменения старше окна (таймер не сработал или
+        пропал вместе с циклом событий) пересчитываются сразу."""
+        if self.pending and time.monotonic() - self._since >= self.window:
+            await self.flush()
+
+    # --- Сверка ---
+
+    async def reconcile(self) -> Dict[str, Any]:
+        """Сверка с нуля (rebuild_stats); свои изменения сначала пересчитываются,
+        чтобы не попасть в расхождения."""
+        await self.flush()
+        report = await run_db("events", rebuild_stats, priority=BACKGROUND)
+        self.reconciles += 1
+        self.last_reconcile = report
+        if report["events_drifted"] or report["organizers_drifted"]:
+            logger.warning(
+                "sales stats drift: %d event rows and %d organizer rows rebuilt",
+                report["events_drifted"], report["organizers_drifted"])
+        return report
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pending_events": len(self._events),
+            "pending_tickets": len(self._tickets),
+            "flushes": self.flushes,
+            "flush_failed": self.flush_failed,
+            "refreshed": self.refreshed,
+            "reconciles": self.reconciles,
+            "last_reconcile": self.last_reconcile,
+        }
+
+
+async def reconcile_periodically(interval: float) -> None:
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await sales_stats.reconcile()
+        except Exception:
+            logger.warning("sales stats reconciliation failed", exc_info=True)
+
+
+sales_stats = SalesStats(settings.sales_stats_window)
@@ -0,0 +1,244 @@
+import heapq
+import logging
+import math
+import re
+import sys
+import threading
+import time
+from bisect import bisect_left, insort
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import repository
+
+
+logger = logging.getLogger(__name__)
+
+_TOKEN = re.compile(r"\w+")
+
+# BM25
+K1 = 1.2
+B = 0.75
+# Слово в title весит как TITLE_WEIGHT слов в description
+TITLE_WEIGHT = 3
+# Сколько слов с общим префиксом подставляется вместо последнего слова запроса
+MAX_PREFIX_EXPANSIONS = 50
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    return _TOKEN.findall(text.casefold()) if text else []
+
+
+class SearchIndex:
+    """Инвертированный индекс событий по title и description.
+
+    term -> {event_id: взвешенная частота}. Отсортированный список слов
+    нужен для поиска по префиксу. Все методы под одной блокировкой: индекс
+    меняется из цикла событий, а строится в потоке БД.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._reset()
+        self.ready = False
+        self.building = False
+        self.rebuild_seconds: Optional[float] = None
+        self.rebuilt_at: Optional[float] = None
+        self.updates = 0
+        # Изменения, пришедшие во время перестроения: применяются поверх
+        # прочитанного из БД, иначе построение затрёт их старыми строками
+        self._during_build: Dict[int, Optional[Tuple[Optional[str], Optional[str]]]] = {}
+
+    def _reset(self) -> None:
+        self.postings: Dict[str, Dict[int, int]] = {}
+        self.lengths: Dict[int, int] = {}
+        self.doc_terms: Dict[int, Tuple[str, ...]] = {}
+        self.terms: List[str] = []
+        self.total_length = 0
+
+    # --- Изменения ---
+
+    def _add(self, doc_id: int, title: Optional[str], description: Optional[str]) -> None:
+        self._remove(doc_id)
+        counts = Counter(tokenize(description))
+        for token in tokenize(title):
+            counts[token] += TITLE_WEIGHT
+        if not counts:
+            return
+        for term, count in counts.items():
+            docs = self.postings.get(term)
+            if docs is None:
+                docs = self.postings[term] = {}
+                insort(self.terms, term)
+            docs[doc_id] = count
+        length = sum(counts.values())
+        self.lengths[doc_id] = length
+        self.total_length += length
+        self.doc_terms[doc_id] = tuple(counts)
+
+    def _remove(self, doc_id: int) -> None:
+        terms = self.doc_terms.pop(doc_id, None)
+        if terms is None:
+            return
+        self.total_length -= self.lengths.pop(doc_id)
+        for term in terms:
+            docs = self.postings[term]
+            del docs[doc_id]
+            if not docs:
+                del self.postings[term]
+                del self.terms[bisect_left(self.terms, term)]
+
+    def upsert(self, doc_id: int, event: Dict[str, Any]) -> None:
+        with self._lock:
+            self.updates += 1
+            if self.building:
+                self._during_build[doc_id] = (event.get("title"), event.get("description"))
+            self._add(doc_id, event.get("title"), event.get("description"))
+
+    def upsert_many(self, events: List[Tuple[int, Dict[str, Any]]]) -> None:
+        for doc_id, event in events:
+            self.upsert(doc_id, event)
+
+    def remove(self, doc_id: int) -> None:
+        with self._lock:
+            self.updates += 1
+            if self.building:
+                self._during_build[doc_id] = None
+            self._remove(doc_id)
+
+    def remove_many(self, doc_ids: Iterable[int]) -> None:
+        for doc_id in doc_ids:
+            self.remove(doc_id)
+
+    def rebuild(self, rows: Iterable[Sequence[Any]]) -> None:
+        """Строит индекс заново из строк (id, title, description)."""
+        started = time.perf_counter()
+        fresh = SearchIndex()
+        with self._lock:
+            self.building = True
+            self._during_build = {}
+        try:
+            for doc_id, title, description in rows:
+                fresh._add(doc_id, title, description)
+            with self._lock:
+                for doc_id, change in self._during_build.items():
+                    if change is None:
+                        fresh._remove(doc_id)
+                    else:
+                        fresh._add(doc_id, *change)
+                self.postings, self.lengths, self.doc_terms = fresh.postings, fresh.lengths, fresh.doc_terms
+                self.terms, self.total_length = fresh.terms, fresh.total_length
+                self.ready = True
+        finally:
+            with self._lock:
+                self.building = False
+                self._during_build = {}
+        self.rebuild_seconds = time.perf_counter() - started
+        self.rebuilt_at = time.time()
+        logger.info("search index rebuilt: %d events in %.2f s", len(self.lengths), self.rebuild_seconds)
+
+    # --- Поиск ---
+
+    def _expand(self, token: str) -> List[str]:
+        start = bisect_left(self.terms, token)
+        expanded = []
+        for term in self.terms[start:start + MAX_PREFIX_EXPANSIONS]:
+            if not term.startswith(token):
+                break
+            expanded.append(term)
+        return expanded
+
+    def _scores(self, query: str) -> Dict[int, float]:
+        tokens = list(dict.fromkeys(tokenize(query)))
+        if not tokens or not self.lengths:
+            return {}
+        # Пока запрос набирается, последнее слово считается префиксом
+        prefix = tokens.pop() if not query[-1:].isspace() else None
+        groups = [[token] for token in tokens]
+        if prefix is not None:
+            groups.append(self._expand(prefix))
+        if any(not any(term in self.postings for term in group) for group in groups):
+            return {}
+
+        documents = len(self.lengths)
+        average = self.total_length / documents
+        scores: Optional[Dict[int, float]] = None
+        # Все слова запроса обязательны: начинаем с самого редкого
+        groups.sort(key=lambda group: sum(len(self.postings.get(term, ())) for term in group))
+        for group in groups:
+            group_scores: Dict[int, float] = {}
+            for term in group:
+                docs = self.postings.get(term)
+                if not docs:
+                    continue
+                idf = math.log(1 + (documents - len(docs) + 0.5) / (len(docs) + 0.5))
+                candidates = docs if scores is None else (doc for doc in scores if doc in docs)
+                for doc_id in candidates:
+                    frequency = docs[doc_id]
+                    norm = K1 * (1 - B + B * self.lengths[doc_id] / average)
+                    group_scores[doc_id] = group_scores.get(doc_id, 0.0) + idf * frequency * (K1 + 1) / (frequency + norm)
+            if scores is None:
+                scores = group_scores
+            else:
+                scores = {doc_id: scores[doc_id] + value for doc_id, value in group_scores.items()}
+            if not scores:
+                return {}
+        return scores or {}
+
+    def search(
+        self, query: str, limit: int, after: Optional[Tuple[float, int]] = None,
+    ) -> Tuple[List[Tuple[int, float]], Optional[Tuple[float, int]]]:
+        """(id, score) по убыванию score, затем по id; after — ключ последнего
+        результата предыдущей страницы. Возвращает и ключ для следующей."""
+        with self._lock:
+            scores = self._scores(query)
+        ranked = ((-score, doc_id) for doc_id, score in scores.items())
+        if after is not None:
+            last = (-after[0], after[1])
+            ranked = (key for key in ranked if key > last)
+        top = heapq.nsmallest(limit + 1, ranked)
+        hits = [(doc_id, -negative) for negative, doc_id in top[:limit]]
+        if len(top) <= limit:
+            return hits, None
+        doc_id, score = hits[-1]
+        return hits, (score, doc_id)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            postings = sum(len(docs) for docs in self.postings.values())
+            return {
+                "ready": self.ready,
+                "building": self.building,
+                "documents": len(self.lengths),
+                "terms": len(self.postings),
+                "postings": postings,
+                "memory_bytes": self._memory(postings),
+                "rebuild_seconds": round(self.rebuild_seconds, 3) if self.rebuild_seconds is not None else None,
+                "rebuilt_at": self.rebuilt_at,
+                "updates": self.updates,
+            }
+
+    def _memory(self, postings: int) -> int:
+        """Оценка объёма индекса в байтах: контейнеры и строки слов точно,
+        элементы словарей — по размеру int (частоты до 256 интернированы)."""
+        size = sys.getsizeof(self.postings) + sys.getsizeof(self.terms) + sys.getsizeof(self.lengths)
+        size += sys.getsizeof(self.doc_terms)
+        for term, docs in self.postings.items():
+            size += sys.getsizeof(term) + sys.getsizeof(docs)
+        for terms in self.doc_terms.values():
+            size += sys.getsizeof(terms)
+        # id событий в postings, lengths и doc_terms
+        size += (postings + 2 * len(self.lengths)) * sys.getsizeof(2 ** 20)
+        return size
+
+
+def load_events(conn, chunk_size: int = 10000) -> Iterable[Tuple[int, Optional[str], Optional[str]]]:
+    for rows in repository.events.stream(conn, chunk_size, ("id", "title", "description")):
+        yield from rows
+
+
+def rebuild_from_db(conn, index: "SearchIndex") -> None:
+    index.rebuild(load_events(conn))
+
+
+event_index = SearchIndex()
@@ -0,0 +1,135 @@
+import hashlib
+import json
+import time
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple, Type, Union, get_args, get_origin
+
+from fastapi import Response
+from pydantic import BaseModel
+
+from etag import compute_etag, is_not_modified, not_modified
+from jsontypes import json_default
+from metrics import observe
+
+try:
+    import orjson
+except ImportError:
+    # Необязательная зависимость: без неё быстрый режим всё равно пропускает
+    # Pydantic, но кодирует стандартным json
+    orjson = None
+
+
+if orjson is not None:
+    def dumps(payload: Any) -> bytes:
+        return orjson.dumps(payload, default=json_default)
+
+    # orjson читает и memoryview: без копии байтов
+    loads = orjson.loads
+else:
+    _encode = json.JSONEncoder(default=json_default, ensure_ascii=False, separators=(",", ":")).encode
+
+    def dumps(payload: Any) -> bytes:
+        return _encode(payload).encode()
+
+    def loads(data: Union[bytes, memoryview]) -> Any:
+        return json.loads(bytes(data))
+
+
+def _is_float(annotation: Any) -> bool:
+    if annotation is float:
+        return True
+    return get_origin(annotation) is Union and float in get_args(annotation)
+
+
+@lru_cache(maxsize=None)
+def float_columns(model: Type[BaseModel]) -> Tuple[str, ...]:
+    """Поля модели типа float: Pydantic отдаёт 10 как 10.0, без модели это
+    приходится делать самим, иначе схема ответа поплывёт."""
+    return tuple(name for name, field in model.model_fields.items() if _is_float(field.annotation))
+
+
+def _related_model(annotation: Any) -> Optional[Type[BaseModel]]:
+    """Модель связи в аннотации: X, Optional[X], List[X], Optional[List[X]]."""
+    origin = get_origin(annotation)
+    if origin is Union or origin is list:
+        for arg in get_args(annotation):
+            model = _related_model(arg)
+            if model is not None:
+                return model
+        return None
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return annotation
+    return None
+
+
+@lru_cache(maxsize=None)
+def related_models(model: Type[BaseModel]) -> Tuple[Tuple[str, Type[BaseModel]], ...]:
+    """Поля-связи модели (?include=) и их модели: у них свои float-поля."""
+    related = []
+    for name, field in model.model_fields.items():
+        nested = _related_model(field.annotation)
+        if nested is not None:
+            related.append((name, nested))
+    return tuple(related)
+
+
+def _coerce_floats(rows: List[Dict[str, Any]], model: Type[BaseModel]) -> None:
+    for column in float_columns(model):
+        for row in rows:
+            value = row.get(column)
+            if value is not None and type(value) is not float:
+                row[column] = float(value)
+    for name, nested in related_models(model):
+        children: List[Dict[str, Any]] = []
+        for row in rows:
+            value = row.get(name)
+            if isinstance(value, dict):
+                children.append(value)
+            elif isinstance(value, list):
+                children.extend(value)
+        if children:
+            _coerce_floats(children, nested)
+
+
+def page_body(rows: List[Dict[str, Any]], next_cursor: Optional[str], model: Type[BaseModel]) -> bytes:
+    """JSON страницы списка прямо из строк БД, без моделей на каждую строку.
+
+    Строки приходят из Repository и содержат поля *Read-модели (все или
+    выбранные ?fields=), так что повторная проверка Pydantic ничего не добавляет.
+    """
+    _coerce_floats(rows, model)
+    return dumps({"items": rows, "next_cursor": next_cursor})
+
+
+def fast_page_response(
+    rows: List[Dict[str, Any]], next_cursor: Optional[str], model: Type[BaseModel], if_none_match: Optional[str],
+) -> Response:
+    """Готовый ответ: FastAPI не проверяет Response по response_model.
+
+    ETag считается по телу ответа — оно уже построено, второй раз
+    сериализовать ради хэша незачем. Для списков If-Match не используется,
+    поэтому совпадать с compute_etag ему не нужно.
+    """
+    started = time.perf_counter()
+    body = page_body(rows, next_cursor, model)
+    observe("json", time.perf_counter() - started)
+    etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+    if is_not_modified(if_none_match, etag):
+        return not_modified(etag)
+    return Response(body, media_type="application/json", headers={"ETag": etag})
+
+
+def sparse_response(row: Dict[str, Any], model: Type[BaseModel], if_none_match: Optional[str]) -> Response:
+    """Одна строка с частью полей (?fields=): *Read-модель требует все поля,
+    поэтому строка сериализуется напрямую."""
+    _coerce_floats([row], model)
+    etag = compute_etag(row)
+    if is_not_modified(if_none_match, etag):
+        return not_modified(etag)
+    return Response(dumps(row), media_type="application/json", headers={"ETag": etag})
+
+
+def batch_response(rows: List[Dict[str, Any]], missing: List[int], model: Type[BaseModel]) -> Response:
+    """Мульти-get с частью полей (?ids=&fields=), как sparse_response."""
+    _coerce_floats(rows, model)
+    return Response(dumps({"items": rows, "missing": missing}), media_type="application/json")
@@ -0,0 +1,20 @@
+-- Индексы под фильтры и keyset-пагинацию списочных эндпоинтов.
+-- Каждый индекс заканчивается на id: WHERE фильтр + ORDER BY колонка, id
+-- читаются одним поиском по индексу без сортировки.
+
+CREATE INDEX IX_events_organizer_id ON events (organizer_id, id);
+CREATE INDEX IX_events_venue_id ON events (venue_id, id);
+CREATE INDEX IX_events_title ON events (title, id);
+CREATE INDEX IX_events_start_date ON events (start_date, id);
+CREATE INDEX IX_events_end_date ON events (end_date, id);
+
+CREATE INDEX IX_tickets_event_id ON tickets (event_id, id);
+CREATE INDEX IX_tickets_price ON tickets (price, id);
+CREATE INDEX IX_tickets_ticket_type ON tickets (ticket_type, id);
+
+CREATE INDEX IX_attendees_ticket_id ON attendees (ticket_id, id);
+CREATE INDEX IX_attendees_email ON attendees (email, id);
+CREATE INDEX IX_attendees_name ON attendees (name, id);
+
+CREATE INDEX IX_organizers_name ON organizers (name, id);
+CREATE INDEX IX_venues_name ON venues (name, id);
@@ -0,0 +1,17 @@
+-- Временные брони билетов (POST /tickets/{id}/holds).
+-- Количество списывается с tickets.quantity в момент брони; просроченные
+-- брони возвращаются в продажу фоновой задачей по индексу на expires_at.
+
+CREATE TABLE ticket_holds (
+    id INT IDENTITY(1,1) PRIMARY KEY,
+    ticket_id INT NOT NULL,
+    quantity INT NOT NULL,
+    expires_at DATETIME2 NOT NULL,
+    CONSTRAINT FK_ticket_holds_tickets FOREIGN KEY (ticket_id) REFERENCES tickets (id) ON DELETE CASCADE,
+    CONSTRAINT CK_ticket_holds_quantity CHECK (quantity > 0)
+);
+
+CREATE INDEX IX_ticket_holds_expires_at ON ticket_holds (expires_at);
+
+-- Последний рубеж против перепродажи, если кто-то обойдёт условный UPDATE
+ALTER TABLE tickets ADD CONSTRAINT CK_tickets_quantity_non_negative CHECK (quantity >= 0);
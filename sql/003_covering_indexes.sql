@@ -0,0 +1,10 @@
+-- Узкие покрывающие индексы под ?fields= на самых частых списках:
+-- id + title событий и id + email участников читаются из индекса, без
+-- обращения к кластерному индексу и колонке description.
+
+CREATE INDEX IX_events_id_title ON events (id) INCLUDE (title);
+CREATE INDEX IX_events_organizer_id ON events (organizer_id, id) INCLUDE (title) WITH (DROP_EXISTING = ON);
+CREATE INDEX IX_events_venue_id ON events (venue_id, id) INCLUDE (title) WITH (DROP_EXISTING = ON);
+
+CREATE INDEX IX_attendees_id_email ON attendees (id) INCLUDE (email);
+CREATE INDEX IX_attendees_ticket_id ON attendees (ticket_id, id) INCLUDE (email) WITH (DROP_EXISTING = ON);
@@ -0,0 +1,22 @@
+-- Даты событий как DATETIME2 (UTC, без зоны) вместо строк: диапазонные
+-- запросы GET /events/?from=&to= сравнивают даты, а не текст, и читают
+-- индекс. Значения, которые не разбираются как дата, становятся NULL —
+-- проверьте их до миграции:
+--   SELECT id, start_date, end_date FROM events
+--   WHERE (start_date IS NOT NULL AND TRY_CONVERT(DATETIME2, start_date) IS NULL)
+--      OR (end_date IS NOT NULL AND TRY_CONVERT(DATETIME2, end_date) IS NULL);
+
+DROP INDEX IX_events_start_date ON events;
+DROP INDEX IX_events_end_date ON events;
+
+UPDATE events SET start_date = TRY_CONVERT(DATETIME2, start_date), end_date = TRY_CONVERT(DATETIME2, end_date);
+ALTER TABLE events ALTER COLUMN start_date DATETIME2 NULL;
+ALTER TABLE events ALTER COLUMN end_date DATETIME2 NULL;
+
+CREATE INDEX IX_events_start_date ON events (start_date, id);
+CREATE INDEX IX_events_end_date ON events (end_date, id);
+-- ?venue_id=&from=&to=: поиск по площадке и диапазону в одном индексе
+CREATE INDEX IX_events_venue_id_start_date ON events (venue_id, start_date, id) INCLUDE (end_date);
+
+ALTER TABLE events ADD CONSTRAINT CK_events_dates
+    CHECK (start_date IS NULL OR end_date IS NULL OR end_date >= start_date);
@@ -0,0 +1,11 @@
+-- Проход участников на входе (POST /events/{id}/checkin). Пишется пачками
+-- в фоне; UNIQUE по участнику — последний рубеж против двойного прохода,
+-- если событие проверяют несколько процессов.
+
+CREATE TABLE checkins (
+    id INT IDENTITY(1,1) PRIMARY KEY,
+    attendee_id INT NOT NULL,
+    checked_in_at DATETIME2 NOT NULL,
+    CONSTRAINT FK_checkins_attendees FOREIGN KEY (attendee_id) REFERENCES attendees (id) ON DELETE CASCADE,
+    CONSTRAINT UQ_checkins_attendee_id UNIQUE (attendee_id)
+);
@@ -0,0 +1,44 @@
+-- Сводки продаж для GET /events/{id}/stats и GET /organizers/{id}/stats.
+-- Строки пересчитывает сервис после записей билетов и участников
+-- (sales.py); sales.reconcile пересобирает их с нуля и сообщает о
+-- расхождениях. Индексированное представление здесь не подходит: в нём
+-- нельзя LEFT JOIN и COUNT по подзапросу, а событие без билетов тоже
+-- должно иметь строку. Внешних ключей нет: строка удалённого события
+-- убирается при следующем пересчёте.
+
+CREATE TABLE event_stats (
+    event_id INT NOT NULL PRIMARY KEY,
+    organizer_id INT NOT NULL,
+    ticket_types INT NOT NULL,
+    tickets_remaining INT NOT NULL,
+    tickets_sold INT NOT NULL,
+    revenue DECIMAL(18, 2) NOT NULL
+);
+
+CREATE INDEX IX_event_stats_organizer_id ON event_stats (organizer_id);
+
+CREATE TABLE organizer_stats (
+    organizer_id INT NOT NULL PRIMARY KEY,
+    events INT NOT NULL,
+    ticket_types INT NOT NULL,
+    tickets_remaining INT NOT NULL,
+    tickets_sold INT NOT NULL,
+    revenue DECIMAL(18, 2) NOT NULL
+);
+
+-- Начальное заполнение тем же запросом, что и пересчёт в сервисе
+INSERT INTO event_stats (event_id, organizer_id, ticket_types, tickets_remaining, tickets_sold, revenue)
+SELECT e.id, e.organizer_id, COUNT(t.id), COALESCE(SUM(t.quantity), 0),
+       COALESCE(SUM(t.sold), 0), COALESCE(SUM(t.sold * t.price), 0)
+FROM events e
+LEFT JOIN (
+    SELECT tickets.id, tickets.event_id, tickets.quantity, tickets.price,
+           (SELECT COUNT(*) FROM attendees a WHERE a.ticket_id = tickets.id) AS sold
+    FROM tickets
+) t ON t.event_id = e.id
+GROUP BY e.id, e.organizer_id;
+
+INSERT INTO organizer_stats (organizer_id, events, ticket_types, tickets_remaining, tickets_sold, revenue)
+SELECT organizer_id, COUNT(*), SUM(ticket_types), SUM(tickets_remaining), SUM(tickets_sold), SUM(revenue)
+FROM event_stats
+GROUP BY organizer_id;
@@ -0,0 +1,98 @@
+-- Схема EventsPlatform для SQLite (DB_BACKEND=sqlite).
+-- Повторяет таблицы, ключи и ограничения EventsPlatform.bak; IDENTITY
+-- заменён на INTEGER PRIMARY KEY, NVARCHAR — на TEXT, DECIMAL — на NUMERIC.
+-- Индексы — из 001_list_indexes.sql и 004_event_dates.sql, брони — из
+-- 002_ticket_holds.sql, проходы — из 005_checkins.sql, сводки продаж —
+-- из 006_sales_stats.sql. Даты хранятся текстом ISO 8601
+-- (backends._adapt_datetime).
+
+CREATE TABLE IF NOT EXISTS organizers (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    contact_info TEXT
+);
+
+CREATE TABLE IF NOT EXISTS venues (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    address TEXT
+);
+
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY,
+    title TEXT NOT NULL,
+    description TEXT,
+    organizer_id INTEGER NOT NULL CONSTRAINT FK_events_organizers REFERENCES organizers (id),
+    venue_id INTEGER NOT NULL CONSTRAINT FK_events_venues REFERENCES venues (id),
+    start_date TEXT,
+    end_date TEXT
+);
+
+CREATE TABLE IF NOT EXISTS tickets (
+    id INTEGER PRIMARY KEY,
+    event_id INTEGER NOT NULL CONSTRAINT FK_tickets_events REFERENCES events (id),
+    price NUMERIC NOT NULL,
+    ticket_type TEXT NOT NULL,
+    quantity INTEGER NOT NULL DEFAULT 0 CONSTRAINT CK_tickets_quantity_non_negative CHECK (quantity >= 0)
+);
+
+CREATE TABLE IF NOT EXISTS attendees (
+    id INTEGER PRIMARY KEY,
+    ticket_id INTEGER NOT NULL CONSTRAINT FK_attendees_tickets REFERENCES tickets (id),
+    name TEXT NOT NULL,
+    email TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS ticket_holds (
+    id INTEGER PRIMARY KEY,
+    ticket_id INTEGER NOT NULL CONSTRAINT FK_ticket_holds_tickets REFERENCES tickets (id) ON DELETE CASCADE,
+    quantity INTEGER NOT NULL CONSTRAINT CK_ticket_holds_quantity CHECK (quantity > 0),
+    expires_at TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS checkins (
+    id INTEGER PRIMARY KEY,
+    attendee_id INTEGER NOT NULL CONSTRAINT FK_checkins_attendees REFERENCES attendees (id) ON DELETE CASCADE
+        CONSTRAINT UQ_checkins_attendee_id UNIQUE,
+    checked_in_at TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS event_stats (
+    event_id INTEGER NOT NULL PRIMARY KEY,
+    organizer_id INTEGER NOT NULL,
+    ticket_types INTEGER NOT NULL,
+    tickets_remaining INTEGER NOT NULL,
+    tickets_sold INTEGER NOT NULL,
+    revenue NUMERIC NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS organizer_stats (
+    organizer_id INTEGER NOT NULL PRIMARY KEY,
+    events INTEGER NOT NULL,
+    ticket_types INTEGER NOT NULL,
+    tickets_remaining INTEGER NOT NULL,
+    tickets_sold INTEGER NOT NULL,
+    revenue NUMERIC NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS IX_events_organizer_id ON events (organizer_id, id);
+CREATE INDEX IF NOT EXISTS IX_events_venue_id ON events (venue_id, id);
+CREATE INDEX IF NOT EXISTS IX_events_title ON events (title, id);
+CREATE INDEX IF NOT EXISTS IX_events_start_date ON events (start_date, id);
+CREATE INDEX IF NOT EXISTS IX_events_end_date ON events (end_date, id);
+CREATE INDEX IF NOT EXISTS IX_events_venue_id_start_date ON events (venue_id, start_date, id);
+
+CREATE INDEX IF NOT EXISTS IX_tickets_event_id ON tickets (event_id, id);
+CREATE INDEX IF NOT EXISTS IX_tickets_price ON tickets (price, id);
+CREATE INDEX IF NOT EXISTS IX_tickets_ticket_type ON tickets (ticket_type, id);
+
+CREATE INDEX IF NOT EXISTS IX_attendees_ticket_id ON attendees (ticket_id, id);
+CREATE INDEX IF NOT EXISTS IX_attendees_email ON attendees (email, id);
+CREATE INDEX IF NOT EXISTS IX_attendees_name ON attendees (name, id);
+
+CREATE INDEX IF NOT EXISTS IX_organizers_name ON organizers (name, id);
+CREATE INDEX IF NOT EXISTS IX_venues_name ON venues (name, id);
+
+CREATE INDEX IF NOT EXISTS IX_ticket_holds_expires_at ON ticket_holds (expires_at);
+
+CREATE INDEX IF NOT EXISTS IX_event_stats_organizer_id ON event_stats (organizer_id);
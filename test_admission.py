@@ -0,0 +1,105 @@
+import asyncio
+import unittest
+from unittest.mock import AsyncMock, patch
+
+from admission import BACKGROUND, CRITICAL, READ, SCAN, AdmissionController, Overloaded, admission
+from test_backends import SQLiteTestCase
+
+
+def controller(limit=1, **overrides):
+    options = dict(
+        min_limit=1, max_limit=8, target_latency=0.1,
+        deadlines={"critical": 5.0, "read": 1.0, "scan": 0.5}, max_queue=100)
+    options.update(overrides)
+    return AdmissionController(limit, **options)
+
+
+class TestAdmissionController(unittest.TestCase):
+
+    def test_priority_order(self):
+        gate = controller()
+        order = []
+
+        async def request(priority):
+            async with gate.slot(priority):
+                order.append(priority.name)
+
+        async def scenario():
+            await gate.acquire(READ)
+            waiting = [asyncio.create_task(request(priority)) for priority in (BACKGROUND, SCAN, READ, CRITICAL)]
+            await asyncio.sleep(0)
+            self.assertEqual(gate.stats()["waiting"], {"critical": 1, "read": 1, "scan": 1, "background": 1})
+            gate.release()
+            await asyncio.gather(*waiting)
+
+        asyncio.run(scenario())
+
+        self.assertEqual(order, ["critical", "read", "scan", "background"])
+        self.assertEqual(gate.in_flight, 0)
+
+    def test_shed_on_deadline(self):
+        gate = controller(deadlines={"critical": 5.0, "read": 0.01, "scan": 0.5})
+
+        async def scenario():
+            await gate.acquire(READ)
+            with self.assertRaises(Overloaded) as timed_out:
+                await gate.acquire(READ)
+            # Операции по 10 с: дедлайн не выполнить, отказ без ожидания
+            gate.latency = 10.0
+            with self.assertRaises(Overloaded) as rejected:
+                await gate.acquire(SCAN)
+            return timed_out.exception, rejected.exception
+
+        timed_out, rejected = asyncio.run(scenario())
+
+        self.assertEqual(timed_out.retry_after, 1)
+        self.assertEqual(rejected.retry_after, 10)
+        stats = gate.stats()
+        self.assertEqual((stats["timed_out"]["read"], stats["rejected"]["scan"], stats["shed"]), (1, 1, 2))
+
+    def test_cancelled_waiter_gives_slot_on(self):
+        gate = controller()
+
+        async def scenario():
+            await gate.acquire(READ)
+            cancelled = asyncio.create_task(gate.acquire(READ))
+            admitted = asyncio.create_task(gate.acquire(SCAN))
+            await asyncio.sleep(0)
+            cancelled.cancel()
+            await asyncio.sleep(0)
+            gate.release()
+            await admitted
+
+        asyncio.run(scenario())
+
+        self.assertEqual(gate.in_flight, 1)
+        self.assertEqual(gate.waiting, 0)
+
+    def test_aimd(self):
+        gate = controller(limit=4)
+        gate.in_flight = 4
+        gate.release(0.01)
+        self.assertAlmostEqual(gate.limit, 4.25)
+
+        gate.in_flight = 4
+        gate.release(1.0)
+        gate.in_flight = 4
+        # Второе снижение подряд — не раньше чем через target_latency
+        gate.release(1.0)
+        self.assertAlmostEqual(gate.limit, 4.25 * 0.9)
+        self.assertEqual((gate.increases, gate.decreases), (1, 1))
+
+
+class TestOverloadedResponse(SQLiteTestCase):
+
+    def test_503_with_retry_after(self):
+        with patch.object(admission, "acquire", AsyncMock(side_effect=Overloaded(READ, 3))):
+            response = self.client.get("/organizers/1")
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.headers["Retry-After"], "3")
+        self.assertIn("shed", self.client.get("/stats/admission").json())
+
+
+if __name__ == "__main__":
+    unittest.main()
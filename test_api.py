@@ -1,9 +1,30 @@
 # test_api.py
+import os
+
 from fastapi.testclient import TestClient
 from app import app
+import backends
+import db
 
 client = TestClient(app)
 
+# Без явного DB_BACKEND тесты идут на SQLite в памяти, живой SQL Server не нужен
+_backend = None
+_previous = None
+
+def setup_module(module):
+    global _backend, _previous
+    if "DB_BACKEND" not in os.environ:
+        _backend = backends.SQLiteBackend(":memory:")
+        _previous = backends.set_backend(_backend)
+    db.init_pool(**backends.get_backend().pool_overrides())
+
+def teardown_module(module):
+    db.close_pool()
+    if _backend is not None:
+        _backend.close()
+        backends.set_backend(_previous)
+
 def test_create_organizer():
     response = client.post("/organizers/", json={"name": "API Test Org", "contact_info": "api@test.com"})
     assert response.status_code == 200
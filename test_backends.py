@@ -0,0 +1,243 @@
+import asyncio
+import json
+import os
+import tempfile
+import threading
+import unittest
+from unittest.mock import MagicMock
+
+from fastapi.testclient import TestClient
+
+import backends
+import db
+import purchase
+from app import app
+from backends import SQLiteBackend
+from cache import entity_cache
+from config import settings
+
+
+def mock_connection(mock_get_conn):
+    mock_conn = MagicMock()
+    mock_get_conn.return_value = mock_conn
+    mock_conn.__enter__.return_value = mock_conn
+    return mock_conn, mock_conn.cursor.return_value
+
+
+class SQLiteTestCase(unittest.TestCase):
+    """Всё приложение поверх SQLite: настоящий SQL, без MagicMock."""
+
+    path = ":memory:"
+
+    def setUp(self):
+        self.backend = SQLiteBackend(self.path)
+        self.previous = backends.set_backend(self.backend)
+        db.init_pool(**self.backend.pool_overrides())
+        entity_cache.clear()
+        purchase.purchase_queue = purchase.PurchaseQueue(settings.purchase_batch_max)
+        self.client = TestClient(app)
+
+    def tearDown(self):
+        db.close_pool()
+        self.backend.close()
+        backends.set_backend(self.previous)
+
+    def seed_event(self, quantity=10):
+        organizer = self.client.post("/organizers/", json={"name": "Org", "contact_info": "o@x"}).json()
+        venue = self.client.post("/venues/", json={"name": "Hall", "address": "Street"}).json()
+        event = self.client.post("/events/", json={
+            "title": "Concert", "organizer_id": organizer["id"], "venue_id": venue["id"],
+            "start_date": "2024-05-01", "end_date": "2024-05-02"}).json()
+        ticket = self.client.post("/tickets/", json={
+            "event_id": event["id"], "price": 10.5, "ticket_type": "Standard", "quantity": quantity}).json()
+        return organizer, venue, event, ticket
+
+
+class TestSQLiteMemory(SQLiteTestCase):
+
+    def test_crud_round_trip(self):
+        created = self.client.post("/organizers/", json={"name": "Org", "contact_info": None}).json()
+        self.assertEqual(self.client.get(f"/organizers/{created['id']}").json(), created)
+
+        updated = self.client.put(f"/organizers/{created['id']}", json={"name": "New", "contact_info": "c"})
+        self.assertEqual(updated.status_code, 200)
+        self.assertEqual(self.client.get(f"/organizers/{created['id']}").json()["name"], "New")
+
+        self.assertEqual(self.client.delete(f"/organizers/{created['id']}").status_code, 200)
+        self.assertEqual(self.client.get(f"/organizers/{created['id']}").status_code, 404)
+
+    def test_keyset_pagination_and_filters(self):
+        _, venue, event, _ = self.seed_event()
+        for index in range(4):
+            self.client.post("/tickets/", json={
+                "event_id": event["id"], "price": index, "ticket_type": f"T{index}", "quantity": 1})
+
+        first = self.client.get("/tickets/", params={"limit": 3, "order_by": "-price"}).json()
+        second = self.client.get(
+            "/tickets/", params={"limit": 3, "order_by": "-price", "after": first["next_cursor"]}).json()
+
+        prices = [item["price"] for item in first["items"] + second["items"]]
+        self.assertEqual(prices, [10.5, 3, 2, 1, 0])
+        self.assertIsNone(second["next_cursor"])
+        events = self.client.get("/events/", params={"venue_id": venue["id"]}).json()["items"]
+        self.assertEqual([item["id"] for item in events], [event["id"]])
+
+    def test_bulk_insert_returns_ids_in_order(self):
+        body = [{"name": f"V{index}", "address": None} for index in range(5)]
+        result = self.client.post("/venues/bulk", json=body).json()
+        ids = [item["id"] for item in result["results"]]
+        names = [self.client.get(f"/venues/{venue_id}").json()["name"] for venue_id in ids]
+        self.assertEqual(names, [f"V{index}" for index in range(5)])
+
+    def count(self, table):
+        with db.get_connection() as conn:
+            return conn.cursor().execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+    def test_bulk_insert_reports_constraint_violation_per_item(self):
+        *_, ticket = self.seed_event()
+        body = [{"ticket_id": ticket_id, "name": "A", "email": "a@x"}
+                for ticket_id in (ticket["id"], 999, ticket["id"])]
+
+        rejected = self.client.post("/attendees/bulk?atomic=true", json=body)
+        self.assertEqual(rejected.status_code, 422)
+        self.assertEqual([item["index"] for item in rejected.json()["detail"]["results"]], [1])
+        self.assertEqual(self.count("attendees"), 0)
+
+        result = self.client.post("/attendees/bulk", json=body).json()
+        self.assertEqual((result["succeeded"], result["failed"]), (2, 1))
+        self.assertIsNone(result["results"][1]["id"])
+        self.assertIn("FOREIGN KEY", result["results"][1]["error"])
+        self.assertEqual(self.count("attendees"), 2)
+
+    def test_bulk_update_reports_constraint_violation_per_item(self):
+        organizer, venue, event, _ = self.seed_event()
+        other = self.client.post("/events/", json={
+            "title": "Other", "organizer_id": organizer["id"], "venue_id": venue["id"]}).json()
+        body = [{**event, "title": "Moved", "venue_id": 999}, {**other, "title": "Renamed"}]
+
+        rejected = self.client.put("/events/bulk?atomic=true", json=body)
+        self.assertEqual(rejected.status_code, 422)
+        self.assertEqual([item["index"] for item in rejected.json()["detail"]["results"]], [0])
+        self.assertEqual(self.client.get(f"/events/{other['id']}").json()["title"], "Other")
+
+        result = self.client.put("/events/bulk", json=body).json()
+        self.assertEqual([item["error"] is None for item in result["results"]], [False, True])
+        self.assertEqual(self.client.get(f"/events/{event['id']}").json()["title"], "Concert")
+        self.assertEqual(self.client.get(f"/events/{other['id']}").json()["title"], "Renamed")
+
+    def test_if_match(self):
+        created = self.client.post("/venues/", json={"name": "V", "address": None}).json()
+        etag = self.client.get(f"/venues/{created['id']}").headers["ETag"]
+
+        stale = self.client.put(f"/venues/{created['id']}", json={"name": "X", "address": None},
+                                headers={"If-Match": '"stale"'})
+        fresh = self.client.put(f"/venues/{created['id']}", json={"name": "Y", "address": None},
+                                headers={"If-Match": etag})
+
+        self.assertEqual(stale.status_code, 412)
+        self.assertEqual(fresh.status_code, 200)
+
+    def test_event_detail_and_include(self):
+        organizer, venue, event, ticket = self.seed_event(quantity=7)
+
+        detail = self.client.get(f"/events/{event['id']}/full").json()
+        page = self.client.get("/events/", params={"include": "organizer,venue,tickets"}).json()
+
+        self.assertEqual(detail["organizer"], organizer)
+        self.assertEqual(detail["venue"], venue)
+        self.assertEqual(detail["tickets"], [ticket])
+        self.assertEqual(detail["tickets_remaining"], 7)
+        self.assertEqual(page["items"][0]["tickets"], [ticket])
+
+    def test_purchase_and_holds(self):
+        *_, ticket = self.seed_event(quantity=3)
+        url = f"/tickets/{ticket['id']}"
+
+        bought = self.client.post(f"{url}/purchase", json={"attendees": [{"name": "A", "email": "a@x"}]})
+        hold = self.client.post(f"{url}/holds", json={"quantity": 2}).json()
+        sold_out = self.client.post(f"{url}/purchase", json={"attendees": [{"name": "B", "email": "b@x"}]})
+        released = self.client.delete(f"/holds/{hold['id']}")
+        hold = self.client.post(f"{url}/holds", json={"quantity": 2}).json()
+        confirmed = self.client.post(f"/holds/{hold['id']}/purchase", json={
+            "attendees": [{"name": "C", "email": "c@x"}, {"name": "D", "email": "d@x"}]})
+
+        self.assertEqual(bought.status_code, 200)
+        self.assertEqual(sold_out.status_code, 409)
+        self.assertEqual(released.status_code, 200)
+        self.assertEqual([item["name"] for item in confirmed.json()], ["C", "D"])
+        self.assertEqual(self.client.get(url).json()["quantity"], 0)
+        attendees = self.client.get("/attendees/", params={"ticket_id": ticket["id"]}).json()["items"]
+        self.assertEqual(len(attendees), 3)
+
+    def test_expired_holds_are_released(self):
+        *_, ticket = self.seed_event(quantity=5)
+        with db.get_connection() as conn:
+            purchase.create_hold(conn, ticket["id"], 4, ttl=-1)
+        with db.get_connection() as conn:
+            self.assertEqual(purchase.release_expired_holds(conn), 1)
+        self.assertEqual(self.client.get(f"/tickets/{ticket['id']}").json()["quantity"], 5)
+
+    def test_export(self):
+        self.seed_event()
+        lines = self.client.get("/events/export").text.splitlines()
+        self.assertEqual(json.loads(lines[0])["title"], "Concert")
+
+
+class TestSQLiteFile(SQLiteTestCase):
+    """Файловая БД в WAL: несколько соединений и настоящая конкуренция."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "events.db")
+        super().setUp()
+
+    def tearDown(self):
+        super().tearDown()
+        self.tmp.cleanup()
+
+    def test_concurrent_purchases_never_oversell(self):
+        *_, ticket = self.seed_event(quantity=40)
+        results = []
+        lock = threading.Lock()
+
+        def worker(number):
+            for index in range(10):
+                with db.get_connection() as conn:
+                    people = [{"name": f"w{number}-{index}", "email": "e@x"}]
+                    result = purchase.purchase_batch(conn, ticket["id"], [people])[0]
+                with lock:
+                    results.append(result)
+
+        threads = [threading.Thread(target=worker, args=(number,)) for number in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        sold = sum(1 for result in results if isinstance(result, list))
+        self.assertEqual(sold, 40)
+        self.assertEqual(self.client.get(f"/tickets/{ticket['id']}").json()["quantity"], 0)
+        with db.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT COUNT(*) FROM attendees WHERE ticket_id = ?", ticket["id"])
+            self.assertEqual(cursor.fetchone()[0], 40)
+
+    def test_purchase_queue(self):
+        *_, ticket = self.seed_event(quantity=100)
+
+        async def scenario():
+            async def buy(index):
+                try:
+                    return await purchase.purchase(ticket["id"], [{"name": f"q{index}", "email": "q@x"}])
+                except purchase.SoldOut:
+                    return None
+            return await asyncio.gather(*(buy(index) for index in range(300)))
+
+        results = asyncio.run(scenario())
+
+        self.assertEqual(sum(1 for result in results if result), 100)
+        self.assertEqual(self.client.get(f"/tickets/{ticket['id']}").json()["quantity"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
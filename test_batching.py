@@ -0,0 +1,80 @@
+import asyncio
+import sqlite3
+import time
+import unittest
+from dataclasses import replace
+from unittest.mock import patch
+
+import db
+import repository
+from batching import InsertBatcher, _size_bucket, writers
+from config import settings
+from test_backends import SQLiteTestCase
+
+
+class TestSizeBucket(unittest.TestCase):
+
+    def test_powers_of_two(self):
+        self.assertEqual([_size_bucket(size) for size in (1, 2, 3, 4, 5, 500)], [1, 2, 4, 4, 8, 512])
+
+
+class TestInsertBatcher(SQLiteTestCase):
+
+    def setUp(self):
+        super().setUp()
+        *_, self.ticket = self.seed_event()
+
+    def attendee(self, index, ticket_id=None):
+        return {"ticket_id": ticket_id or self.ticket["id"], "name": f"g{index}", "email": f"g{index}@x"}
+
+    def test_each_caller_gets_own_id(self):
+        batcher = InsertBatcher("attendees", repository.attendees, window=0.01, max_batch=100)
+
+        async def scenario():
+            return await asyncio.gather(*(batcher.submit(self.attendee(index)) for index in range(300)))
+
+        ids = asyncio.run(scenario())
+
+        self.assertEqual(len(set(ids)), 300)
+        with db.get_connection() as conn:
+            for index in (0, 150, 299):
+                self.assertEqual(repository.attendees.get(conn, ids[index])["name"], f"g{index}")
+        stats = batcher.stats()
+        self.assertEqual(stats["rows"], 300)
+        self.assertEqual(stats["batches"], 3)
+        self.assertEqual(stats["batch_sizes"], {"128": 3})
+
+    def test_bad_row_fails_alone(self):
+        batcher = InsertBatcher("attendees", repository.attendees, window=0.01, max_batch=100)
+
+        async def scenario():
+            rows = [self.attendee(0), self.attendee(1, ticket_id=999), self.attendee(2)]
+            return await asyncio.gather(*(batcher.submit(row) for row in rows), return_exceptions=True)
+
+        first, failed, last = asyncio.run(scenario())
+
+        self.assertIsInstance(failed, sqlite3.IntegrityError)
+        self.assertIsInstance(first, int)
+        self.assertIsInstance(last, int)
+        self.assertEqual(batcher.stats()["rows"], 2)
+
+    def test_full_batch_does_not_wait_for_window(self):
+        batcher = InsertBatcher("attendees", repository.attendees, window=10, max_batch=5)
+
+        async def scenario():
+            return await asyncio.gather(*(batcher.submit(self.attendee(index)) for index in range(5)))
+
+        started = time.perf_counter()
+        asyncio.run(scenario())
+        self.assertLess(time.perf_counter() - started, 5)
+
+    def test_route_uses_batcher(self):
+        with patch("batching.settings", replace(settings, write_batching_enabled=True)):
+            created = self.client.post("/attendees/", json=self.attendee(7)).json()
+
+        self.assertEqual(self.client.get(f"/attendees/{created['id']}").json()["name"], "g7")
+        self.assertGreaterEqual(writers["attendees"].stats()["rows"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,123 @@
+import unittest
+from unittest.mock import MagicMock, patch
+
+from fastapi.testclient import TestClient
+
+import repository
+from app import app
+from test_backends import mock_connection
+
+
+class TestBulkRepository(unittest.TestCase):
+
+    def test_insert_many_maps_ids_to_input_order(self):
+        conn = MagicMock()
+        cursor = conn.cursor.return_value
+        # OUTPUT может вернуть строки в любом порядке
+        cursor.fetchall.return_value = [(12,), (10,), (11,)]
+
+        ids = repository.organizers.insert_many(conn, [
+            {"name": "A", "contact_info": None},
+            {"name": "B", "contact_info": "b@x"},
+            {"name": "C", "contact_info": None},
+        ])
+
+        self.assertEqual(ids, [10, 11, 12])
+        sql, *params = cursor.execute.call_args[0]
+        self.assertIn("OUTPUT INSERTED.id SELECT name, contact_info FROM (VALUES (?, ?, ?), (?, ?, ?), (?, ?, ?))", sql)
+        self.assertTrue(sql.endswith("ORDER BY _ord"))
+        self.assertEqual(params, ["A", None, 0, "B", "b@x", 1, "C", None, 2])
+        conn.commit.assert_called_once()
+
+    def test_insert_many_respects_parameter_limit(self):
+        conn = MagicMock()
+        cursor = conn.cursor.return_value
+        cursor.fetchall.side_effect = lambda: [(1,)] * 2
+        items = [{"ticket_id": 1, "name": "N", "email": "e"}] * 4
+        with patch("repository.MAX_PARAMS", 8):
+            repository.attendees.insert_many(conn, items)
+        # 8 параметров / 4 на строку = 2 строки на запрос
+        self.assertEqual(cursor.execute.call_count, 2)
+
+    def test_update_many_uses_fast_executemany(self):
+        conn = MagicMock()
+        cursor = conn.cursor.return_value
+        cursor.fetchall.return_value = [(1,)]
+
+        missing = repository.venues.update_many(conn, [(1, {"name": "V", "address": None}), (2, {"name": "W", "address": None})])
+
+        self.assertEqual(missing, {2})
+        self.assertTrue(cursor.fast_executemany)
+        cursor.executemany.assert_called_once_with("UPDATE venues SET name=?, address=? WHERE id=?", [["V", None, 1]])
+        conn.commit.assert_called_once()
+
+    def test_atomic_delete_does_not_commit_on_missing(self):
+        conn = MagicMock()
+        conn.cursor.return_value.fetchall.return_value = [(1,)]
+        missing = repository.events.delete_many(conn, [1, 5], atomic=True)
+        self.assertEqual(missing, {5})
+        conn.commit.assert_not_called()
+
+
+class TestBulkEndpoints(unittest.TestCase):
+
+    def setUp(self):
+        self.client = TestClient(app)
+
+    @patch('db.get_connection')
+    def test_partial_validation_errors(self, mock_get_conn):
+        _, cursor = mock_connection(mock_get_conn)
+        cursor.fetchall.return_value = [(7,), (8,)]
+
+        response = self.client.post("/organizers/bulk", json=[
+            {"name": "A"}, {"contact_info": "no name"}, {"name": "C"}])
+
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual((data["succeeded"], data["failed"]), (2, 1))
+        self.assertEqual([item["id"] for item in data["results"]], [7, None, 8])
+        self.assertEqual(data["results"][1]["error"][0]["loc"], ["name"])
+
+    @patch('db.get_connection')
+    def test_atomic_rejects_whole_batch(self, mock_get_conn):
+        response = self.client.post("/organizers/bulk?atomic=true", json=[{"name": "A"}, {}])
+        self.assertEqual(response.status_code, 422)
+        mock_get_conn.assert_not_called()
+
+    @patch('db.get_connection')
+    def test_ndjson_body(self, mock_get_conn):
+        _, cursor = mock_connection(mock_get_conn)
+        cursor.fetchall.return_value = [(3,)]
+
+        response = self.client.post(
+            "/attendees/bulk",
+            content=b'{"ticket_id": 1, "name": "Ann", "email": "ann@x"}\n{broken\n',
+            headers={"Content-Type": "application/x-ndjson"})
+
+        data = response.json()
+        self.assertEqual(data["results"][0]["id"], 3)
+        self.assertTrue(data["results"][1]["error"].startswith("Invalid JSON"))
+
+    @patch('db.get_connection')
+    def test_update_checks_event_dates(self, mock_get_conn):
+        event = {"id": 1, "title": "T", "organizer_id": 1, "venue_id": 1,
+                 "start_date": "2024-05-02T10:00:00", "end_date": "2024-05-01T10:00:00"}
+
+        data = self.client.put("/events/bulk", json=[event]).json()
+
+        self.assertEqual((data["succeeded"], data["failed"]), (0, 1))
+        self.assertIn("end_date is before start_date", data["results"][0]["error"][0]["msg"])
+        mock_get_conn.assert_not_called()
+
+    @patch('db.get_connection')
+    def test_delete_reports_missing_ids(self, mock_get_conn):
+        _, cursor = mock_connection(mock_get_conn)
+        cursor.fetchall.return_value = [(1,), (3,)]
+
+        response = self.client.request("DELETE", "/tickets/bulk", json={"ids": [1, 2, 3]})
+
+        self.assertEqual([item["error"] for item in response.json()["results"]], [None, "Not found", None])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,163 @@
+import asyncio
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+
+from cache import EntityCache, entity_cache, read_many, read_through
+
+
+class TestEntityCache(unittest.TestCase):
+
+    def test_lru_eviction(self):
+        cache = EntityCache(2, {"venues": 60})
+        cache.set("venues", 1, "a")
+        cache.set("venues", 2, "b")
+        cache.get("venues", 1)
+        cache.set("venues", 3, "c")
+        self.assertEqual(cache.get("venues", 1), "a")
+        self.assertIsNot(cache.get("venues", 2), "b")
+        self.assertEqual(cache.stats()["entities"]["venues"]["evictions"], 1)
+
+    def test_ttl_per_entity(self):
+        cache = EntityCache(10, {"events": 0.01, "venues": 60})
+        cache.set("events", 1, "e")
+        cache.set("venues", 1, "v")
+        time.sleep(0.02)
+        self.assertIsNot(cache.get("events", 1), "e")
+        self.assertEqual(cache.get("venues", 1), "v")
+        self.assertEqual(cache.stats()["entities"]["events"]["expirations"], 1)
+
+    def test_stale_read_is_not_stored_after_invalidation(self):
+        cache = EntityCache(10, {"events": 60})
+        generation = cache.generation("events")
+        cache.invalidate("events", 1)
+        cache.set("events", 1, "old", generation)
+        self.assertEqual(cache.stats()["size"], 0)
+
+    def test_replica_read_is_not_stored_right_after_invalidation(self):
+        cache = EntityCache(10, {"events": 60}, replica_window=60)
+        cache.invalidate("events", 1)
+        cache.set("events", 1, "lagging", from_replica=True)
+        cache.set("events", 2, "other", from_replica=True)
+        self.assertEqual(cache.get("events", 2), "other")
+        self.assertEqual(cache.stats()["entities"]["events"]["replica_skips"], 1)
+
+        cache.set("events", 1, "primary")
+        self.assertEqual(cache.get("events", 1), "primary")
+
+    def test_read_through_counts_hits(self):
+        cache = EntityCache(10, {"organizers": 60})
+        loads = []
+
+        async def load():
+            loads.append(1)
+            return {"id": 1}
+
+        async def scenario():
+            await read_through("organizers", 1, load)
+            await read_through("organizers", 1, load)
+
+        with patch("cache.entity_cache", cache):
+            asyncio.run(scenario())
+        self.assertEqual(len(loads), 1)
+        self.assertEqual(cache.stats()["entities"]["organizers"]["hits"], 1)
+
+    def test_disabled_cache_always_loads(self):
+        cache = EntityCache(10, {"organizers": 60}, enabled=False)
+        load = MagicMock(side_effect=lambda: asyncio.sleep(0, {"id": 1}))
+
+        async def scenario():
+            await read_through("organizers", 1, load)
+            await read_through("organizers", 1, load)
+
+        with patch("cache.entity_cache", cache):
+            asyncio.run(scenario())
+        self.assertEqual(load.call_count, 2)
+
+
+class TestSingleFlight(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = EntityCache(10, {"events": 60})
+        self.loads = []
+
+    def run_with_cache(self, scenario):
+        with patch("cache.entity_cache", self.cache):
+            return asyncio.run(scenario())
+
+    async def load(self, key):
+        self.loads.append(key)
+        await asyncio.sleep(0.01)
+        return {"id": key}
+
+    async def load_many(self, keys):
+        self.loads.append(list(keys))
+        await asyncio.sleep(0.01)
+        return {key: {"id": key} for key in keys if key != 404}
+
+    def test_concurrent_misses_share_one_load(self):
+        async def scenario():
+            return await asyncio.gather(*(read_through("tickets", 7, lambda: self.load(7)) for _ in range(100)))
+
+        results = self.run_with_cache(scenario)
+
+        self.assertEqual(self.loads, [7])
+        self.assertEqual(results, [{"id": 7}] * 100)
+        self.assertEqual(self.cache.stats()["entities"]["tickets"]["coalesced"], 99)
+
+    def test_read_many_joins_flights_and_batches_the_rest(self):
+        async def scenario():
+            single = asyncio.ensure_future(read_through("events", 2, lambda: self.load(2)))
+            await asyncio.sleep(0)
+            values = await read_many("events", [3, 2, 404, 1, 3], self.load_many)
+            return values, await single
+
+        values, single = self.run_with_cache(scenario)
+
+        self.assertEqual(self.loads, [2, [3, 404, 1]])
+        self.assertEqual(values, {3: {"id": 3}, 2: {"id": 2}, 404: None, 1: {"id": 1}})
+        self.assertEqual(single, {"id": 2})
+        self.assertEqual(self.cache.get("events", 1), {"id": 1})
+
+    def test_invalidation_detaches_flight(self):
+        async def scenario():
+            stale = asyncio.ensure_future(read_through("events", 1, lambda: self.load(1)))
+            await asyncio.sleep(0)
+            self.cache.invalidate("events", 1)
+            fresh = asyncio.ensure_future(read_through("events", 1, lambda: self.load(1)))
+            await asyncio.gather(stale, fresh)
+
+        self.run_with_cache(scenario)
+        self.assertEqual(self.loads, [1, 1])
+        self.assertEqual(self.cache.stats()["in_flight"], 0)
+
+
+class TestCachedHandlers(unittest.TestCase):
+
+    def setUp(self):
+        entity_cache.clear()
+
+    @patch('db.get_connection')
+    def test_update_invalidates(self, mock_get_conn):
+        from fastapi import Response
+
+        from app import OrganizerCreate, read_organizer, update_organizer
+
+        mock_conn = MagicMock()
+        mock_get_conn.return_value = mock_conn
+        mock_conn.__enter__.return_value = mock_conn
+        mock_cursor = mock_conn.cursor.return_value
+        mock_cursor.fetchone.return_value = (5, "Old", None)
+        mock_cursor.rowcount = 1
+
+        asyncio.run(read_organizer(5, Response()))
+        asyncio.run(read_organizer(5, Response()))
+        self.assertEqual(mock_get_conn.call_count, 1)
+
+        asyncio.run(update_organizer(5, OrganizerCreate(name="New")))
+        mock_cursor.fetchone.return_value = (5, "New", None)
+        self.assertEqual(asyncio.run(read_organizer(5, Response())).name, "New")
+
+
+if __name__ == '__main__':
+    unittest.main()
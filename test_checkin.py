@@ -0,0 +1,125 @@
+import unittest
+
+from fastapi.testclient import TestClient
+
+import db
+from app import app
+from checkin import ADMITTED, DUPLICATE, NOT_FOUND, BloomFilter, EventCheckin, checkin_desk, email_hash
+from test_backends import SQLiteTestCase
+
+
+class TestBloomFilter(unittest.TestCase):
+
+    def test_no_false_negatives(self):
+        bloom = BloomFilter(1000)
+        values = [email_hash(f"guest{index}@x") for index in range(1000)]
+        for value in values:
+            bloom.add(value)
+
+        self.assertTrue(all(value in bloom for value in values))
+        false_positives = sum(email_hash(f"stranger{index}@x") in bloom for index in range(10000))
+        self.assertLess(false_positives, 300)
+
+
+class TestEventCheckin(unittest.TestCase):
+
+    def setUp(self):
+        self.checkin = EventCheckin(1, {10}, [
+            (3, "Ann@Example.com", False),
+            (1, "bob@x", True),
+            (7, "party@x", False),
+            (8, "party@x", False),
+        ])
+
+    def test_by_id(self):
+        self.assertEqual(self.checkin.check_in_id(3), (ADMITTED, 3))
+        self.assertEqual(self.checkin.check_in_id(3), (DUPLICATE, 3))
+        self.assertEqual(self.checkin.check_in_id(1), (DUPLICATE, 1))
+        self.assertEqual(self.checkin.check_in_id(2), (NOT_FOUND, None))
+
+    def test_by_email(self):
+        self.assertEqual(self.checkin.check_in_email(" ann@example.COM"), (ADMITTED, 3))
+        self.assertEqual(self.checkin.check_in_email("ann@example.com"), (DUPLICATE, 3))
+        self.assertEqual(self.checkin.check_in_email("nobody@x"), (NOT_FOUND, None))
+        self.assertEqual(self.checkin.bloom_rejects, 1)
+
+    def test_shared_email_admits_each_attendee_once(self):
+        admitted = [self.checkin.check_in_email("party@x") for _ in range(3)]
+        self.assertEqual(sorted(admitted[:2]), [(ADMITTED, 7), (ADMITTED, 8)])
+        self.assertEqual(admitted[2][0], DUPLICATE)
+
+    def test_add_and_remove(self):
+        self.checkin.add(5, "new@x")
+        self.checkin.add(3, "renamed@x")
+        self.checkin.remove(7)
+
+        self.assertEqual(self.checkin.check_in_email("new@x"), (ADMITTED, 5))
+        self.assertEqual(self.checkin.check_in_email("renamed@x"), (ADMITTED, 3))
+        self.assertEqual(self.checkin.check_in_email("ann@example.com"), (NOT_FOUND, None))
+        self.assertEqual(self.checkin.check_in_email("party@x"), (ADMITTED, 8))
+        stats = self.checkin.stats()
+        self.assertEqual((stats["attendees"], stats["checked_in"]), (4, 4))
+        self.assertEqual(list(self.checkin.ids), [1, 3, 5, 8])
+
+
+class TestCheckinRoute(SQLiteTestCase):
+
+    def setUp(self):
+        super().setUp()
+        checkin_desk.events.clear()
+        _, _, self.event, self.ticket = self.seed_event()
+        self.guests = self.client.post(f"/tickets/{self.ticket['id']}/purchase", json={"attendees": [
+            {"name": "Ann", "email": "ann@x"}, {"name": "Bob", "email": "bob@x"}]}).json()
+
+    def check_in(self, client=None, **body):
+        return (client or self.client).post(f"/events/{self.event['id']}/checkin", json=body)
+
+    def test_check_in_once(self):
+        admitted = self.check_in(email="ANN@x")
+        duplicate = self.check_in(attendee_id=self.guests[0]["id"])
+
+        self.assertEqual(admitted.json(), {
+            "event_id": self.event["id"], "attendee_id": self.guests[0]["id"], "status": "admitted"})
+        self.assertEqual(duplicate.status_code, 409)
+        self.assertEqual(self.check_in(email="eve@x").status_code, 404)
+        self.assertEqual(self.check_in(email="ann@x", attendee_id=1).status_code, 422)
+        self.assertEqual(self.client.post("/events/999/checkin", json={"email": "ann@x"}).status_code, 404)
+
+    def test_index_follows_attendee_writes(self):
+        self.assertEqual(self.client.get(f"/events/{self.event['id']}/checkin").json()["attendees"], 2)
+
+        late = self.client.post("/attendees/", json={
+            "ticket_id": self.ticket["id"], "name": "Late", "email": "late@x"}).json()
+        self.client.delete(f"/attendees/{self.guests[1]['id']}")
+
+        self.assertEqual(self.check_in(email="late@x").json()["attendee_id"], late["id"])
+        self.assertEqual(self.check_in(email="bob@x").status_code, 404)
+
+    def test_edited_attendee_stays_checked_in(self):
+        guest = self.guests[0]
+        self.assertEqual(self.check_in(attendee_id=guest["id"]).status_code, 200)
+
+        edited = self.client.put(f"/attendees/{guest['id']}", json={
+            "ticket_id": self.ticket["id"], "name": "Ann Smith", "email": "ann.smith@x"})
+
+        self.assertEqual(edited.status_code, 200)
+        self.assertEqual(self.check_in(attendee_id=guest["id"]).status_code, 409)
+        self.assertEqual(self.check_in(email="ann.smith@x").status_code, 409)
+
+    def test_check_ins_persisted_and_reloaded(self):
+        with TestClient(app) as client:
+            self.assertEqual(self.check_in(client, email="ann@x").status_code, 200)
+        # Остановка сервиса дописывает накопленные проходы
+
+        db.init_pool(**self.backend.pool_overrides())
+        with db.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT attendee_id FROM checkins")
+            self.assertEqual(cursor.fetchall(), [(self.guests[0]["id"],)])
+
+        self.assertEqual(self.client.delete(f"/events/{self.event['id']}/checkin").status_code, 200)
+        self.assertEqual(self.check_in(email="ann@x").status_code, 409)
+
+
+if __name__ == "__main__":
+    unittest.main()
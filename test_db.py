@@ -0,0 +1,52 @@
+import asyncio
+import threading
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+
+import db
+
+
+class TestRunDb(unittest.TestCase):
+
+    def test_group_limit_bounds_concurrency(self):
+        limiter = db.GroupLimiter("events", 2)
+        active = 0
+        peak = 0
+        lock = threading.Lock()
+
+        def slow_query(conn):
+            nonlocal active, peak
+            with lock:
+                active += 1
+                peak = max(peak, active)
+            time.sleep(0.02)
+            with lock:
+                active -= 1
+
+        async def scenario():
+            await asyncio.gather(*(db.run_db("events", slow_query) for _ in range(8)))
+
+        with patch.dict(db._limiters, {"events": limiter}), patch('db.get_connection') as mock_get_conn:
+            mock_get_conn.return_value = MagicMock()
+            asyncio.run(scenario())
+
+        self.assertEqual(peak, 2)
+        self.assertEqual(limiter.stats()["completed"], 8)
+        self.assertEqual(limiter.stats()["in_flight"], 0)
+
+    @patch('db.get_connection')
+    def test_connection_returned_on_error(self, mock_get_conn):
+        mock_conn = MagicMock()
+        mock_get_conn.return_value = mock_conn
+
+        def failing_query(conn):
+            raise ValueError("bad query")
+
+        with self.assertRaises(ValueError):
+            asyncio.run(db.run_db("venues", failing_query))
+        mock_conn.__exit__.assert_called_once()
+
+
+if __name__ == '__main__':
+    unittest.main()
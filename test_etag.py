@@ -0,0 +1,110 @@
+import unittest
+from decimal import Decimal
+from unittest.mock import MagicMock, patch
+
+from fastapi.testclient import TestClient
+
+import repository
+from app import app
+from cache import entity_cache
+from etag import PreconditionFailed, compute_etag, is_not_modified, precondition_holds
+from test_backends import mock_connection
+
+
+class TestEtagHelpers(unittest.TestCase):
+
+    def test_etag_is_stable_and_quoted(self):
+        first = compute_etag({"id": 1, "name": "A", "price": Decimal("10.50")})
+        second = compute_etag({"price": 10.5, "name": "A", "id": 1})
+        self.assertEqual(first, second)
+        self.assertTrue(first.startswith('"') and first.endswith('"'))
+        self.assertNotEqual(first, compute_etag({"id": 1, "name": "B", "price": 10.5}))
+
+    def test_if_none_match_uses_weak_comparison(self):
+        etag = compute_etag({"id": 1})
+        self.assertTrue(is_not_modified(f'"other", W/{etag}', etag))
+        self.assertTrue(is_not_modified("*", etag))
+        self.assertFalse(is_not_modified(None, etag))
+        self.assertFalse(is_not_modified('"other"', etag))
+
+    def test_if_match_uses_strong_comparison(self):
+        etag = compute_etag({"id": 1})
+        self.assertTrue(precondition_holds(None, etag))
+        self.assertTrue(precondition_holds(etag, etag))
+        self.assertFalse(precondition_holds(f"W/{etag}", etag))
+
+
+class TestConditionalRequests(unittest.TestCase):
+
+    def setUp(self):
+        entity_cache.clear()
+        self.client = TestClient(app)
+
+    @patch("db.get_connection")
+    def test_get_returns_etag_and_304(self, mock_get_conn):
+        _, cursor = mock_connection(mock_get_conn)
+        cursor.fetchone.return_value = (1, "Org", "info")
+
+        first = self.client.get("/organizers/1")
+        self.assertEqual(first.status_code, 200)
+        etag = first.headers["ETag"]
+
+        second = self.client.get("/organizers/1", headers={"If-None-Match": etag})
+        self.assertEqual(second.status_code, 304)
+        self.assertEqual(second.headers["ETag"], etag)
+        self.assertEqual(second.content, b"")
+        # Второй ответ собран из кэша, в БД не ходили
+        self.assertEqual(cursor.execute.call_count, 1)
+
+    @patch("db.get_connection")
+    def test_list_page_supports_if_none_match(self, mock_get_conn):
+        _, cursor = mock_connection(mock_get_conn)
+        cursor.fetchall.return_value = [(1, 2, Decimal("10.00"), "VIP", 5)]
+
+        first = self.client.get("/tickets/")
+        second = self.client.get("/tickets/", headers={"If-None-Match": first.headers["ETag"]})
+
+        self.assertEqual(second.status_code, 304)
+
+    @patch("db.get_connection")
+    def test_put_with_stale_if_match_returns_412(self, mock_get_conn):
+        mock_conn, cursor = mock_connection(mock_get_conn)
+        cursor.fetchone.return_value = (1, "Changed", None)
+
+        response = self.client.put(
+            "/organizers/1", json={"name": "New", "contact_info": None}, headers={"If-Match": '"stale"'})
+
+        self.assertEqual(response.status_code, 412)
+        mock_conn.commit.assert_not_called()
+
+    @patch("db.get_connection")
+    def test_delete_with_current_if_match(self, mock_get_conn):
+        mock_conn, cursor = mock_connection(mock_get_conn)
+        cursor.fetchone.return_value = (1, "Org", None)
+        cursor.rowcount = 1
+        etag = compute_etag({"id": 1, "name": "Org", "contact_info": None})
+
+        response = self.client.delete("/organizers/1", headers={"If-Match": etag})
+
+        self.assertEqual(response.status_code, 200)
+        sql = cursor.execute.call_args_list[0][0][0]
+        self.assertIn("WITH (UPDLOCK, ROWLOCK)", sql)
+        mock_conn.commit.assert_called_once()
+
+
+class TestRepositoryVersionCheck(unittest.TestCase):
+
+    def test_missing_row_is_not_found(self):
+        cursor = MagicMock()
+        cursor.fetchone.return_value = None
+        self.assertFalse(repository.venues._check_version(cursor, 7, '"x"'))
+
+    def test_mismatch_raises(self):
+        cursor = MagicMock()
+        cursor.fetchone.return_value = (7, "V", None)
+        with self.assertRaises(PreconditionFailed):
+            repository.venues._check_version(cursor, 7, '"x"')
+
+
+if __name__ == "__main__":
+    unittest.main()
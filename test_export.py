@@ -0,0 +1,49 @@
+import asyncio
+import json
+import unittest
+from decimal import Decimal
+from unittest.mock import MagicMock
+
+import repository
+from export import encode_csv, encode_ndjson
+
+
+async def _chunks(*chunks):
+    for chunk in chunks:
+        yield chunk
+
+
+async def _collect(stream):
+    return b"".join([part async for part in stream])
+
+
+class TestExport(unittest.TestCase):
+
+    def test_repository_streams_in_chunks(self):
+        conn = MagicMock()
+        cursor = conn.cursor.return_value
+        cursor.fetchmany.side_effect = [[(1, 1, "A", "a@x")], [(2, 1, "B", "b@x")], []]
+
+        chunks = list(repository.attendees.stream(conn, 1))
+
+        self.assertEqual(len(chunks), 2)
+        cursor.execute.assert_called_once_with("SELECT id, ticket_id, name, email FROM attendees ORDER BY id")
+        cursor.fetchall.assert_not_called()
+
+    def test_ndjson(self):
+        columns = repository.tickets.select_columns
+        body = asyncio.run(_collect(encode_ndjson(columns, _chunks(
+            [(1, 5, Decimal("10.50"), "VIP", 3)], [(2, 5, Decimal("1"), "Стандарт", 100)]))))
+        lines = [json.loads(line) for line in body.decode().splitlines()]
+        self.assertEqual(lines[0], {"id": 1, "event_id": 5, "price": 10.5, "ticket_type": "VIP", "quantity": 3})
+        self.assertEqual(lines[1]["ticket_type"], "Стандарт")
+
+    def test_csv_header_first(self):
+        columns = repository.attendees.select_columns
+        stream = encode_csv(columns, _chunks([(1, 2, "Ann, Jr.", "ann@x")]))
+        parts = asyncio.run(_collect(stream)).decode().splitlines()
+        self.assertEqual(parts, ["id,ticket_id,name,email", '1,2,"Ann, Jr.",ann@x'])
+
+
+if __name__ == '__main__':
+    unittest.main()
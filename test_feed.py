@@ -0,0 +1,109 @@
+import asyncio
+import json
+import unittest
+
+from app import PurchaseAttendee, PurchaseRequest, TicketCreate, create_ticket, delete_ticket, purchase_tickets
+from feed import PING, ticket_feed
+from test_backends import SQLiteTestCase
+
+
+def parse(frame):
+    fields = dict(line.split(": ", 1) for line in frame.decode().strip().split("\n"))
+    return fields["id"], fields["event"], json.loads(fields["data"])
+
+
+class TestTicketFeed(SQLiteTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.settings = ticket_feed.window, ticket_feed.heartbeat
+        ticket_feed.window = 0.01
+        _, _, self.event, self.ticket = self.seed_event(quantity=10)
+
+    def tearDown(self):
+        ticket_feed.window, ticket_feed.heartbeat = self.settings
+        super().tearDown()
+
+    def buy(self, name):
+        return purchase_tickets(self.ticket["id"], PurchaseRequest(
+            attendees=[PurchaseAttendee(name=name, email=f"{name}@x")]))
+
+    async def subscribe(self, last_event_id=None):
+        channel = await ticket_feed.channel(self.event["id"])
+        stream = ticket_feed.stream(channel, last_event_id)
+        self.assertTrue((await stream.__anext__()).startswith(b"retry:"))
+        return stream
+
+    def test_snapshot_then_coalesced_changes(self):
+        ticket_feed.window = 0.5
+
+        async def scenario():
+            stream = await self.subscribe()
+            snapshot = parse(await stream.__anext__())
+            flushes = ticket_feed.flushes
+            await asyncio.gather(*(self.buy(f"guest{index}") for index in range(3)))
+            created = await create_ticket(TicketCreate(
+                event_id=self.event["id"], price=50, ticket_type="VIP", quantity=5))
+            changes = parse(await stream.__anext__())
+            await stream.aclose()
+            return snapshot, changes, created, ticket_feed.flushes - flushes
+
+        snapshot, changes, created, flushes = asyncio.run(scenario())
+
+        self.assertEqual(snapshot[1], "snapshot")
+        self.assertEqual([(row["id"], row["quantity"]) for row in snapshot[2]], [(self.ticket["id"], 10)])
+        # Три покупки и новый билет — одно сообщение и одно чтение из БД
+        self.assertEqual(changes[1], "tickets")
+        self.assertEqual([(row["id"], row["quantity"]) for row in changes[2]], [(self.ticket["id"], 7), (created.id, 5)])
+        self.assertEqual(flushes, 1)
+
+    def test_resume_from_last_event_id(self):
+        async def scenario():
+            stream = await self.subscribe()
+            await stream.__anext__()
+            await self.buy("first")
+            first_id = parse(await stream.__anext__())[0]
+            await self.buy("second")
+            await stream.__anext__()
+            await stream.aclose()
+
+            resumed = await self.subscribe(first_id)
+            missed = parse(await resumed.__anext__())
+            await resumed.aclose()
+            stale = await self.subscribe("0-1")
+            fresh = parse(await stale.__anext__())
+            await stale.aclose()
+            return missed, fresh
+
+        missed, fresh = asyncio.run(scenario())
+
+        self.assertEqual((missed[1], missed[2][0]["quantity"]), ("tickets", 8))
+        # Чужая эпоха (перезапуск процесса) — снимок вместо догонки
+        self.assertEqual((fresh[1], fresh[2][0]["quantity"]), ("snapshot", 8))
+
+    def test_deleted_ticket_and_heartbeat(self):
+        ticket_feed.heartbeat = 0.01
+
+        async def scenario():
+            stream = await self.subscribe()
+            await stream.__anext__()
+            ping = await stream.__anext__()
+            await delete_ticket(self.ticket["id"])
+            frame = await stream.__anext__()
+            while frame == PING:
+                frame = await stream.__anext__()
+            await stream.aclose()
+            return ping, parse(frame)
+
+        ping, deleted = asyncio.run(scenario())
+
+        self.assertEqual(ping, PING)
+        self.assertEqual(deleted[2], [{"id": self.ticket["id"], "deleted": True}])
+
+    def test_unknown_event(self):
+        self.assertEqual(self.client.get("/events/999/tickets/stream").status_code, 404)
+        self.assertIn("channels", self.client.get("/stats/feed").json())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,90 @@
+import unittest
+from unittest.mock import MagicMock
+
+import repository
+from compression import _accepts
+from test_backends import SQLiteTestCase
+
+
+class TestFieldsParsing(unittest.TestCase):
+
+    def test_id_always_selected(self):
+        self.assertEqual(repository.events.fields("title, id,title"), ("id", "title"))
+        self.assertIsNone(repository.events.fields(None))
+
+    def test_unknown_field_rejected(self):
+        with self.assertRaises(ValueError):
+            repository.attendees.fields("email,password")
+        with self.assertRaises(ValueError):
+            repository.attendees.fields(" , ")
+
+    def test_select_list_narrowed(self):
+        conn = MagicMock()
+        cursor = conn.cursor.return_value
+        cursor.fetchall.return_value = [(1, "a@x")]
+
+        rows, _ = repository.attendees.page(conn, 10, columns=("id", "email"))
+
+        self.assertTrue(cursor.execute.call_args[0][0].startswith("SELECT TOP (?) id, email FROM attendees"))
+        self.assertEqual(rows, [{"id": 1, "email": "a@x"}])
+
+
+class TestSparseFieldsets(SQLiteTestCase):
+
+    def test_list_only_requested_fields(self):
+        self.seed_event()
+        self.seed_event()
+
+        first = self.client.get("/events/", params={"fields": "title", "order_by": "start_date", "limit": 1})
+        second = self.client.get("/events/", params={
+            "fields": "title", "order_by": "start_date", "limit": 1, "after": first.json()["next_cursor"]})
+
+        self.assertEqual(first.json()["items"], [{"id": 1, "title": "Concert"}])
+        self.assertEqual(second.json()["items"], [{"id": 2, "title": "Concert"}])
+
+    def test_fields_with_include(self):
+        organizer, *_ = self.seed_event()
+        items = self.client.get("/events/", params={"fields": "title", "include": "organizer"}).json()["items"]
+        self.assertEqual(items, [{"id": 1, "title": "Concert", "organizer": organizer}])
+
+    def test_single_get(self):
+        *_, ticket = self.seed_event()
+        response = self.client.get(f"/tickets/{ticket['id']}", params={"fields": "price"})
+        cached = self.client.get("/venues/1", params={"fields": "name"})
+
+        self.assertEqual(response.json(), {"id": ticket["id"], "price": 10.5})
+        self.assertEqual(cached.json(), {"id": 1, "name": "Hall"})
+        not_modified = self.client.get(
+            f"/tickets/{ticket['id']}", params={"fields": "price"}, headers={"If-None-Match": response.headers["ETag"]})
+        self.assertEqual(not_modified.status_code, 304)
+
+    def test_unknown_field_is_400(self):
+        self.assertEqual(self.client.get("/attendees/", params={"fields": "password"}).status_code, 400)
+        self.assertEqual(self.client.get("/events/1", params={"fields": "nope"}).status_code, 400)
+
+    def test_export_fields(self):
+        self.seed_event()
+        lines = self.client.get("/events/export", params={"format": "csv", "fields": "title"}).text.splitlines()
+        self.assertEqual(lines, ["id,title", "1,Concert"])
+
+
+class TestCompression(SQLiteTestCase):
+
+    def test_large_list_gzipped(self):
+        self.client.post("/venues/bulk", json=[{"name": f"Venue {index}", "address": "x" * 50} for index in range(50)])
+
+        compressed = self.client.get("/venues/", params={"limit": 50}, headers={"Accept-Encoding": "gzip"})
+        small = self.client.get("/venues/1", headers={"Accept-Encoding": "gzip"})
+
+        self.assertEqual(compressed.headers["content-encoding"], "gzip")
+        self.assertEqual(len(compressed.json()["items"]), 50)
+        self.assertNotIn("content-encoding", small.headers)
+
+    def test_accept_encoding(self):
+        self.assertTrue(_accepts("gzip, deflate, br", "br"))
+        self.assertFalse(_accepts("gzip, br;q=0", "br"))
+        self.assertFalse(_accepts("gzip", "br"))
+
+
+if __name__ == "__main__":
+    unittest.main()
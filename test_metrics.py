@@ -0,0 +1,125 @@
+import unittest
+from dataclasses import replace
+from unittest.mock import MagicMock, patch
+
+from fastapi.testclient import TestClient
+
+import backends
+import db
+from app import app
+from backends import SQLiteBackend
+from cache import entity_cache
+from config import settings
+from metrics import BACKGROUND, InstrumentedCursor, Metrics, RequestMetrics, metrics, statement_label
+
+
+class TestStatementLabel(unittest.TestCase):
+
+    def test_in_lists_collapse(self):
+        self.assertEqual(
+            statement_label("SELECT id FROM t WHERE id IN (?, ?, ?)"),
+            statement_label("SELECT id FROM t WHERE id IN (?,?)"))
+
+    def test_values_rows_collapse(self):
+        label = statement_label("INSERT INTO t (a, b) SELECT a, b FROM (VALUES (?, ?, ?), (?, ?, ?),\n (?, ?, ?))")
+        self.assertEqual(label, "INSERT INTO t (a, b) SELECT a, b FROM (VALUES (?...), ...)")
+
+    def test_projection_collapses(self):
+        self.assertEqual(statement_label("SELECT id, name FROM t WHERE id=?"), "SELECT * FROM t WHERE id=?")
+        self.assertEqual(statement_label("SELECT TOP (?) b, a FROM t"), "SELECT TOP (?) * FROM t")
+        self.assertEqual(statement_label("SELECT DISTINCT a FROM t"), "SELECT DISTINCT * FROM t")
+
+
+class TestRender(unittest.TestCase):
+
+    def test_histogram_is_cumulative(self):
+        registry = Metrics()
+        current = RequestMetrics()
+        current.phases.append(("execute", 'SELECT "x"', 0.0003))
+        current.rows.append(('SELECT "x"', 4))
+        registry.record_request("GET", "/a/{id}", 200, 0.002, current)
+        registry.record_request("GET", "/a/{id}", 404, 20.0, RequestMetrics())
+
+        text = registry.render()
+
+        self.assertIn('app_request_duration_seconds_bucket{method="GET",route="/a/{id}",le="0.0025"} 1', text)
+        self.assertIn('app_request_duration_seconds_bucket{method="GET",route="/a/{id}",le="+Inf"} 2', text)
+        self.assertIn('app_request_duration_seconds_count{method="GET",route="/a/{id}"} 2', text)
+        self.assertIn('app_requests_total{method="GET",route="/a/{id}",status="404"} 1', text)
+        self.assertIn('app_db_rows_total{route="/a/{id}",statement="SELECT \\"x\\""} 4', text)
+
+
+class TestInstrumentedCursor(unittest.TestCase):
+
+    def setUp(self):
+        metrics.clear()
+
+    def test_outside_request_goes_to_background(self):
+        raw = MagicMock()
+        raw.fetchall.return_value = [(1,), (2,)]
+        cursor = InstrumentedCursor(raw)
+
+        cursor.execute("SELECT id FROM t")
+        cursor.fetchall()
+
+        self.assertEqual(metrics.rows[(BACKGROUND, "SELECT * FROM t")], 2)
+        self.assertIn((BACKGROUND, "execute", "SELECT * FROM t"), metrics.phases)
+
+    def test_attributes_reach_driver_cursor(self):
+        raw = MagicMock()
+        cursor = InstrumentedCursor(raw)
+        cursor.fast_executemany = True
+        self.assertIs(raw.fast_executemany, True)
+
+    def test_slow_query_logged(self):
+        cursor = InstrumentedCursor(MagicMock())
+        with patch("metrics.settings", replace(settings, slow_query_threshold=0)):
+            with self.assertLogs("metrics", "WARNING") as logs:
+                cursor.execute("SELECT 1")
+        self.assertIn("slow query", logs.output[0])
+        self.assertEqual(metrics.slow_queries, 1)
+
+
+class TestMetricsEndpoint(unittest.TestCase):
+
+    def setUp(self):
+        self.backend = SQLiteBackend()
+        self.previous = backends.set_backend(self.backend)
+        db.init_pool(**self.backend.pool_overrides())
+        entity_cache.clear()
+        metrics.clear()
+        self.client = TestClient(app)
+
+    def tearDown(self):
+        db.close_pool()
+        self.backend.close()
+        backends.set_backend(self.previous)
+
+    def test_phases_by_route_and_statement(self):
+        for name in ("A", "B", "C"):
+            self.client.post("/venues/", json={"name": name, "address": None})
+        self.client.get("/venues/")
+        self.client.get("/no-such-route")
+
+        text = self.client.get("/metrics").text
+
+        select = "SELECT * FROM venues ORDER BY id LIMIT ?"
+        self.assertIn(f'app_db_rows_total{{route="/venues/",statement="{select}"}} 3', text)
+        for phase in ("acquire", "execute", "fetch", "pydantic", "json"):
+            self.assertIn(f'app_phase_duration_seconds_count{{route="/venues/",phase="{phase}"', text)
+        self.assertIn('app_requests_total{method="POST",route="/venues/",status="200"} 3', text)
+        self.assertIn('route="<unmatched>",status="404"', text)
+        self.assertIn("app_db_connections_opened_total 1", text)
+
+    def test_fields_order_does_not_add_series(self):
+        self.client.post("/venues/", json={"name": "A", "address": None})
+        for fields in ("name,address", "address,name", "address"):
+            self.client.get("/venues/", params={"fields": fields})
+
+        statements = {statement for route, statement in metrics.rows if route == "/venues/"}
+        self.assertIn("SELECT * FROM venues ORDER BY id LIMIT ?", statements)
+        self.assertEqual(len([statement for statement in statements if statement.startswith("SELECT")]), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,52 @@
+import unittest
+
+import db
+import repository
+from test_backends import SQLiteTestCase
+
+
+class TestMultiGet(SQLiteTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client.post("/venues/bulk", json=[{"name": f"Venue {index}", "address": None} for index in range(1, 6)])
+
+    def test_request_order_and_missing(self):
+        response = self.client.get("/venues/", params={"ids": "4,99,2,4,1"})
+
+        self.assertEqual([item["name"] for item in response.json()["items"]], ["Venue 4", "Venue 2", "Venue 1"])
+        self.assertEqual(response.json()["missing"], [99])
+
+    def test_fields(self):
+        response = self.client.get("/venues/", params={"ids": "3", "fields": "name"})
+        self.assertEqual(response.json(), {"items": [{"id": 3, "name": "Venue 3"}], "missing": []})
+
+    def test_cached_rows_served_from_cache(self):
+        self.client.get("/venues/2")
+        with db.get_connection() as conn:
+            # Мимо API: кэш об удалении не знает
+            repository.venues.delete(conn, 2)
+
+        response = self.client.get("/venues/", params={"ids": "1,2,3"}).json()
+        self.assertEqual([item["id"] for item in response["items"]], [1, 2, 3])
+
+    def test_every_entity(self):
+        _, _, event, ticket = self.seed_event()
+        attendee = self.client.post("/attendees/", json={
+            "ticket_id": ticket["id"], "name": "Ann", "email": "ann@x"}).json()
+
+        for path, item_id in (
+            ("/organizers/", 1), ("/events/", event["id"]), ("/tickets/", ticket["id"]),
+            ("/attendees/", attendee["id"]),
+        ):
+            body = self.client.get(path, params={"ids": f"1000,{item_id}"}).json()
+            self.assertEqual(([item["id"] for item in body["items"]], body["missing"]), ([item_id], [1000]), path)
+
+    def test_bad_ids(self):
+        self.assertEqual(self.client.get("/venues/", params={"ids": "1,x"}).status_code, 400)
+        self.assertEqual(self.client.get("/venues/", params={"ids": ","}).status_code, 400)
+        self.assertEqual(self.client.get("/venues/", params={"ids": ",".join(map(str, range(1, 1002)))}).status_code, 400)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+import unittest
+from datetime import datetime
+from decimal import Decimal
+from unittest.mock import MagicMock
+
+import repository
+from pagination import InvalidPageRequest, decode_cursor, encode_cursor, keyset_condition, parse_order_by
+
+
+class TestCursor(unittest.TestCase):
+
+    def test_round_trip(self):
+        cursor = encode_cursor("-start_date", (datetime(2025, 5, 1, 18, 30), 42))
+        self.assertEqual(decode_cursor(cursor, "-start_date"), ("2025-05-01T18:30:00", 42))
+        cursor = encode_cursor("price", (Decimal("10.50"), 7))
+        self.assertEqual(decode_cursor(cursor, "price"), ("10.50", 7))
+
+    def test_cursor_bound_to_order(self):
+        cursor = encode_cursor("title", ("Concert", 3))
+        with self.assertRaises(InvalidPageRequest):
+            decode_cursor(cursor, "-title")
+
+    def test_garbage_cursor(self):
+        with self.assertRaises(InvalidPageRequest):
+            decode_cursor("not-a-cursor!", "id")
+
+    def test_order_by_whitelist(self):
+        self.assertEqual(parse_order_by("-title", ("id", "title")), ("title", True))
+        with self.assertRaises(InvalidPageRequest):
+            parse_order_by("description", ("id", "title"))
+
+
+class TestKeysetCondition(unittest.TestCase):
+
+    def test_by_id(self):
+        self.assertEqual(keyset_condition("id", False, 5, 5), ("id > ?", [5]))
+        self.assertEqual(keyset_condition("id", True, 5, 5), ("id < ?", [5]))
+
+    def test_nullable_column(self):
+        sql, params = keyset_condition("start_date", False, None, 9)
+        self.assertEqual(sql, "((start_date IS NULL AND id > ?) OR start_date IS NOT NULL)")
+        self.assertEqual(params, [9])
+        sql, params = keyset_condition("start_date", True, "2025-01-01", 9)
+        self.assertEqual(sql, "(start_date < ? OR (start_date = ? AND id < ?) OR start_date IS NULL)")
+        self.assertEqual(params, ["2025-01-01", "2025-01-01", 9])
+
+
+class TestRepositoryPage(unittest.TestCase):
+
+    def test_filters_and_keyset_pushed_into_sql(self):
+        conn = MagicMock()
+        cursor = conn.cursor.return_value
+        cursor.fetchall.return_value = [
+            (11, 3, "A", "a@example.com"),
+            (12, 3, "B", "b@example.com"),
+            (13, 3, "C", "c@example.com"),
+        ]
+
+        rows, last_key = repository.attendees.page(
+            conn, 2, order_by="name", after=("0", 10), filters={"ticket_id": 3})
+
+        cursor.execute.assert_called_once_with(
+            "SELECT TOP (?) id, ticket_id, name, email FROM attendees "
+            "WHERE ticket_id=? AND (name > ? OR (name = ? AND id > ?)) ORDER BY name, id",
+            3, 3, "0", "0", 10)
+        self.assertEqual([row["id"] for row in rows], [11, 12])
+        self.assertEqual(last_key, ("B", 12))
+
+    def test_last_page_has_no_key(self):
+        conn = MagicMock()
+        conn.cursor.return_value.fetchall.return_value = [(1, "Org", None)]
+        rows, last_key = repository.organizers.page(conn, 10)
+        self.assertEqual(len(rows), 1)
+        self.assertIsNone(last_key)
+
+    def test_unknown_filter_rejected(self):
+        with self.assertRaises(ValueError):
+            repository.tickets.page(MagicMock(), 10, filters={"price": 1})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+import threading
+import time
+import unittest
+from unittest.mock import MagicMock
+
+from pool import ConnectionPool, PoolTimeout
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = False
+        self.rollbacks = 0
+        self.broken = False
+
+    def cursor(self):
+        cursor = MagicMock()
+        if self.broken:
+            cursor.execute.side_effect = RuntimeError("connection is dead")
+        return cursor
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        self.rollbacks += 1
+
+    def close(self):
+        self.closed = True
+
+
+class TestConnectionPool(unittest.TestCase):
+
+    def make_pool(self, **kwargs):
+        self.opened = []
+
+        def connect():
+            conn = FakeConnection()
+            self.opened.append(conn)
+            return conn
+
+        return ConnectionPool(connect, **kwargs)
+
+    def test_prewarm_opens_min_size(self):
+        pool = self.make_pool(min_size=3, max_size=5)
+        self.assertEqual(pool.prewarm(), 3)
+        self.assertEqual(pool.stats()["idle"], 3)
+        self.assertEqual(len(self.opened), 3)
+
+    def test_connection_is_reused(self):
+        pool = self.make_pool(min_size=0, max_size=2)
+        with pool.acquire() as conn:
+            first = conn.raw
+        with pool.acquire() as conn:
+            self.assertIs(conn.raw, first)
+        self.assertEqual(len(self.opened), 1)
+        # Незакоммиченная работа откатывается при возврате
+        self.assertEqual(first.rollbacks, 2)
+
+    def test_exception_inside_with_returns_connection(self):
+        pool = self.make_pool(min_size=0, max_size=1)
+        with self.assertRaises(ValueError):
+            with pool.acquire():
+                raise ValueError("boom")
+        stats = pool.stats()
+        self.assertEqual(stats["in_use"], 0)
+        self.assertEqual(stats["idle"], 1)
+
+    def test_timeout_when_exhausted(self):
+        pool = self.make_pool(min_size=0, max_size=1, timeout=0.05)
+        held = pool.acquire()
+        with self.assertRaises(PoolTimeout):
+            pool.acquire()
+        self.assertEqual(pool.stats()["timeouts"], 1)
+        held.close()
+        pool.acquire().close()
+
+    def test_waiter_gets_released_connection(self):
+        pool = self.make_pool(min_size=0, max_size=1, timeout=2)
+        held = pool.acquire()
+        threading.Timer(0.05, held.close).start()
+        with pool.acquire() as conn:
+            self.assertIs(conn.raw, held.raw)
+        self.assertGreater(pool.stats()["wait_max_ms"], 0)
+
+    def test_max_lifetime_recycles(self):
+        pool = self.make_pool(min_size=0, max_size=1, max_lifetime=0.01)
+        with pool.acquire() as conn:
+            first = conn.raw
+        time.sleep(0.02)
+        with pool.acquire() as conn:
+            self.assertIsNot(conn.raw, first)
+        self.assertTrue(first.closed)
+        self.assertEqual(pool.stats()["recycled"], 1)
+
+    def test_broken_connection_is_replaced_on_checkout(self):
+        pool = self.make_pool(min_size=1, max_size=1, health_check_idle=0)
+        pool.prewarm()
+        self.opened[0].broken = True
+        with pool.acquire() as conn:
+            self.assertIsNot(conn.raw, self.opened[0])
+        self.assertEqual(pool.stats()["discarded"], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
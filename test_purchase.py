@@ -0,0 +1,229 @@
+import asyncio
+import threading
+import time
+import unittest
+from dataclasses import replace
+from unittest.mock import MagicMock, patch
+
+from fastapi.testclient import TestClient
+
+import db
+import purchase
+from app import app
+from config import settings
+from purchase import HoldMismatch, SoldOut, confirm_hold, create_hold, purchase_batch
+
+
+class FakeStore:
+    """Таблицы tickets и attendees в памяти. Каждый оператор атомарен, как
+    UPDATE одной строки в СУБД; незакоммиченное откатывается по журналу."""
+
+    def __init__(self, quantities):
+        self.lock = threading.Lock()
+        self.quantities = dict(quantities)
+        self.attendees = {}
+        self.next_id = 1
+
+
+class FakeConnection:
+
+    def __init__(self, store):
+        self.store = store
+        self.undo = []
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        self.undo.clear()
+
+    def rollback(self):
+        with self.store.lock:
+            for action in reversed(self.undo):
+                action()
+        self.undo.clear()
+
+    def close(self):
+        pass
+
+
+class FakeCursor:
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.rows = []
+
+    def execute(self, sql, *params):
+        store = self.conn.store
+        # Даём другим потокам вклиниться между операторами одной транзакции
+        time.sleep(0.0002)
+        with store.lock:
+            if sql == purchase._sql("decrement"):
+                quantity, ticket_id, _ = params
+                current = store.quantities.get(ticket_id)
+                if current is None or current < quantity:
+                    self.rows = []
+                    return
+                store.quantities[ticket_id] = current - quantity
+                self.conn.undo.append(lambda: store.quantities.__setitem__(
+                    ticket_id, store.quantities[ticket_id] + quantity))
+                self.rows = [(current - quantity,)]
+            elif sql == purchase._AVAILABLE_SQL:
+                current = store.quantities.get(params[0])
+                self.rows = [] if current is None else [(current,)]
+            elif sql.startswith("INSERT INTO attendees"):
+                self.rows = []
+                for start in range(0, len(params), 4):
+                    ticket_id, name, email, _ = params[start:start + 4]
+                    new_id = store.next_id
+                    store.next_id += 1
+                    store.attendees[new_id] = (ticket_id, name, email)
+                    self.conn.undo.append(lambda new_id=new_id: store.attendees.pop(new_id))
+                    self.rows.append((new_id,))
+            else:
+                raise AssertionError(f"unexpected SQL: {sql}")
+
+    def fetchone(self):
+        return self.rows.pop(0) if self.rows else None
+
+    def fetchall(self):
+        rows, self.rows = self.rows, []
+        return rows
+
+    def close(self):
+        pass
+
+
+def people(count, prefix="p"):
+    return [{"name": f"{prefix}{index}", "email": f"{prefix}{index}@x"} for index in range(count)]
+
+
+class TestPurchaseStress(unittest.TestCase):
+
+    def setUp(self):
+        self.store = FakeStore({1: 500, 2: 50})
+        db.init_pool(lambda: FakeConnection(self.store), min_size=0, max_size=16, health_check_idle=3600)
+        purchase.purchase_queue = purchase.PurchaseQueue(settings.purchase_batch_max)
+
+    def tearDown(self):
+        db.close_pool()
+
+    def assert_not_oversold(self, ticket_id, initial, sold):
+        remaining = self.store.quantities[ticket_id]
+        stored = sum(1 for row in self.store.attendees.values() if row[0] == ticket_id)
+        self.assertGreaterEqual(remaining, 0)
+        self.assertEqual(sold, initial - remaining)
+        self.assertEqual(stored, sold)
+
+    def test_queue_never_oversells(self):
+        async def buy(index):
+            try:
+                return await purchase.purchase(1, people(1 + index % 3, f"u{index}-"))
+            except SoldOut:
+                return None
+
+        async def scenario():
+            return await asyncio.gather(*(buy(index) for index in range(2000)))
+
+        started = time.perf_counter()
+        results = asyncio.run(scenario())
+        elapsed = time.perf_counter() - started
+
+        sold = sum(len(result) for result in results if result)
+        self.assert_not_oversold(1, 500, sold)
+        # Остаток меньше любой покупки: раздали всё, что можно
+        self.assertEqual(self.store.quantities[1], 0)
+        stats = purchase.purchase_queue.stats()
+        self.assertEqual(stats["purchases"] + stats["sold_out"], 2000)
+        # Покупки объединялись в пачки, а не шли по транзакции на каждую
+        self.assertLess(stats["batches"], 200)
+        self.assertGreater(2000 / elapsed, 1000)
+
+    def test_direct_path_threads_never_oversell(self):
+        sold = []
+        lock = threading.Lock()
+
+        def worker(number):
+            for index in range(50):
+                with db.get_connection() as conn:
+                    result = purchase_batch(conn, 2, [people(1 + index % 2, f"t{number}-{index}-")])[0]
+                if isinstance(result, list):
+                    with lock:
+                        sold.append(len(result))
+
+        threads = [threading.Thread(target=worker, args=(number,)) for number in range(16)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assert_not_oversold(2, 50, sum(sold))
+
+    def test_batch_grants_remainder_in_queue_order(self):
+        self.store.quantities[1] = 3
+        conn = FakeConnection(self.store)
+
+        results = purchase_batch(conn, 1, [people(2, "a"), people(2, "b"), people(1, "c")])
+
+        self.assertEqual(len(results[0]), 2)
+        self.assertIsInstance(results[1], SoldOut)
+        self.assertEqual(len(results[2]), 1)
+        self.assertEqual(self.store.quantities[1], 0)
+
+    def test_missing_ticket(self):
+        conn = FakeConnection(self.store)
+        self.assertEqual(purchase_batch(conn, 99, [people(1)]), [None])
+
+    def test_direct_mode_raises_sold_out(self):
+        self.store.quantities[1] = 0
+        with patch("purchase.settings", replace(settings, purchase_queue_enabled=False)):
+            with self.assertRaises(SoldOut):
+                asyncio.run(purchase.purchase(1, people(1)))
+
+
+class TestHolds(unittest.TestCase):
+
+    def test_create_hold_sold_out(self):
+        conn = MagicMock()
+        cursor = conn.cursor.return_value
+        cursor.fetchone.side_effect = [None, (1,)]
+        with self.assertRaises(SoldOut):
+            create_hold(conn, 1, 2, 60)
+        conn.commit.assert_not_called()
+
+    def test_confirm_hold_checks_quantity(self):
+        conn = MagicMock()
+        conn.cursor.return_value.fetchone.return_value = (1, 3)
+        with self.assertRaises(HoldMismatch):
+            confirm_hold(conn, 5, people(2))
+        conn.rollback.assert_called_once()
+        conn.commit.assert_not_called()
+
+    def test_expired_hold_not_found(self):
+        conn = MagicMock()
+        conn.cursor.return_value.fetchone.return_value = None
+        self.assertIsNone(confirm_hold(conn, 5, people(1)))
+
+
+class TestPurchaseRoutes(unittest.TestCase):
+
+    def setUp(self):
+        self.client = TestClient(app)
+
+    @patch("db.get_connection")
+    def test_sold_out_is_409(self, mock_get_conn):
+        mock_conn = MagicMock()
+        mock_get_conn.return_value = mock_conn
+        mock_conn.__enter__.return_value = mock_conn
+        mock_conn.cursor.return_value.fetchone.side_effect = [None, (0,)]
+
+        response = self.client.post("/tickets/1/purchase", json={"attendees": [{"name": "A", "email": "a@x"}]})
+
+        self.assertEqual(response.status_code, 409)
+
+    def test_empty_purchase_rejected(self):
+        self.assertEqual(self.client.post("/tickets/1/purchase", json={"attendees": []}).status_code, 422)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,81 @@
+import asyncio
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import db
+from refdata import ReferenceData, build_snapshot, read_header, reference_data
+from test_backends import SQLiteTestCase
+
+
+class TestReferenceData(SQLiteTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "refdata.snap")
+        self.previous_path = reference_data.path
+        reference_data.path = self.path
+        reference_data.close()
+
+    def tearDown(self):
+        reference_data.path = self.previous_path
+        reference_data.close()
+        shutil.rmtree(self.directory)
+        super().tearDown()
+
+    def build(self, max_age=None):
+        with db.get_connection() as conn:
+            return build_snapshot(conn, self.path, max_age)
+
+    def test_writes_swap_versions_for_every_worker(self):
+        venue = self.client.post("/venues/", json={"name": "Hall", "address": "Street"}).json()
+        # Другой процесс хоста: своё отображение того же файла
+        worker = ReferenceData(self.path)
+        version = worker.stats()["version"]
+
+        self.client.put(f"/venues/{venue['id']}", json={"name": "Arena", "address": "Street"})
+
+        self.assertEqual(worker.get("venues", venue["id"])["name"], "Arena")
+        self.assertEqual(worker.version, version + 1)
+        self.assertEqual(worker.reloads, 2)
+        self.assertIsNone(worker.get("venues", 999))
+        self.assertIsNone(worker.get("events", venue["id"]))
+
+    def test_endpoints_read_without_db(self):
+        organizer = self.client.post("/organizers/", json={"name": "Org", "contact_info": "o@x"}).json()
+        other = self.client.post("/organizers/", json={"name": "Other", "contact_info": None}).json()
+        hits = reference_data.hits
+
+        self.assertEqual(self.client.get(f"/organizers/{organizer['id']}").json(), organizer)
+        batch = self.client.get(f"/organizers/?ids={other['id']},999,{organizer['id']}").json()
+        self.assertEqual(batch, {"items": [other, organizer], "missing": [999]})
+        self.assertEqual(reference_data.hits - hits, 3)
+
+        self.assertEqual(self.client.delete(f"/organizers/{organizer['id']}").status_code, 200)
+        self.assertEqual(self.client.get(f"/organizers/{organizer['id']}").status_code, 404)
+        self.assertEqual(self.client.get("/stats/refdata").json()["rows"], {"venues": 0, "organizers": 1})
+
+    def test_fresh_snapshot_is_not_rebuilt(self):
+        self.assertEqual(self.build(), 1)
+        self.assertIsNone(self.build(max_age=60))
+        self.assertEqual(self.build(max_age=0), 2)
+
+    def test_failed_build_falls_back_to_db(self):
+        venue = self.client.post("/venues/", json={"name": "Hall", "address": None}).json()
+        self.assertIsNotNone(reference_data.get("venues", venue["id"]))
+
+        with patch("refdata._encode_table", side_effect=RuntimeError("boom")):
+            asyncio.run(reference_data.refresh())
+
+        # Снимок помечен: процессы не читают данные, которые уже могли разойтись с БД
+        self.assertTrue(read_header(self.path).stale)
+        self.assertIsNone(reference_data.get("venues", venue["id"]))
+        self.assertEqual(reference_data.build_failed, 1)
+        self.assertEqual(self.client.get(f"/venues/{venue['id']}").json(), venue)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,139 @@
+import unittest
+from decimal import Decimal
+from unittest.mock import MagicMock, patch
+
+from fastapi.testclient import TestClient
+
+import repository
+from app import app
+from relations import event_detail, parse_include
+from test_backends import mock_connection
+
+
+EVENT = (1, "Concert", None, 10, 20, "2024-05-01", "2024-05-02")
+ORGANIZER = (10, "Org", "org@x")
+VENUE = (20, "Hall", "Street 1")
+
+
+class TestEventDetail(unittest.TestCase):
+
+    def test_single_joined_query(self):
+        conn = MagicMock()
+        cursor = conn.cursor.return_value
+        cursor.fetchall.return_value = [
+            EVENT + ORGANIZER + VENUE + (100, 1, Decimal("10.00"), "Standard", 50),
+            EVENT + ORGANIZER + VENUE + (101, 1, Decimal("30.00"), "VIP", 5),
+        ]
+
+        detail = event_detail(conn, 1)
+
+        cursor.execute.assert_called_once()
+        sql = cursor.execute.call_args[0][0]
+        self.assertIn("LEFT JOIN organizers o", sql)
+        self.assertIn("LEFT JOIN tickets t ON t.event_id = e.id", sql)
+        self.assertEqual(detail["organizer"], {"id": 10, "name": "Org", "contact_info": "org@x"})
+        self.assertEqual(detail["venue"]["address"], "Street 1")
+        self.assertEqual([ticket["id"] for ticket in detail["tickets"]], [100, 101])
+        self.assertEqual(detail["tickets_remaining"], 55)
+
+    def test_event_without_tickets(self):
+        conn = MagicMock()
+        conn.cursor.return_value.fetchall.return_value = [EVENT + ORGANIZER + VENUE + (None,) * 5]
+
+        detail = event_detail(conn, 1)
+
+        self.assertEqual(detail["tickets"], [])
+        self.assertEqual(detail["tickets_remaining"], 0)
+
+    def test_missing_event(self):
+        conn = MagicMock()
+        conn.cursor.return_value.fetchall.return_value = []
+        self.assertIsNone(event_detail(conn, 1))
+
+    def test_parse_include(self):
+        self.assertEqual(parse_include("venue, organizer,venue"), ("venue", "organizer"))
+        self.assertEqual(parse_include(None), ())
+        with self.assertRaises(ValueError):
+            parse_include("attendees")
+
+
+class TestFindIn(unittest.TestCase):
+
+    def test_deduplicates_and_chunks(self):
+        conn = MagicMock()
+        cursor = conn.cursor.return_value
+        cursor.fetchall.return_value = []
+        with patch("repository.MAX_PARAMS", 2):
+            repository.organizers.find_in(conn, "id", [1, 2, 2, 3])
+        self.assertEqual(cursor.execute.call_count, 2)
+        self.assertEqual(cursor.execute.call_args_list[0][0][1:], (1, 2))
+
+    def test_rejects_unknown_column(self):
+        with self.assertRaises(ValueError):
+            repository.tickets.find_in(MagicMock(), "price", [1])
+
+
+class TestEventRoutes(unittest.TestCase):
+
+    def setUp(self):
+        self.client = TestClient(app)
+
+    @patch("db.get_connection")
+    def test_full_endpoint(self, mock_get_conn):
+        mock_conn, cursor = mock_connection(mock_get_conn)
+        cursor.fetchall.return_value = [EVENT + ORGANIZER + VENUE + (100, 1, Decimal("10.00"), "Standard", 50)]
+
+        response = self.client.get("/events/1/full")
+
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data["organizer"]["name"], "Org")
+        self.assertEqual(data["tickets"][0]["price"], 10.0)
+        self.assertIn("ETag", response.headers)
+        mock_get_conn.assert_called_once()
+
+    @patch("db.get_connection")
+    def test_full_endpoint_not_found(self, mock_get_conn):
+        _, cursor = mock_connection(mock_get_conn)
+        cursor.fetchall.return_value = []
+        self.assertEqual(self.client.get("/events/1/full").status_code, 404)
+
+    @patch("db.get_connection")
+    def test_list_include_batches_related_rows(self, mock_get_conn):
+        _, cursor = mock_connection(mock_get_conn)
+        second = (2, "Play", None, 10, 20, None, None)
+        cursor.fetchall.side_effect = [
+            [EVENT, second],
+            [ORGANIZER],
+            [VENUE],
+            [(100, 1, Decimal("10.00"), "Standard", 50)],
+        ]
+
+        response = self.client.get("/events/?include=organizer,venue,tickets")
+
+        self.assertEqual(response.status_code, 200)
+        items = response.json()["items"]
+        # Страница + по одному запросу на каждую связь, независимо от числа событий
+        self.assertEqual(cursor.execute.call_count, 4)
+        self.assertIn("WHERE id IN (?)", cursor.execute.call_args_list[1][0][0])
+        self.assertIn("WHERE event_id IN (?, ?)", cursor.execute.call_args_list[3][0][0])
+        self.assertEqual(items[1]["organizer"]["name"], "Org")
+        self.assertEqual(items[0]["tickets"][0]["id"], 100)
+        self.assertEqual(items[1]["tickets"], [])
+
+    @patch("db.get_connection")
+    def test_list_without_include_has_no_relations(self, mock_get_conn):
+        _, cursor = mock_connection(mock_get_conn)
+        cursor.fetchall.return_value = [EVENT]
+
+        item = self.client.get("/events/").json()["items"][0]
+
+        self.assertNotIn("organizer", item)
+        self.assertIsNone(item["description"])
+
+    def test_unknown_include(self):
+        self.assertEqual(self.client.get("/events/?include=attendees").status_code, 400)
+
+
+if __name__ == "__main__":
+    unittest.main()
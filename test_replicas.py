@@ -0,0 +1,103 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+
+from fastapi.testclient import TestClient
+
+import db
+from app import app
+from backends import SQLiteBackend
+from test_backends import SQLiteTestCase
+
+
+class BrokenBackend(SQLiteBackend):
+
+    def connect(self):
+        raise sqlite3.OperationalError("unable to open database file")
+
+
+class TestReadReplicas(SQLiteTestCase):
+    """Основная БД и реплика — два файла SQLite; репликации между ними нет,
+    поэтому по данным видно, куда ушло чтение."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "primary.db")
+        super().setUp()
+        self.replica = SQLiteBackend(os.path.join(self.tmp.name, "replica.db"))
+        db.init_replicas([self.replica])
+        # Клиент без куки: ещё ничего не писал
+        self.reader = TestClient(app)
+
+    def tearDown(self):
+        super().tearDown()
+        self.replica.close()
+        self.tmp.cleanup()
+
+    def names(self, client, **kwargs):
+        return [item["name"] for item in client.get("/organizers/", **kwargs).json()["items"]]
+
+    def test_reads_from_replica_writes_to_primary(self):
+        response = self.client.post("/organizers/", json={"name": "Org"})
+
+        self.assertIn("read_primary_until", response.cookies)
+        # Писавший клиент видит свою запись, остальные читают отстающую реплику
+        self.assertEqual(self.names(self.client), ["Org"])
+        self.assertEqual(self.names(self.reader), [])
+        self.assertEqual(self.names(self.reader, headers={"X-Read-Primary": "1"}), ["Org"])
+        self.assertEqual(self.names(self.reader, headers={"Cookie": "read_primary_until=1"}), [])
+
+        conn = self.replica.connect()
+        conn.raw.execute("INSERT INTO organizers (name) VALUES ('Org')")
+        conn.close()
+        self.assertEqual(self.names(self.reader), ["Org"])
+        stats = self.client.get("/stats/replicas").json()
+        self.assertEqual(stats["replicas"]["replica1"]["served"], 3)
+
+    def test_sticky_client_bypasses_cache_warmed_from_replica(self):
+        organizer = self.client.post("/organizers/", json={"name": "Old"}).json()
+        conn = self.replica.connect()
+        conn.raw.execute("INSERT INTO organizers (id, name) VALUES (?, 'Old')", (organizer["id"],))
+        conn.close()
+        # Реплика отстаёт: изменения ещё нет
+        self.client.put(f"/organizers/{organizer['id']}", json={"name": "New"})
+
+        self.assertEqual(self.reader.get(f"/organizers/{organizer['id']}").json()["name"], "Old")
+        self.assertEqual(self.client.get(f"/organizers/{organizer['id']}").json()["name"], "New")
+        batch = self.client.get(f"/organizers/?ids={organizer['id']}").json()
+        self.assertEqual([item["name"] for item in batch["items"]], ["New"])
+
+    def test_lagging_replica_row_is_not_cached_after_write(self):
+        organizer = self.client.post("/organizers/", json={"name": "Old"}).json()
+        conn = self.replica.connect()
+        conn.raw.execute("INSERT INTO organizers (id, name) VALUES (?, 'Old')", (organizer["id"],))
+        conn.close()
+        self.client.put(f"/organizers/{organizer['id']}", json={"name": "New"})
+
+        self.assertEqual(self.reader.get(f"/organizers/{organizer['id']}").json()["name"], "Old")
+        # Реплика догнала primary: старая строка не должна остаться в кэше на весь TTL
+        conn = self.replica.connect()
+        conn.raw.execute("UPDATE organizers SET name = 'New' WHERE id = ?", (organizer["id"],))
+        conn.close()
+        self.assertEqual(self.reader.get(f"/organizers/{organizer['id']}").json()["name"], "New")
+
+    def test_failover_to_primary(self):
+        db.init_replicas([BrokenBackend(os.path.join(self.tmp.name, "missing.db")), self.replica])
+        self.client.post("/organizers/", json={"name": "Org"})
+
+        self.assertEqual(self.names(self.reader), [])
+        self.assertEqual(self.names(self.reader), [])
+        stats = self.client.get("/stats/replicas").json()
+        self.assertFalse(stats["replicas"]["replica1"]["healthy"])
+        self.assertEqual(stats["replicas"]["replica1"]["failures"], 1)
+        self.assertEqual(stats["replicas"]["replica2"]["served"], 2)
+
+        db.init_replicas([BrokenBackend(os.path.join(self.tmp.name, "missing.db"))])
+        # Живых реплик нет — чтение из основной БД
+        self.assertEqual(self.names(self.reader), ["Org"])
+        self.assertEqual(self.client.get("/stats/replicas").json()["fallbacks"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
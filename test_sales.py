@@ -0,0 +1,91 @@
+import asyncio
+import unittest
+
+import db
+from sales import sales_stats
+from test_backends import SQLiteTestCase
+
+
+class TestSalesStats(SQLiteTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.window = sales_stats.window
+        # Пересчёт — только явным flush или при чтении после window = 0
+        sales_stats.window = 60
+        self.organizer, _, self.event, self.ticket = self.seed_event(quantity=10)
+        self.vip = self.client.post("/tickets/", json={
+            "event_id": self.event["id"], "price": 50, "ticket_type": "VIP", "quantity": 5}).json()
+
+    def tearDown(self):
+        sales_stats.window = self.window
+        super().tearDown()
+
+    def buy(self, ticket, *names):
+        response = self.client.post(f"/tickets/{ticket['id']}/purchase", json={
+            "attendees": [{"name": name, "email": f"{name}@x"} for name in names]})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def read(self, path):
+        # Накопленные изменения пересчитываются при чтении
+        sales_stats.window = 0
+        try:
+            return self.client.get(path)
+        finally:
+            sales_stats.window = 60
+
+    def test_purchases_and_refunds(self):
+        guests = self.buy(self.ticket, "ann", "bob", "eve")
+        self.buy(self.vip, "vip")
+        self.assertEqual(self.client.delete(f"/attendees/{guests[0]['id']}").status_code, 200)
+        flushes = sales_stats.flushes
+
+        stats = self.read(f"/events/{self.event['id']}/stats").json()
+
+        self.assertEqual(stats, {
+            "event_id": self.event["id"], "organizer_id": self.organizer["id"], "ticket_types": 2,
+            "tickets_remaining": 11, "tickets_sold": 3, "revenue": 71.0})
+        # Все записи — один пересчёт
+        self.assertEqual(sales_stats.flushes - flushes, 1)
+        organizer = self.read(f"/organizers/{self.organizer['id']}/stats").json()
+        self.assertEqual((organizer["events"], organizer["tickets_sold"], organizer["revenue"]), (1, 3, 71.0))
+
+    def test_event_moved_to_another_organizer(self):
+        self.buy(self.vip, "vip")
+        other = self.client.post("/organizers/", json={"name": "Other", "contact_info": None}).json()
+        event = {key: value for key, value in self.event.items() if key != "id"}
+        self.client.put(f"/events/{self.event['id']}", json={**event, "organizer_id": other["id"]})
+
+        moved = self.read(f"/organizers/{other['id']}/stats").json()
+        previous = self.read(f"/organizers/{self.organizer['id']}/stats").json()
+
+        self.assertEqual((moved["events"], moved["tickets_remaining"], moved["revenue"]), (1, 14, 50.0))
+        self.assertEqual((previous["events"], previous["tickets_sold"], previous["revenue"]), (0, 0, 0.0))
+        self.assertEqual(self.client.get("/events/999/stats").status_code, 404)
+        self.assertEqual(self.client.get("/organizers/999/stats").status_code, 404)
+
+    def test_reconcile_reports_and_repairs_drift(self):
+        self.buy(self.ticket, "ann")
+        asyncio.run(sales_stats.flush())
+        with db.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("UPDATE event_stats SET tickets_sold = 99 WHERE event_id = ?", self.event["id"])
+            cursor.execute("DELETE FROM organizer_stats")
+            conn.commit()
+
+        report = self.client.post("/stats/sales/reconcile").json()
+
+        self.assertEqual((report["events"], report["events_drifted"]), (1, 1))
+        self.assertEqual((report["organizers"], report["organizers_drifted"]), (1, 1))
+        sample = report["samples"]["events"][0]
+        self.assertEqual((sample["stored"]["tickets_sold"], sample["actual"]["tickets_sold"]), (99, 1))
+        self.assertIsNone(report["samples"]["organizers"][0]["stored"])
+        self.assertEqual(self.client.get(f"/events/{self.event['id']}/stats").json()["tickets_sold"], 1)
+        again = self.client.post("/stats/sales/reconcile").json()
+        self.assertEqual((again["events_drifted"], again["organizers_drifted"]), (0, 0))
+        self.assertEqual(self.client.get("/stats/sales").json()["last_reconcile"], again)
+
+
+if __name__ == "__main__":
+    unittest.main()
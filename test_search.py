@@ -0,0 +1,139 @@
+import base64
+import json
+import unittest
+
+from search import SearchIndex, event_index, tokenize
+from test_backends import SQLiteTestCase
+
+
+def indexed(*events):
+    index = SearchIndex()
+    index.rebuild((doc_id, title, description) for doc_id, (title, description) in enumerate(events, 1))
+    return index
+
+
+def ids(hits):
+    return [doc_id for doc_id, _ in hits]
+
+
+class TestTokenize(unittest.TestCase):
+
+    def test_words_casefolded(self):
+        self.assertEqual(tokenize("Rock-Концерт, 2024!"), ["rock", "концерт", "2024"])
+        self.assertEqual(tokenize(None), [])
+
+
+class TestSearchIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.index = indexed(
+            ("Jazz night", "Live jazz and blues"),
+            ("Rock concert", "Loud guitars"),
+            ("Open air", "Jazz, rock and pop on the lake"),
+            ("Jazz festival", None),
+        )
+
+    def test_title_outranks_description(self):
+        hits, _ = self.index.search("rock ", 10)
+        self.assertEqual(ids(hits), [2, 3])
+        self.assertGreater(hits[0][1], hits[1][1])
+
+    def test_all_words_required(self):
+        self.assertEqual(ids(self.index.search("jazz rock ", 10)[0]), [3])
+        self.assertEqual(self.index.search("jazz opera ", 10)[0], [])
+
+    def test_last_word_is_prefix(self):
+        self.assertEqual(sorted(ids(self.index.search("fest", 10)[0])), [4])
+        self.assertEqual(sorted(ids(self.index.search("ja", 10)[0])), [1, 3, 4])
+        self.assertEqual(self.index.search("ja ", 10)[0], [])
+
+    def test_pagination(self):
+        first, after = self.index.search("jazz", 2)
+        second, last = self.index.search("jazz", 2, after)
+
+        self.assertEqual(len(first), 2)
+        self.assertIsNone(last)
+        self.assertEqual(sorted(ids(first + second)), [1, 3, 4])
+
+    def test_incremental_updates(self):
+        self.index.upsert(5, {"title": "Opera gala", "description": "Jazz free"})
+        self.index.upsert(2, {"title": "Opera premiere", "description": None})
+        self.index.remove(1)
+
+        self.assertEqual(sorted(ids(self.index.search("opera ", 10)[0])), [2, 5])
+        self.assertEqual(ids(self.index.search("rock ", 10)[0]), [3])
+        self.assertNotIn(1, ids(self.index.search("jazz", 10)[0]))
+        self.assertNotIn("guitars", self.index.terms)
+        stats = self.index.stats()
+        self.assertEqual(stats["documents"], 4)
+        self.assertGreater(stats["memory_bytes"], 0)
+
+    def test_changes_during_rebuild_survive(self):
+        def rows():
+            yield 1, "Old title", None
+            self.index.upsert(1, {"title": "New title"})
+            self.index.upsert(9, {"title": "Added meanwhile"})
+            yield 2, "Other", None
+
+        self.index.rebuild(rows())
+
+        self.assertEqual(ids(self.index.search("new ", 10)[0]), [1])
+        self.assertEqual(self.index.search("old ", 10)[0], [])
+        self.assertEqual(ids(self.index.search("meanwhile", 10)[0]), [9])
+
+
+class TestSearchRoute(SQLiteTestCase):
+
+    def setUp(self):
+        super().setUp()
+        event_index.rebuild([])
+
+    def test_ranked_paginated_results(self):
+        organizer, venue, *_ = self.seed_event()
+        self.client.post("/events/bulk", json=[
+            {"title": f"Jazz evening {index}", "organizer_id": organizer["id"], "venue_id": venue["id"]}
+            for index in range(3)])
+
+        first = self.client.get("/events/search", params={"q": "jaz", "limit": 2}).json()
+        second = self.client.get("/events/search", params={
+            "q": "jaz", "limit": 2, "after": first["next_cursor"]}).json()
+
+        self.assertEqual([item["title"] for item in first["items"]], ["Jazz evening 0", "Jazz evening 1"])
+        self.assertEqual([item["id"] for item in second["items"]], [4])
+        self.assertIsNone(second["next_cursor"])
+
+    def test_invalid_cursor_is_400(self):
+        def search(key):
+            cursor = base64.urlsafe_b64encode(json.dumps(key).encode()).decode()
+            return self.client.get("/events/search", params={"q": "jaz", "after": cursor})
+
+        for key in (["relevance", "x", 1], ["relevance", None, 1], ["relevance", 1.5, True]):
+            response = search(key)
+            self.assertEqual((response.status_code, response.json()["detail"]), (400, "Invalid cursor"), key)
+        self.assertEqual(search(["relevance", 1.5]).status_code, 400)
+
+    def test_index_follows_writes(self):
+        organizer, venue, *_ = self.seed_event()
+        body = {"organizer_id": organizer["id"], "venue_id": venue["id"]}
+        event = self.client.post("/events/", json={"title": "Chamber concert", **body}).json()
+
+        self.client.put(f"/events/{event['id']}", json={"title": "Poetry slam", **body})
+        self.assertEqual(len(self.client.get("/events/search", params={"q": "concert "}).json()["items"]), 1)
+        self.assertEqual(len(self.client.get("/events/search", params={"q": "slam"}).json()["items"]), 1)
+
+        self.client.delete(f"/events/{event['id']}")
+        self.assertEqual(self.client.get("/events/search", params={"q": "slam"}).json()["items"], [])
+
+    def test_not_ready_is_503(self):
+        event_index.ready = False
+        try:
+            response = self.client.get("/events/search", params={"q": "x"})
+        finally:
+            event_index.ready = True
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.headers["Retry-After"], "1")
+
+
+if __name__ == "__main__":
+    unittest.main()
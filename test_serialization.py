@@ -0,0 +1,91 @@
+import json
+import unittest
+from dataclasses import replace
+from decimal import Decimal
+from unittest.mock import patch
+
+from fastapi.testclient import TestClient
+
+from app import EventExpanded, TicketRead, app
+from config import settings
+from serialization import float_columns, page_body, related_models
+from test_backends import SQLiteTestCase, mock_connection
+
+
+TICKET_ROWS = [(1, 3, Decimal("10.50"), "Standard", 100), (2, 3, 25, "VIP", 5)]
+
+
+class TestPageBody(unittest.TestCase):
+
+    def test_float_columns(self):
+        self.assertEqual(float_columns(TicketRead), ("price",))
+
+    def test_matches_pydantic_output(self):
+        rows = [dict(zip(("id", "event_id", "price", "ticket_type", "quantity"), row)) for row in TICKET_ROWS]
+        expected = [TicketRead(**row).model_dump(mode="json") for row in rows]
+
+        body = json.loads(page_body(rows, "abc", TicketRead))
+
+        self.assertEqual(body, {"items": expected, "next_cursor": "abc"})
+        self.assertIsInstance(body["items"][1]["price"], float)
+
+    def test_nested_relations_match_pydantic_output(self):
+        self.assertEqual([name for name, _ in related_models(EventExpanded)], ["organizer", "venue", "tickets"])
+        tickets = [dict(zip(("id", "event_id", "price", "ticket_type", "quantity"), row)) for row in TICKET_ROWS]
+        rows = [{"id": 3, "title": "T", "description": None, "organizer_id": 1, "venue_id": 2,
+                 "start_date": None, "end_date": None, "tickets": tickets}]
+        expected = [EventExpanded(**row).model_dump(mode="json", exclude_unset=True) for row in rows]
+
+        body = json.loads(page_body(rows, None, EventExpanded))
+
+        self.assertEqual(body["items"], expected)
+        self.assertIsInstance(body["items"][0]["tickets"][1]["price"], float)
+
+
+class TestFastIncludeRoute(SQLiteTestCase):
+
+    def get_events(self, fast, **params):
+        with patch("app.settings", replace(settings, fast_json=fast)):
+            return self.client.get("/events/", params={"include": "organizer,venue,tickets", **params}).json()
+
+    def test_same_wire_schema_with_includes(self):
+        _, _, event, _ = self.seed_event()
+        self.client.post("/tickets/", json={"event_id": event["id"], "price": 10, "ticket_type": "VIP", "quantity": 1})
+
+        fast = self.get_events(True)
+
+        self.assertEqual(fast, self.get_events(False))
+        self.assertEqual([ticket["price"] for ticket in fast["items"][0]["tickets"]], [10.5, 10.0])
+        sparse = self.get_events(False, fields="title")
+        self.assertIsInstance(sparse["items"][0]["tickets"][1]["price"], float)
+
+
+class TestFastListRoute(unittest.TestCase):
+
+    def setUp(self):
+        self.client = TestClient(app)
+
+    def get_tickets(self, mock_get_conn, fast, **kwargs):
+        _, cursor = mock_connection(mock_get_conn)
+        cursor.fetchall.return_value = list(TICKET_ROWS)
+        with patch("app.settings", replace(settings, fast_json=fast)):
+            return self.client.get("/tickets/", **kwargs)
+
+    @patch("db.get_connection")
+    def test_same_wire_schema(self, mock_get_conn):
+        fast = self.get_tickets(mock_get_conn, True)
+        slow = self.get_tickets(mock_get_conn, False)
+
+        self.assertEqual(fast.status_code, 200)
+        self.assertEqual(fast.headers["content-type"], "application/json")
+        self.assertEqual(fast.json(), slow.json())
+
+    @patch("db.get_connection")
+    def test_etag_round_trip(self, mock_get_conn):
+        etag = self.get_tickets(mock_get_conn, True).headers["ETag"]
+        response = self.get_tickets(mock_get_conn, True, headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 304)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,137 @@
+import unittest
+from datetime import datetime, timedelta, timezone
+
+from timeline import EventTimeline, event_timeline, naive_utc
+from test_backends import SQLiteTestCase
+
+
+def event(event_id, start, end=None, venue_id=1):
+    return {"id": event_id, "title": f"E{event_id}", "venue_id": venue_id, "organizer_id": 1,
+            "start_date": start, "end_date": end}
+
+
+def ids(rows):
+    return [row["id"] for row in rows]
+
+
+DAY = datetime(2025, 6, 1)
+
+
+class TestEventTimeline(unittest.TestCase):
+
+    def setUp(self):
+        self.timeline = EventTimeline()
+        self.timeline.rebuild([
+            event(1, DAY + timedelta(hours=10), DAY + timedelta(hours=12)),
+            event(2, DAY + timedelta(hours=14), DAY + timedelta(hours=16)),
+            event(3, DAY + timedelta(days=1), DAY + timedelta(days=3)),
+            event(4, DAY + timedelta(hours=11), venue_id=2),
+            # SQLite отдаёт даты строками
+            event(5, "2025-06-01T09:00:00", None),
+            event(6, None),
+        ])
+
+    def test_starting_in_order(self):
+        rows, last = self.timeline.starting(DAY, DAY + timedelta(days=1), 10)
+        self.assertEqual(ids(rows), [5, 1, 4, 2])
+        self.assertIsNone(last)
+        self.assertEqual(ids(self.timeline.starting(DAY, DAY + timedelta(days=7), 10, venue_id=2)[0]), [4])
+
+    def test_starting_pages(self):
+        first, after = self.timeline.starting(DAY, DAY + timedelta(days=7), 2)
+        second, last = self.timeline.starting(DAY, DAY + timedelta(days=7), 10, after=after)
+        self.assertEqual(ids(first) + ids(second), [5, 1, 4, 2, 3])
+        self.assertIsNone(last)
+
+    def test_overlapping(self):
+        def overlapping(start_hour, end_hour):
+            return ids(self.timeline.overlapping(
+                1, DAY + timedelta(hours=start_hour), DAY + timedelta(hours=end_hour), 10))
+
+        self.assertEqual(overlapping(11, 15), [1, 2])
+        self.assertEqual(overlapping(12, 14), [])
+        # Многодневное событие видно изнутри интервала
+        self.assertEqual(overlapping(40, 41), [3])
+        # Событие без end_date — точка
+        self.assertEqual(overlapping(9, 10), [5])
+
+    def test_incremental_updates(self):
+        self.timeline.upsert(1, event(1, DAY + timedelta(hours=20), DAY + timedelta(hours=21)))
+        self.timeline.upsert(7, event(7, DAY + timedelta(hours=12), DAY + timedelta(hours=13)))
+        self.timeline.remove(2)
+
+        rows, _ = self.timeline.starting(DAY, DAY + timedelta(days=1), 10, venue_id=1)
+        self.assertEqual(ids(rows), [5, 7, 1])
+        self.assertEqual(self.timeline.stats()["events"], 5)
+
+    def test_naive_utc(self):
+        aware = datetime(2025, 6, 1, 12, tzinfo=timezone(timedelta(hours=3)))
+        self.assertEqual(naive_utc(aware), datetime(2025, 6, 1, 9))
+
+
+class TestEventDates(SQLiteTestCase):
+
+    def setUp(self):
+        super().setUp()
+        event_timeline.rebuild([])
+        organizer, venue, *_ = self.seed_event()
+        self.body = {"organizer_id": organizer["id"], "venue_id": venue["id"]}
+
+    def create(self, title, start, end=None):
+        return self.client.post("/events/", json={
+            "title": title, "start_date": start, "end_date": end, **self.body})
+
+    def test_dates_typed(self):
+        created = self.create("Tz", "2025-06-01T12:00:00+03:00", "2025-06-01T14:00:00+03:00").json()
+        self.assertEqual(created["start_date"], "2025-06-01T09:00:00")
+        self.assertEqual(self.client.get(f"/events/{created['id']}").json()["end_date"], "2025-06-01T11:00:00")
+
+        self.assertEqual(self.create("Date only", "2025-06-02").status_code, 200)
+        self.assertEqual(self.create("Bad", "next week").status_code, 422)
+        self.assertEqual(self.create("Bad", "2025-06-02", "2025-06-01").status_code, 422)
+
+    def test_range_query(self):
+        for day in (1, 8, 15):
+            self.create(f"June {day}", f"2025-06-{day:02d}T18:00:00")
+
+        response = self.client.get("/events/", params={
+            "from": "2025-06-05", "to": "2025-06-20", "venue_id": self.body["venue_id"],
+            "order_by": "start_date", "limit": 1})
+        second = self.client.get("/events/", params={
+            "from": "2025-06-05", "to": "2025-06-20", "order_by": "start_date",
+            "after": response.json()["next_cursor"]})
+
+        self.assertEqual([item["title"] for item in response.json()["items"]], ["June 8"])
+        self.assertEqual([item["title"] for item in second.json()["items"]], ["June 15"])
+
+    def test_upcoming_from_memory(self):
+        now = datetime.utcnow()
+        soon = self.create("Soon", (now + timedelta(days=2)).isoformat()).json()
+        self.create("Later", (now + timedelta(days=20)).isoformat())
+        self.create("Past", (now - timedelta(days=1)).isoformat())
+
+        items = self.client.get("/events/upcoming").json()["items"]
+        self.assertEqual([item["title"] for item in items], ["Soon"])
+
+        self.client.delete(f"/events/{soon['id']}")
+        self.assertEqual(self.client.get("/events/upcoming", params={"days": 30}).json()["items"][0]["title"], "Later")
+
+    def test_venue_bookings(self):
+        self.create("Morning", "2025-06-01T09:00:00", "2025-06-01T12:00:00")
+        venue = self.body["venue_id"]
+
+        busy = self.client.get(f"/venues/{venue}/bookings", params={
+            "from": "2025-06-01T11:00:00", "to": "2025-06-01T13:00:00"}).json()
+        free = self.client.get(f"/venues/{venue}/bookings", params={
+            "from": "2025-06-01T12:00:00", "to": "2025-06-01T13:00:00"}).json()
+        inverted = self.client.get(f"/venues/{venue}/bookings", params={
+            "from": "2025-06-02", "to": "2025-06-01"})
+
+        self.assertFalse(busy["available"])
+        self.assertEqual([item["title"] for item in busy["bookings"]], ["Morning"])
+        self.assertTrue(free["available"])
+        self.assertEqual(inverted.status_code, 400)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,226 @@
+import logging
+import sys
+import threading
+import time
+from bisect import bisect_left, insort
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import repository
+
+
+logger = logging.getLogger(__name__)
+
+Key = Tuple[datetime, int]
+
+
+def naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """Даты в БД хранятся без зоны, в UTC (DATETIME2): aware-значения
+    клиентов приводятся к UTC и теряют tzinfo."""
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def _as_datetime(value: Any) -> Optional[datetime]:
+    # SQLite отдаёт даты строками ISO 8601
+    if isinstance(value, str):
+        return naive_utc(datetime.fromisoformat(value))
+    return naive_utc(value)
+
+
+class EventTimeline:
+    """События, упорядоченные по start_date, для горячих вопросов без похода
+    в БД: «что идёт на этой неделе» и «занята ли площадка в интервале».
+
+    by_start — отсортированный список ключей (start_date, id) всех событий с
+    датой начала, by_venue — такие же списки по площадкам. Строки событий
+    хранятся целиком: ответ собирается из памяти. Интервалы пересечения
+    ищутся по отсортированному списку площадки: событие, пересекающее
+    [start, end), начинается не раньше start - самая длинная бронь площадки.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._reset()
+        self.ready = False
+        self.building = False
+        self.rebuild_seconds: Optional[float] = None
+        self.rebuilt_at: Optional[float] = None
+        self.updates = 0
+        # Как в search.SearchIndex: изменения во время перестроения
+        # применяются поверх прочитанного из БД
+        self._during_build: Dict[int, Optional[Dict[str, Any]]] = {}
+
+    def _reset(self) -> None:
+        self.rows: Dict[int, Dict[str, Any]] = {}
+        self.by_start: List[Key] = []
+        self.by_venue: Dict[int, List[Key]] = {}
+        self.longest: Dict[int, timedelta] = {}
+
+    # --- Изменения ---
+
+    def _add(self, row: Dict[str, Any]) -> None:
+        self._remove(row["id"])
+        start = _as_datetime(row.get("start_date"))
+        if start is None:
+            return
+        end = _as_datetime(row.get("end_date"))
+        row = dict(row, start_date=start, end_date=end)
+        key = (start, row["id"])
+        self.rows[row["id"]] = row
+        insort(self.by_start, key)
+        insort(self.by_venue.setdefault(row["venue_id"], []), key)
+        if end is not None and end - start > self.longest.get(row["venue_id"], timedelta(0)):
+            self.longest[row["venue_id"]] = end - start
+
+    def _remove(self, event_id: int) -> None:
+        row = self.rows.pop(event_id, None)
+        if row is None:
+            return
+        key = (row["start_date"], event_id)
+        del self.by_start[bisect_left(self.by_start, key)]
+        venue = self.by_venue[row["venue_id"]]
+        del venue[bisect_left(venue, key)]
+        if not venue:
+            del self.by_venue[row["venue_id"]]
+            self.longest.pop(row["venue_id"], None)
+        # longest не уменьшается до перестроения: поиск пересечений лишь
+        # просмотрит чуть больше кандидатов
+
+    def upsert(self, event_id: int, event: Dict[str, Any]) -> None:
+        row = dict(event, id=event_id)
+        with self._lock:
+            self.updates += 1
+            if self.building:
+                self._during_build[event_id] = row
+            self._add(row)
+
+    def upsert_many(self, events: List[Tuple[int, Dict[str, Any]]]) -> None:
+        for event_id, event in events:
+            self.upsert(event_id, event)
+
+    def remove(self, event_id: int) -> None:
+        with self._lock:
+            self.updates += 1
+            if self.building:
+                self._during_build[event_id] = None
+            self._remove(event_id)
+
+    def remove_many(self, event_ids: Iterable[int]) -> None:
+        for event_id in event_ids:
+            self.remove(event_id)
+
+    def rebuild(self, rows: Iterable[Dict[str, Any]]) -> None:
+        started = time.perf_counter()
+        fresh = EventTimeline()
+        with self._lock:
+            self.building = True
+            self._during_build = {}
+        try:
+            # Сортировка один раз вместо insort на каждую строку
+            for row in rows:
+                start = _as_datetime(row.get("start_date"))
+                if start is None:
+                    continue
+                end = _as_datetime(row.get("end_date"))
+                fresh.rows[row["id"]] = dict(row, start_date=start, end_date=end)
+            fresh.by_start = sorted((row["start_date"], event_id) for event_id, row in fresh.rows.items())
+            for key in fresh.by_start:
+                row = fresh.rows[key[1]]
+                fresh.by_venue.setdefault(row["venue_id"], []).append(key)
+                if row["end_date"] is not None:
+                    duration = row["end_date"] - row["start_date"]
+                    if duration > fresh.longest.get(row["venue_id"], timedelta(0)):
+                        fresh.longest[row["venue_id"]] = duration
+            with self._lock:
+                for event_id, row in self._during_build.items():
+                    if row is None:
+                        fresh._remove(event_id)
+                    else:
+                        fresh._add(row)
+                self.rows, self.by_start = fresh.rows, fresh.by_start
+                self.by_venue, self.longest = fresh.by_venue, fresh.longest
+                self.ready = True
+        finally:
+            with self._lock:
+                self.building = False
+                self._during_build = {}
+        self.rebuild_seconds = time.perf_counter() - started
+        self.rebuilt_at = time.time()
+        logger.info("event timeline rebuilt: %d events in %.2f s", len(self.rows), self.rebuild_seconds)
+
+    # --- Запросы ---
+
+    def starting(
+        self, start: datetime, end: datetime, limit: int,
+        venue_id: Optional[int] = None, after: Optional[Key] = None,
+    ) -> Tuple[List[Dict[str, Any]], Optional[Key]]:
+        """События с start_date в [start, end) по возрастанию (start_date, id);
+        after — ключ последнего события предыдущей страницы."""
+        with self._lock:
+            keys = self.by_start if venue_id is None else self.by_venue.get(venue_id, [])
+            low = bisect_left(keys, (start,))
+            if after is not None:
+                low = max(low, bisect_left(keys, (after[0], after[1] + 1)))
+            high = bisect_left(keys, (end,))
+            page = keys[low:min(high, low + limit + 1)]
+            rows = [dict(self.rows[event_id]) for _, event_id in page[:limit]]
+        if len(page) <= limit:
+            return rows, None
+        return rows, page[limit - 1]
+
+    def overlapping(self, venue_id: int, start: datetime, end: datetime, limit: int) -> List[Dict[str, Any]]:
+        """События площадки, пересекающие [start, end). Событие без end_date
+        занимает одну точку start_date."""
+        found = []
+        with self._lock:
+            keys = self.by_venue.get(venue_id, [])
+            low = bisect_left(keys, (start - self.longest.get(venue_id, timedelta(0)),))
+            for position in range(low, bisect_left(keys, (end,))):
+                begin, event_id = keys[position]
+                row = self.rows[event_id]
+                finish = row["end_date"] or begin
+                if finish > start or begin >= start:
+                    found.append(dict(row))
+                    if len(found) == limit:
+                        break
+        return found
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "ready": self.ready,
+                "building": self.building,
+                "events": len(self.rows),
+                "venues": len(self.by_venue),
+                "memory_bytes": self._memory(),
+                "rebuild_seconds": round(self.rebuild_seconds, 3) if self.rebuild_seconds is not None else None,
+                "rebuilt_at": self.rebuilt_at,
+                "updates": self.updates,
+            }
+
+    def _memory(self) -> int:
+        """Оценка объёма в байтах: контейнеры, строки событий и ключи; даты и
+        строки внутри строк событий — по размеру объектов."""
+        size = sys.getsizeof(self.rows) + sys.getsizeof(self.by_start) + sys.getsizeof(self.by_venue)
+        for row in self.rows.values():
+            size += sys.getsizeof(row) + sum(sys.getsizeof(value) for value in row.values())
+        # Ключ (start_date, id) в by_start и в списке площадки; дата общая со строкой
+        size += 2 * len(self.rows) * sys.getsizeof((None, None))
+        for keys in self.by_venue.values():
+            size += sys.getsizeof(keys)
+        return size
+
+
+def load_events(conn, chunk_size: int = 10000) -> Iterable[Dict[str, Any]]:
+    for rows in repository.events.stream(conn, chunk_size):
+        for row in rows:
+            yield repository.events.to_dict(row)
+
+
+def rebuild_from_db(conn, timeline: EventTimeline) -> None:
+    timeline.rebuild(load_events(conn))
+
+
+event_timeline = EventTimeline()